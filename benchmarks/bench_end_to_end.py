@@ -0,0 +1,37 @@
+"""
+End-to-end benchmarks of the downloader against the offline fake site: episode
+scraping, a series download with both engines, a segmented download,
+Streamtape resolution and a series whose requests fail at random. Every round
+runs in a fresh process, and the medians of its wall time, CPU time, peak RSS
+and throughput are checked against the stored baseline.
+"""
+
+import statistics
+
+import pytest
+
+from benchmarks.scenarios import SCENARIOS, run_in_process
+
+ROUNDS = 3
+
+@pytest.mark.parametrize('name', list(SCENARIOS))
+def test_scenario(benchmark, baseline, fake_site, tmp_path, name):
+    """
+    Runs a scenario for several rounds and checks it against the baseline.
+    """
+    base = fake_site(**SCENARIOS[name])
+    runs = []
+
+    def run_round():
+        work_dir = tmp_path / f"round-{len(runs)}"
+        work_dir.mkdir()
+        runs.append(run_in_process(name, base, work_dir))
+
+    benchmark.pedantic(run_round, rounds=ROUNDS, iterations=1)
+
+    metrics = {
+        metric: statistics.median(run[metric] for run in runs)
+        for metric in ('wall', 'cpu', 'rss', 'throughput')
+    }
+    benchmark.extra_info.update(metrics)
+    baseline.check(f"end_to_end[{name}]", metrics)
@@ -0,0 +1,58 @@
+"""
+Benchmark of the download engines: a series downloaded from the fake site,
+whose pages answer after a latency, with the thread engine and the asyncio
+engine. The time to the first downloaded byte and the total wall time are
+recorded with each engine.
+"""
+
+import time
+import itertools
+import statistics
+
+import pytest
+
+from hanime_downloader import process_hanime_download
+from helpers.concurrency_utils import DOWNLOAD_LIMITER
+
+MB = 1024 * 1024
+EPISODES = 12
+SIZE = 2 * MB
+LATENCY = 0.05
+WORKERS = 4
+
+@pytest.mark.parametrize('engine', ['thread', 'async'])
+def test_engine(
+        benchmark, measure, baseline, fixed_workers, fake_site, work_dir,
+        monkeypatch, engine
+):
+    """
+    Downloads a series with an engine, timing its first downloaded byte.
+    """
+    if engine == 'async':
+        pytest.importorskip('aiohttp')
+    fixed_workers(WORKERS)
+    base = fake_site(episodes=EPISODES, size=SIZE, latency=LATENCY)
+    rounds = itertools.count()
+    first_bytes = []
+    record_bytes = DOWNLOAD_LIMITER.record_bytes
+
+    def record_first_bytes(num_bytes):
+        if not first_bytes:
+            first_bytes.append(time.perf_counter())
+        record_bytes(num_bytes)
+
+    monkeypatch.setattr(DOWNLOAD_LIMITER, 'record_bytes', record_first_bytes)
+
+    def download():
+        first_bytes.clear()
+        started_at = time.perf_counter()
+        # A series of its own every round, so that nothing is on disk yet
+        process_hanime_download(
+            f"{base}/hentai/{engine}-{next(rounds)}", engine=engine
+        )
+        return first_bytes[0] - started_at
+
+    (metrics, ttfbs) = measure(download, amount=EPISODES * SIZE)
+    metrics['ttfb'] = statistics.median(ttfbs)
+    benchmark.extra_info['ttfb'] = metrics['ttfb']
+    baseline.check(f"engines[{engine}]", metrics)
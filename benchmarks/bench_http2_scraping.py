@@ -0,0 +1,203 @@
+"""
+Benchmark of the episode-resolution stage over HTTP/1.1 and HTTP/2, against
+a local HTTPS server that answers every page after a fixed latency. It runs
+the real scraping path (`resolve_video_urls`, which fetches and parses every
+episode page), and records the pages per second and the connections the
+server accepted with each transport.
+
+The server needs hypercorn, HTTP/2 needs httpx and h2, and a self-signed
+certificate is generated with the `openssl` command, so the benchmark is
+skipped when any of them is missing:
+
+    pip install httpx h2 hypercorn
+"""
+
+import os
+import time
+import shutil
+import socket
+import asyncio
+import threading
+import subprocess
+
+import pytest
+
+import hanime_downloader
+from benchmarks.fake_site import episode_page
+from helpers.http_utils import SESSIONS, configure_http2
+
+hypercorn_config = pytest.importorskip('hypercorn.config')
+hypercorn_asyncio = pytest.importorskip('hypercorn.asyncio')
+pytest.importorskip('httpx')
+pytest.importorskip('h2')
+
+PAGES = 200
+LATENCY = 0.05
+
+# Whether the pages are requested over HTTP/2, and the scraping threads over
+# HTTP/1.1, of each transport
+TRANSPORTS = {
+    'http1-4': (False, 4),
+    'http1-16': (False, 16),
+    'http2': (True, 4)
+}
+
+class PageServer:
+    """
+    Serves episode pages over HTTPS, negotiating HTTP/2 or HTTP/1.1, and
+    counts the connections it accepts.
+    """
+
+    def __init__(self, latency, cert_dir):
+        """
+        Initializes the server.
+
+        Args:
+            latency (float): The time (in seconds) before every answer.
+            cert_dir (str): The directory of the certificate files.
+        """
+        self.latency = latency
+        self.cert_dir = cert_dir
+        self.clients = set()
+        self.port = None
+        self.loop = None
+        self.stopped = None
+
+    async def app(self, scope, receive, send):
+        """
+        Answers a request with an episode page (ASGI application).
+        """
+        if scope['type'] != 'http':
+            return
+
+        self.clients.add(tuple(scope['client']))
+        await asyncio.sleep(self.latency)
+        number = scope['path'].rsplit('/', 1)[-1]
+        body = episode_page("https://127.0.0.1", number).encode()
+        await send({
+            'type': 'http.response.start', 'status': 200,
+            'headers': [
+                (b'content-type', b'text/html'),
+                (b'content-length', str(len(body)).encode())
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    def start(self):
+        """
+        Starts the server in a background thread.
+        """
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            self.port = probe.getsockname()[1]
+
+        config = hypercorn_config.Config()
+        config.bind = [f"127.0.0.1:{self.port}"]
+        config.certfile = os.path.join(self.cert_dir, 'cert.pem')
+        config.keyfile = os.path.join(self.cert_dir, 'key.pem')
+        config.accesslog = None
+        config.errorlog = None
+
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.stopped = asyncio.Event()
+            self.loop.call_soon(ready.set)
+            self.loop.run_until_complete(hypercorn_asyncio.serve(
+                self.app, config, shutdown_trigger=self.stopped.wait
+            ))
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        time.sleep(0.5)
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        self.loop.call_soon_threadsafe(self.stopped.set)
+
+def create_certificate(cert_dir):
+    """
+    Generates a self-signed certificate for 127.0.0.1.
+
+    Args:
+        cert_dir (str): The directory the certificate files are written to.
+
+    Returns:
+        str: The path of the certificate.
+    """
+    subprocess.run(
+        [
+            'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+            '-days', '1', '-subj', '/CN=127.0.0.1',
+            '-addext', 'subjectAltName=IP:127.0.0.1',
+            '-keyout', os.path.join(cert_dir, 'key.pem'),
+            '-out', os.path.join(cert_dir, 'cert.pem')
+        ],
+        check=True, capture_output=True
+    )
+    return os.path.join(cert_dir, 'cert.pem')
+
+@pytest.fixture(scope='module')
+def page_server(tmp_path_factory):
+    """
+    Serves the episode pages over HTTPS for the benchmarks of the module,
+    with a certificate both HTTP clients trust.
+
+    Yields:
+        PageServer: The running server.
+    """
+    if shutil.which('openssl') is None:
+        pytest.skip("The certificate needs the openssl command.")
+
+    cert_dir = tmp_path_factory.mktemp("certificate")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        cert_file = create_certificate(str(cert_dir))
+        monkeypatch.setenv('REQUESTS_CA_BUNDLE', cert_file)
+        monkeypatch.setenv('SSL_CERT_FILE', cert_file)
+
+        server = PageServer(LATENCY, str(cert_dir))
+        server.start()
+        yield server
+        server.stop()
+
+@pytest.mark.parametrize('transport', list(TRANSPORTS))
+def test_http2_scraping(
+        benchmark, measure, baseline, page_server, work_dir, monkeypatch,
+        transport
+):
+    """
+    Resolves the episode pages of a series over a transport.
+    """
+    (http2, workers) = TRANSPORTS[transport]
+    monkeypatch.setattr(hanime_downloader, 'SCRAPE_WORKERS', workers)
+    base = f"https://127.0.0.1:{page_server.port}/ep"
+    episodes = [(number, f"{base}/{number}") for number in range(PAGES)]
+
+    def setup():
+        SESSIONS.clear()
+        configure_http2(http2)
+        page_server.clients.clear()
+        return (), {}
+
+    def resolve_pages():
+        try:
+            resolved = sum(
+                1 for (_, video_url)
+                in hanime_downloader.resolve_video_urls(episodes)
+                if video_url
+            )
+
+        finally:
+            configure_http2(False)
+
+        return resolved, len(page_server.clients)
+
+    (metrics, rounds) = measure(resolve_pages, setup=setup, amount=PAGES)
+    assert [resolved for (resolved, _) in rounds] == [PAGES] * len(rounds)
+    benchmark.extra_info['connections'] = max(
+        connections for (_, connections) in rounds
+    )
+    baseline.check(f"http2_scraping[{transport}]", metrics)
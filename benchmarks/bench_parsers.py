@@ -0,0 +1,127 @@
+"""
+Micro-benchmark of the parse strategies over the saved pages of
+`benchmarks/fixtures`: the full tree built by the standard library parser as
+in the original downloader, the full tree built by lxml, and the strategy
+the downloader uses for each page type (a tree restricted by a SoupStrainer,
+or a regex search without any tree). The parse time and the peak memory
+allocated by Python during a parse are recorded with each strategy.
+
+The fixtures are the pages of the fake site laid out in the header, menus,
+cards, comments and inline scripts of a real page, for its size and markup.
+"""
+
+import os
+import tracemalloc
+
+import pytest
+from bs4 import BeautifulSoup
+
+from hanime_downloader import (
+    SERIES_STRAINER, EPISODE_STRAINER, ALT_PLAYER_STRAINER,
+    DOWNLOAD_LINK_PATTERN, get_episode_urls, extract_video_url,
+    extract_alt_video_url, extract_download_link
+)
+from helpers.format_utils import extract_hanime_name
+from helpers.general_utils import parse_page
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+ROUNDS = 20
+
+def extract_series(soup):
+    """
+    Extracts the title and the episode URLs of a series page.
+    """
+    return extract_hanime_name(soup), get_episode_urls(soup)
+
+def extract_script_link(soup):
+    """
+    Extracts the download link from the scripts of a player page tree (the
+    original `extract_download_link`).
+    """
+    for script_tag in soup.find_all('script'):
+        if script_tag.string:
+            match = DOWNLOAD_LINK_PATTERN.search(script_tag.string)
+            if match:
+                return match.group(1)
+
+    return None
+
+def parse_tree(parser, extract):
+    """
+    Builds a strategy parsing the whole page with a parser.
+    """
+    return lambda html: extract(BeautifulSoup(html, parser))
+
+def parse_strained(strainer, extract):
+    """
+    Builds a strategy parsing the tags kept by a strainer, with the parser of
+    the downloader.
+    """
+    return lambda html: extract(parse_page(html, parse_only=strainer))
+
+# The extraction of every page type, and its strategy in the downloader
+PAGES = {
+    'series': (
+        extract_series, parse_strained(SERIES_STRAINER, extract_series)
+    ),
+    'episode': (
+        extract_video_url, parse_strained(EPISODE_STRAINER, extract_video_url)
+    ),
+    'player': (extract_script_link, extract_download_link),
+    'alt_player': (
+        extract_alt_video_url,
+        parse_strained(ALT_PLAYER_STRAINER, extract_alt_video_url)
+    ),
+}
+
+STRATEGIES = ('html.parser', 'lxml', 'downloader')
+
+def get_strategy(page, strategy):
+    """
+    Returns a parse strategy of a page type.
+
+    Returns:
+        callable: Extracts the data of the page type from its HTML.
+    """
+    (extract, downloader) = PAGES[page]
+    if strategy == 'downloader':
+        return downloader
+
+    return parse_tree(strategy, extract)
+
+def measure_peak_memory(func, *args):
+    """
+    Measures the peak memory allocated by Python during a call.
+
+    Returns:
+        int: The peak memory in bytes.
+    """
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+@pytest.mark.parametrize('page', list(PAGES))
+def test_parser(benchmark, measure, baseline, page, strategy):
+    """
+    Extracts the data of a saved page with a parse strategy.
+    """
+    if strategy == 'lxml':
+        pytest.importorskip('lxml')
+    with open(
+        os.path.join(FIXTURES, f"{page}.html"), 'r', encoding='utf-8'
+    ) as file:
+        html = file.read()
+    parse = get_strategy(page, strategy)
+    expected = get_strategy(page, 'html.parser')(html)
+
+    (metrics, results) = measure(lambda: parse(html), rounds=ROUNDS)
+    assert results == [expected] * len(results)
+
+    metrics['memory'] = measure_peak_memory(parse, html)
+    benchmark.extra_info['memory'] = metrics['memory']
+    baseline.check(f"parsers[{page}-{strategy}]", metrics)
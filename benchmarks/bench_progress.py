@@ -0,0 +1,83 @@
+"""
+Benchmark of the progress reporting of a download: a gigabyte of 64 KB
+chunks counted on a Rich progress task, updated with a percentage on every
+chunk as in the original downloader, and counted on the byte counter pushed
+to the task by the progress reporter. Only the progress is run, without any
+transfer or write, so the CPU time of a round is the CPU time the progress
+reporting costs per gigabyte downloaded.
+"""
+
+import io
+
+import pytest
+from rich.console import Console
+from rich.progress import Progress
+
+from helpers.progress_utils import PROGRESS_REPORTER
+
+GB = 1024 ** 3
+CHUNK_SIZE = 64 * 1024
+
+def create_progress():
+    """
+    Creates a Rich progress with an overall task and the task of a download,
+    rendered to nowhere.
+
+    Returns:
+        tuple: The task information of the download.
+    """
+    job_progress = Progress(console=Console(file=io.StringIO()))
+    overall_task = job_progress.add_task("Progress", total=1)
+    task = job_progress.add_task("Episode", total=100)
+    return job_progress, task, overall_task
+
+def report_every_chunk(task_info):
+    """
+    Updates the task with the percentage downloaded on every chunk (the
+    original `save_file_with_progress`).
+    """
+    (job_progress, task, overall_task) = task_info
+    chunk = bytes(CHUNK_SIZE)
+    total_downloaded = 0
+
+    for _ in range(GB // CHUNK_SIZE):
+        total_downloaded += len(chunk)
+        progress_percentage = (total_downloaded / GB) * 100
+        job_progress.update(task, completed=progress_percentage)
+
+    job_progress.update(task, completed=100, visible=False)
+    job_progress.advance(overall_task)
+    return job_progress.tasks[task].completed
+
+def report_counters(task_info):
+    """
+    Counts the chunks on the byte counter of the download, pushed to the task
+    by the progress reporter.
+    """
+    (job_progress, task, _) = task_info
+    chunk = bytes(CHUNK_SIZE)
+    PROGRESS_REPORTER.track(task_info, GB)
+    counter = PROGRESS_REPORTER.add_counter(task_info)
+
+    for _ in range(GB // CHUNK_SIZE):
+        counter.completed += len(chunk)
+
+    PROGRESS_REPORTER.finish(task_info)
+    return job_progress.tasks[task].completed / GB * 100
+
+REPORTERS = {
+    'every_chunk': report_every_chunk,
+    'counters': report_counters
+}
+
+@pytest.mark.parametrize('reporter', list(REPORTERS))
+def test_progress(measure, baseline, reporter):
+    """
+    Reports the progress of a gigabyte downloaded with a reporter.
+    """
+    (metrics, completed) = measure(
+        REPORTERS[reporter], setup=lambda: ((create_progress(),), {}),
+        amount=GB
+    )
+    assert completed == [100] * len(completed)
+    baseline.check(f"progress[{reporter}]", metrics)
@@ -0,0 +1,98 @@
+"""
+Benchmark of the task scheduler: a batch of downloads from the fake site, each
+stream capped in bandwidth, run by the busy-wait scheduler of the original
+downloader and by the event-driven `run_in_parallel`. The CPU time of the
+whole process (downloads and fake site included) and the throughput of the
+batch are recorded with each scheduler.
+"""
+
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hanime_downloader import download_episode
+from helpers.download_utils import run_in_parallel
+from helpers.progress_utils import EventProgress
+
+MB = 1024 * 1024
+EPISODES = 9
+SIZE = 2 * MB
+RATE = 4 * MB
+WORKERS = 3
+
+def manage_running_tasks(futures, job_progress):
+    """
+    Reveals the task of every future once it runs, polling the futures in a
+    loop until all of them have started (the original scheduler).
+    """
+    while futures:
+        for future in list(futures.keys()):
+            if future.running():
+                task = futures.pop(future)
+                job_progress.update(task, visible=True)
+
+def run_with_busy_wait(func, items, job_progress, *args):
+    """
+    Runs a function for every item, polling the submitted futures after each
+    submission (the original `run_in_parallel`).
+    """
+    futures = {}
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        overall_task = job_progress.add_task(
+            "Progress", total=len(items), visible=True
+        )
+
+        for (indx, item) in enumerate(items):
+            task = job_progress.add_task(
+                f"Episode {indx + 1}/{len(items)}", total=100, visible=False
+            )
+            task_info = (job_progress, task, overall_task)
+            future = executor.submit(func, item, *args, task_info)
+            futures[future] = task
+            manage_running_tasks(futures, job_progress)
+
+def run_with_events(func, items, job_progress, *args):
+    """
+    Runs a function for every item with the event-driven scheduler.
+    """
+    records = [
+        (f"Episode {indx + 1}/{len(items)}", item)
+        for (indx, item) in enumerate(items)
+    ]
+    run_in_parallel(func, records, job_progress, *args, total=len(items))
+
+SCHEDULERS = {
+    'busy_wait': run_with_busy_wait,
+    'event_driven': run_with_events
+}
+
+@pytest.mark.parametrize('scheduler', list(SCHEDULERS))
+def test_scheduler(
+        measure, baseline, fixed_workers, fake_site, work_dir, scheduler
+):
+    """
+    Downloads a batch of episodes with a scheduler.
+    """
+    fixed_workers(WORKERS)
+    base = fake_site(episodes=EPISODES, size=SIZE, rate=RATE)
+    links = [
+        f"{base}/media/scheduler-{number}.mp4"
+        for number in range(1, EPISODES + 1)
+    ]
+
+    def run_batch():
+        download_path = tempfile.mkdtemp(prefix="batch-", dir=work_dir)
+        SCHEDULERS[scheduler](
+            download_episode, links, EventProgress(), download_path
+        )
+        return sum(
+            os.path.getsize(os.path.join(download_path, name))
+            for name in os.listdir(download_path) if name.endswith('.mp4')
+        )
+
+    (metrics, sizes) = measure(run_batch, amount=EPISODES * SIZE)
+    assert sizes == [EPISODES * SIZE] * len(sizes)
+    baseline.check(f"scheduler[{scheduler}]", metrics)
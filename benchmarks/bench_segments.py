@@ -0,0 +1,50 @@
+"""
+Benchmark of the segmented downloads: a single episode downloaded from the
+fake site, whose streams are each capped in bandwidth as by a CDN, in 1, 2
+and 4 byte-range segments. The wall time, CPU time and throughput are
+recorded with each segment count.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+import helpers.download_utils
+from hanime_downloader import download_episode
+from helpers.progress_utils import EventProgress
+
+MB = 1024 * 1024
+SIZE = 8 * MB
+RATE = 4 * MB
+
+@pytest.mark.parametrize('segments', [1, 2, 4])
+def test_segments(
+        measure, baseline, fixed_workers, fake_site, work_dir, monkeypatch,
+        segments
+):
+    """
+    Downloads an episode in a number of segments, with a download slot for
+    each of their connections.
+    """
+    fixed_workers(segments)
+    monkeypatch.setattr(helpers.download_utils, 'MAX_SEGMENTS', segments)
+    monkeypatch.setattr(
+        helpers.download_utils, 'MIN_SEGMENT_SIZE', SIZE // segments
+    )
+    base = fake_site(episodes=1, size=SIZE, rate=RATE)
+    link = f"{base}/media/segments-1.mp4"
+
+    def download():
+        download_path = tempfile.mkdtemp(prefix="round-", dir=work_dir)
+        job_progress = EventProgress()
+        overall_task = job_progress.add_task("Progress", total=1)
+        task = job_progress.add_task("Episode", total=None)
+        download_episode(
+            link, download_path, (job_progress, task, overall_task)
+        )
+        return os.path.getsize(os.path.join(download_path, "segments-1.mp4"))
+
+    (metrics, sizes) = measure(download, amount=SIZE)
+    assert sizes == [SIZE] * len(sizes)
+    baseline.check(f"segments[{segments}]", metrics)
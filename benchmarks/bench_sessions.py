@@ -0,0 +1,86 @@
+"""
+Benchmark of the HTTP session layer: episode pages fetched from the fake site
+by a few scraping threads, with a new session per page as in the original
+downloader and with the pooled sessions shared per host. The wall time, CPU
+time, pages per second and the connections opened are recorded with each
+variant.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from helpers.http_utils import (
+    HEADERS, SESSIONS, http_get, get_connection_stats
+)
+
+PAGES = 300
+WORKERS = 4
+
+def count_connections(session):
+    """
+    Counts the connections a session opened.
+
+    Returns:
+        int: The number of connections opened by the pools of the session.
+    """
+    pools = [
+        adapter.poolmanager.pools.get(key)
+        for adapter in set(session.adapters.values())
+        for key in adapter.poolmanager.pools.keys()
+    ]
+    return sum(pool.num_connections for pool in pools if pool is not None)
+
+def fetch_with_new_session(url):
+    """
+    Fetches a page with a session of its own (the original `fetch_page`).
+
+    Returns:
+        int: The number of connections opened for the page.
+    """
+    with requests.Session() as session:
+        response = session.get(url, headers=HEADERS, timeout=10)
+        response.raise_for_status()
+        _ = response.text
+        return count_connections(session)
+
+def fetch_with_pooled_session(url):
+    """
+    Fetches a page with the pooled session of its host.
+
+    Returns:
+        int: 0, the connections being counted over the shared sessions.
+    """
+    response = http_get(url)
+    response.raise_for_status()
+    _ = response.text
+    return 0
+
+FETCHERS = {
+    'new_session': fetch_with_new_session,
+    'pooled': fetch_with_pooled_session
+}
+
+@pytest.mark.parametrize('fetcher', list(FETCHERS))
+def test_sessions(benchmark, measure, baseline, fake_site, fetcher):
+    """
+    Fetches the episode pages of a series with a variant of the sessions.
+    """
+    base = fake_site(episodes=PAGES)
+    urls = [
+        f"{base}/ep/sessions/{number}" for number in range(1, PAGES + 1)
+    ]
+
+    def setup():
+        SESSIONS.clear()
+
+    def fetch_pages():
+        with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+            opened = sum(executor.map(FETCHERS[fetcher], urls))
+
+        return opened + get_connection_stats()['new']
+
+    (metrics, connections) = measure(fetch_pages, setup=setup, amount=PAGES)
+    benchmark.extra_info['connections'] = max(connections)
+    baseline.check(f"sessions[{fetcher}]", metrics)
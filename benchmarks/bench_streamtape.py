@@ -0,0 +1,57 @@
+"""
+Micro-benchmark of the extraction of a Streamtape page, over the saved page
+of `benchmarks/fixtures`: the three `re.match` calls with a leading `.*` of
+the original resolver, each backtracking over the whole page, and the
+anchored patterns of `extract_download_info`.
+"""
+
+import os
+import re
+
+import pytest
+
+from helpers.streamtape_utils import PREFIX, extract_download_info
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), "fixtures", "streamtape.html"
+)
+ROUNDS = 20
+
+NOROBOT_TOKEN_PATTERN = (
+    r".*document.getElementById.*\('norobotlink'\).innerHTML ="
+    r".*?token=(.*?)'.*?;"
+)
+LINK_TOKEN_PATTERN = (
+    r'.*<div id="ideoooolink" style="display:none;">(.*?token=).*?<[/]div>'
+)
+TITLE_PATTERN = r'.*<meta name="og:title" content="(.*?)">'
+
+def extract_with_backtracking(html):
+    """
+    Extracts the title and download URL of a page (the original
+    `get_curl_command`).
+    """
+    token = re.match(NOROBOT_TOKEN_PATTERN, html, re.M|re.S).group(1)
+    infix = re.match(LINK_TOKEN_PATTERN, html, re.M|re.S).group(1)
+    filename = re.match(TITLE_PATTERN, html, re.M|re.S).group(1)
+    return filename, f'{PREFIX}{infix}{token}'
+
+EXTRACTORS = {
+    'backtracking': extract_with_backtracking,
+    'anchored': extract_download_info
+}
+
+@pytest.mark.parametrize('extractor', list(EXTRACTORS))
+def test_streamtape(measure, baseline, extractor):
+    """
+    Extracts the download information of the saved page with an extractor.
+    """
+    with open(FIXTURE, 'r', encoding='utf-8') as file:
+        html = file.read()
+    expected = extract_with_backtracking(html)
+
+    (metrics, results) = measure(
+        lambda: EXTRACTORS[extractor](html), rounds=ROUNDS
+    )
+    assert results == [expected] * len(results)
+    baseline.check(f"streamtape[{extractor}]", metrics)
@@ -0,0 +1,115 @@
+"""
+Benchmark of the output of the downloads: several streams written at once,
+in 64 KB chunks, through a buffered file growing as it goes as in the
+original downloader, and through `OutputWriter` into a preallocated `.part`
+file renamed when complete, without and with an fsync on completion. The
+write throughput is recorded with each variant, along with the number of
+extents of the files reported by `filefrag` where it is available.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from helpers.download_utils import (
+    FSYNC_NEVER, FSYNC_COMPLETE, OutputWriter, configure_fsync,
+    open_part_file, commit_part_file
+)
+
+MB = 1024 * 1024
+STREAMS = 4
+SIZE = 64 * MB
+CHUNK_SIZE = 64 * 1024
+ROUNDS = 5
+
+EXTENTS_PATTERN = re.compile(r'(\d+) extents? found')
+
+def write_buffered(final_path):
+    """
+    Writes a file with a write per chunk into a growing file (the original
+    `save_file_with_progress`).
+    """
+    chunk = bytes(CHUNK_SIZE)
+    with open(final_path, 'wb') as file:
+        for _ in range(SIZE // CHUNK_SIZE):
+            file.write(chunk)
+
+def write_with_writer(final_path):
+    """
+    Writes a file through the output writer of the downloads.
+    """
+    chunk = bytes(CHUNK_SIZE)
+    file_descriptor = open_part_file(final_path, 0, SIZE)
+    try:
+        writer = OutputWriter(file_descriptor, 0)
+        for _ in range(SIZE // CHUNK_SIZE):
+            writer.write(chunk)
+        writer.close()
+
+    finally:
+        os.close(file_descriptor)
+
+    commit_part_file(final_path)
+
+# The function writing a file and the fsync policy of each variant
+WRITERS = {
+    'buffered_file': (write_buffered, FSYNC_NEVER),
+    'writer': (write_with_writer, FSYNC_NEVER),
+    'writer_fsync': (write_with_writer, FSYNC_COMPLETE)
+}
+
+def count_extents(path):
+    """
+    Counts the extents of a file on disk with `filefrag`, once its data is
+    synced.
+
+    Returns:
+        int: The number of extents, or None if `filefrag` is unavailable or
+             the file system doesn't report them.
+    """
+    if shutil.which('filefrag') is None:
+        return None
+
+    result = subprocess.run(
+        ['filefrag', '-s', path], capture_output=True, text=True, check=False
+    )
+    match = EXTENTS_PATTERN.search(result.stdout)
+    return int(match.group(1)) if result.returncode == 0 and match else None
+
+@pytest.mark.parametrize('writer', list(WRITERS))
+def test_writer(benchmark, measure, baseline, work_dir, writer):
+    """
+    Writes several files at once with a writer.
+    """
+    (write, policy) = WRITERS[writer]
+    configure_fsync(policy)
+
+    def setup():
+        directory = tempfile.mkdtemp(prefix="round-", dir=work_dir)
+        paths = [
+            os.path.join(directory, f"stream-{number}.mp4")
+            for number in range(STREAMS)
+        ]
+        return (paths,), {}
+
+    def write_files(paths):
+        with ThreadPoolExecutor(max_workers=STREAMS) as executor:
+            list(executor.map(write, paths))
+
+        return paths
+
+    (metrics, rounds) = measure(
+        write_files, rounds=ROUNDS, setup=setup, amount=STREAMS * SIZE
+    )
+    for paths in rounds:
+        assert [os.path.getsize(path) for path in paths] == [SIZE] * STREAMS
+
+    extents = [count_extents(path) for path in rounds[-1]]
+    if None not in extents:
+        benchmark.extra_info['extents'] = sum(extents) / STREAMS
+    baseline.check(f"writer[{writer}]", metrics)
@@ -0,0 +1,202 @@
+"""
+Options and fixtures of the benchmarks: the stored baseline of the metrics
+pytest-benchmark does not track (CPU time, peak RSS and throughput, next to
+the wall time), the regression threshold they are checked against, and the
+measurement of the CPU time of the rounds run in the test process.
+
+    pytest benchmarks --save-baseline
+    pytest benchmarks --regression-threshold 0.25
+
+The wall times are also kept by pytest-benchmark itself, and can be compared
+with `--benchmark-autosave` and `--benchmark-compare-fail=median:15%`.
+"""
+
+import os
+import json
+import time
+import platform
+import threading
+import statistics
+
+import pytest
+
+from helpers.concurrency_utils import DOWNLOAD_LIMITER
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 0.15
+
+# Metrics where a lower value is better, the others being higher-is-better
+LOWER_IS_BETTER = ('wall', 'cpu', 'rss', 'ttfb', 'memory')
+
+def pytest_addoption(parser):
+    """
+    Adds the baseline options of the benchmarks.
+    """
+    group = parser.getgroup('baseline')
+    group.addoption(
+        '--save-baseline', action='store_true',
+        help="Store the measurements as the new baseline."
+    )
+    group.addoption(
+        '--regression-threshold', type=float, default=DEFAULT_THRESHOLD,
+        help="The tolerated relative change before a metric is reported as "
+             "a regression (default: 0.15)."
+    )
+
+def compare(metrics, baseline, threshold):
+    """
+    Compares the metrics of a benchmark with its baseline.
+
+    Args:
+        metrics (dict): The measured metrics.
+        baseline (dict): The baseline metrics, or None.
+        threshold (float): The tolerated relative change.
+
+    Returns:
+        list: The descriptions of the metrics worse than the baseline by more
+              than the threshold.
+    """
+    regressions = []
+    for (metric, value) in metrics.items():
+        reference = (baseline or {}).get(metric)
+        if not reference:
+            continue
+
+        change = value / reference - 1
+        worse = change if metric in LOWER_IS_BETTER else -change
+        if worse > threshold:
+            regressions.append(f"{metric} {change:+.0%}")
+
+    return regressions
+
+class Baseline:
+    """
+    The stored baseline of the benchmarks, by benchmark name.
+    """
+
+    def __init__(self, path, save, threshold):
+        """
+        Initializes the baseline.
+
+        Args:
+            path (str): The path of the baseline file.
+            save (bool): Whether the measurements replace the baseline.
+            threshold (float): The tolerated relative change.
+        """
+        self.path = path
+        self.save = save
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file)['benchmarks']
+
+    def check(self, name, metrics):
+        """
+        Records the metrics of a benchmark when saving the baseline, and fails
+        the benchmark on a regression otherwise.
+
+        Args:
+            name (str): The name of the benchmark.
+            metrics (dict): The measured metrics.
+        """
+        if self.save:
+            with self.lock:
+                self.entries[name] = metrics
+            return
+
+        regressions = compare(metrics, self.entries.get(name), self.threshold)
+        if regressions:
+            pytest.fail(f"{name} regressed: {', '.join(regressions)}")
+
+    def write(self):
+        """
+        Writes the baseline file, keeping the baseline of the benchmarks that
+        were not run.
+        """
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(
+                {
+                    'python': platform.python_version(),
+                    'machine': platform.platform(),
+                    'benchmarks': self.entries
+                },
+                file, indent=2, sort_keys=True
+            )
+            file.write("\n")
+
+@pytest.fixture(scope='session')
+def baseline(request):
+    """
+    The stored baseline, written back at the end of the session when
+    `--save-baseline` is given.
+
+    Yields:
+        Baseline: The baseline of the benchmarks.
+    """
+    stored = Baseline(
+        BASELINE_FILE, request.config.getoption('save_baseline'),
+        request.config.getoption('regression_threshold')
+    )
+    yield stored
+
+    if stored.save:
+        stored.write()
+
+@pytest.fixture
+def measure(benchmark):
+    """
+    Runs a function under pytest-benchmark for several rounds, measuring the
+    CPU time of the whole process next to the wall time of each round.
+
+    Returns:
+        callable: Runs a function for the given number of rounds, after an
+                  optional untimed setup returning its arguments as
+                  `(args, kwargs)`, and returns the median wall time
+                  and CPU time in seconds of a round (and the throughput,
+                  given the amount processed by a round) and the results of
+                  the rounds. The metrics are recorded with the benchmark.
+    """
+    def run(func, rounds=3, setup=None, amount=None):
+        runs = []
+
+        def run_round(*args, **kwargs):
+            started_at = time.perf_counter()
+            cpu_before = time.process_time()
+            result = func(*args, **kwargs)
+            runs.append((
+                time.perf_counter() - started_at,
+                time.process_time() - cpu_before,
+                result
+            ))
+
+        benchmark.pedantic(
+            run_round, setup=setup, rounds=rounds, iterations=1
+        )
+        metrics = {
+            'wall': statistics.median(wall for (wall, _, _) in runs),
+            'cpu': statistics.median(cpu for (_, cpu, _) in runs)
+        }
+        if amount is not None:
+            metrics['throughput'] = amount / metrics['wall']
+        benchmark.extra_info.update(metrics)
+        return metrics, [result for (_, _, result) in runs]
+
+    return run
+
+@pytest.fixture
+def fixed_workers(monkeypatch):
+    """
+    Holds the adaptive download limiter at a fixed number of workers, so
+    that the variants of a benchmark run with the same concurrency.
+
+    Returns:
+        callable: Sets the number of workers.
+    """
+    monkeypatch.setattr(DOWNLOAD_LIMITER, 'evaluate', lambda: None)
+
+    def set_workers(workers):
+        DOWNLOAD_LIMITER.configure(workers, workers, workers)
+
+    return set_workers
@@ -0,0 +1,538 @@
+"""
+This module provides an offline stand-in for the sites the downloader talks
+to, for benchmarks and manual testing. It serves HentaiSaturn-shaped series,
+episode and player pages matching the selectors of the scrapers,
+Streamtape-shaped pages, and media files with Range support, with a
+configurable page latency, bandwidth cap per stream and injected errors.
+
+Usage:
+    python3 benchmarks/fake_site.py [--port 8800] [--episodes 4] [--size 64M]
+
+The series `<base>/hentai/<name>` then downloads like a real one, e.g.
+`python3 hanime_downloader.py http://127.0.0.1:8800/hentai/demo`.
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from helpers.rate_limit_utils import parse_rate
+
+PATTERN_SIZE = 1024 * 1024
+SEND_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r'bytes=(\d+)-(\d*)')
+
+# The settings of the site, reset by every `start_site` call
+DEFAULT_SETTINGS = {
+    'episodes': 4,
+    'size': 64 * 1024 * 1024,
+    'latency': 0.0,
+    'rate': None,
+    'error_rate': 0.0,
+    'no_link': frozenset(),
+    'version': 0,          # Bumped to change the ETag and content of files
+    'if_range': True,      # Whether If-Range requests are checked
+    'chunked': False       # Whether full files are sent without a length
+}
+
+# The bytes every media file is a rotation of
+PATTERN = random.Random(0).randbytes(PATTERN_SIZE)
+
+def get_media_etag(file_id, size, version=0):
+    """
+    Returns the ETag of a media file.
+
+    Args:
+        file_id (str): The identifier of the file.
+        size (int): The size of the file in bytes.
+        version (int, optional): The version of the file. Defaults to 0.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    return f'"{file_id}-{size}-{version}"'
+
+def iter_media(file_id, start, end, version=0):
+    """
+    Iterates over a range of a media file.
+
+    Args:
+        file_id (str): The identifier of the file.
+        start (int): The first byte of the range.
+        end (int): The last byte of the range.
+        version (int, optional): The version of the file. Defaults to 0.
+
+    Yields:
+        bytes: The pieces of the range, of at most `SEND_SIZE` bytes.
+    """
+    shift = (sum(file_id.encode()) + version) * 4099
+    position = start
+    while position <= end:
+        offset = (position + shift) % PATTERN_SIZE
+        length = min(SEND_SIZE, PATTERN_SIZE - offset, end - position + 1)
+        yield PATTERN[offset:offset + length]
+        position += length
+
+def get_media_bytes(file_id, size, version=0):
+    """
+    Returns the full content of a media file, to check downloads against.
+
+    Args:
+        file_id (str): The identifier of the file.
+        size (int): The size of the file in bytes.
+        version (int, optional): The version of the file. Defaults to 0.
+
+    Returns:
+        bytes: The content of the file.
+    """
+    return b''.join(iter_media(file_id, 0, size - 1, version))
+
+# Filler making the Streamtape pages as large as the real ones
+STREAMTAPE_FILLER = (
+    '<div class="ad"><a href="/v/decoy" id="ideoooolink2">decoy</a></div>\n'
+    * 2000
+)
+
+def series_page(base, name, episodes):
+    """
+    Builds the page of a series.
+
+    Args:
+        base (str): The base URL of the site.
+        name (str): The name of the series in its URL.
+        episodes (int): The number of episodes.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    buttons = "".join(
+        f'<a href="{base}/ep/{name}/{number}" target="_blank" '
+        f'class="btn btn-dark mb-1 bottone-ep">Episodio {number}</a>\n'
+        for number in range(1, episodes + 1)
+    )
+    return (
+        '<html><body><div class="container hentai-title-as mb-3 w-100">'
+        f'<b>Benchmark {name} Sub ITA</b></div>\n{buttons}</body></html>'
+    )
+
+def episode_page(base, file_id):
+    """
+    Builds the page of an episode, linking to its player page.
+
+    Args:
+        base (str): The base URL of the site.
+        file_id (str): The identifier of the episode file.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    return (
+        '<html><body><a class="btn btn-light w-100 mt-3 mb-3 '
+        f'font-weight-bold" href="{base}/watch?file={file_id}">Guarda</a>'
+        '</body></html>'
+    )
+
+def player_page(base, file_id, has_link=True):
+    """
+    Builds the player page of an episode, with the download link set in a
+    script.
+
+    Args:
+        base (str): The base URL of the site.
+        file_id (str): The identifier of the episode file.
+        has_link (bool, optional): Whether the page has the download link.
+                                   Defaults to True.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    setup = f'file: "{base}/media/{file_id}.mp4"' if has_link else ''
+    return (
+        f'<html><head><script>jwplayer("player").setup({{ {setup} }});'
+        '</script></head><body></body></html>'
+    )
+
+def alt_player_page(base, file_id):
+    """
+    Builds the alternative player page of an episode, linking to its
+    Streamtape page.
+
+    Args:
+        base (str): The base URL of the site.
+        file_id (str): The identifier of the episode file.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    return (
+        f'<html><body><a href="{base}/v/{file_id}" target="_blank">'
+        'Streamtape</a></body></html>'
+    )
+
+def streamtape_page(host, file_id):
+    """
+    Builds a Streamtape page of an episode, with its title and the pieces of
+    its download link.
+
+    Args:
+        host (str): The host of the site.
+        file_id (str): The identifier of the episode file.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    return (
+        f'<html><head><meta name="og:title" content="{file_id}.mp4"></head>'
+        f'<body>\n{STREAMTAPE_FILLER}'
+        '<div id="ideoooolink" style="display:none;">'
+        f'/{host}/get_video?id={file_id}&expires=1&ip=1&token=</div>\n'
+        "<script>document.getElementById('norobotlink').innerHTML = "
+        f"'//{host}/get_video?id={file_id}'.substring(1) + "
+        f"'&token={file_id}token';</script></body></html>"
+    )
+
+class FakeSite(BaseHTTPRequestHandler):
+    """
+    Answers the requests of the downloader. The settings are class attributes
+    shared by every request.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are separate writes, which Nagle's algorithm
+    # would hold back on a kept-alive connection until the client's delayed
+    # ACK, as real servers don't
+    disable_nagle_algorithm = True
+    episodes = DEFAULT_SETTINGS['episodes']
+    size = DEFAULT_SETTINGS['size']
+    latency = DEFAULT_SETTINGS['latency']
+    rate = DEFAULT_SETTINGS['rate']
+    error_rate = DEFAULT_SETTINGS['error_rate']
+    no_link = DEFAULT_SETTINGS['no_link']
+    version = DEFAULT_SETTINGS['version']
+    if_range = DEFAULT_SETTINGS['if_range']
+    chunked = DEFAULT_SETTINGS['chunked']
+    requests_seen = Counter()
+    media_requests = []    # The Range header and status of every media GET
+    streams = {'active': 0, 'peak': 0}    # Media bodies being sent
+    requests_lock = threading.Lock()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Keeps the access log quiet.
+        """
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """
+        Answers a HEAD request with the headers of the matching GET request.
+        """
+        self.handle_request(send_body=False)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answers a GET request.
+        """
+        self.handle_request(send_body=True)
+
+    def is_failing(self):
+        """
+        Counts the request and decides whether it is answered with an
+        injected error. The draw depends only on the path and how many times
+        it was requested, so a run fails the same requests whatever the order
+        of the threads.
+
+        Returns:
+            bool: True if the request must fail.
+        """
+        with self.requests_lock:
+            self.requests_seen[self.path] += 1
+            count = self.requests_seen[self.path]
+
+        if not self.error_rate:
+            return False
+
+        return random.Random(f"{self.path}:{count}").random() < self.error_rate
+
+    def send_page(self, html, send_body, headers=None):
+        """
+        Sends an HTML page after the page latency.
+
+        Args:
+            html (str): The HTML of the page.
+            send_body (bool): Whether the body is sent.
+            headers (dict, optional): Extra headers. Defaults to None.
+        """
+        time.sleep(self.latency)
+        body = html.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for (key, value) in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_media(self, file_id, send_body):
+        """
+        Sends a media file, or the requested range of it, counting the
+        bodies being sent at once.
+
+        Args:
+            file_id (str): The identifier of the file.
+            send_body (bool): Whether the body is sent.
+        """
+        (start, end) = (0, self.size - 1)
+        etag = get_media_etag(file_id, self.size, self.version)
+        range_header = self.headers.get('Range')
+        match = RANGE_PATTERN.match(range_header or '')
+        # A range of a file that changed since the If-Range validator is
+        # ignored, and the whole file is sent
+        if match and self.if_range and self.headers.get('If-Range') not in (
+                None, etag
+        ):
+            match = None
+
+        status = 206 if match else 200
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), end)
+            if start > end:
+                status = 416
+
+        if send_body:
+            with self.requests_lock:
+                self.media_requests.append((range_header, status))
+
+        self.send_response(status)
+        if status == 416:
+            self.send_header('Content-Range', f"bytes */{self.size}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if status == 206:
+            self.send_header(
+                'Content-Range', f"bytes {start}-{end}/{self.size}"
+            )
+        is_chunked = self.chunked and status == 200
+        self.send_header('Content-Type', 'video/mp4')
+        if is_chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.end_headers()
+        if not send_body:
+            return
+
+        with self.requests_lock:
+            self.streams['active'] += 1
+            self.streams['peak'] = max(
+                self.streams['peak'], self.streams['active']
+            )
+
+        try:
+            self.send_body(file_id, start, end, is_chunked)
+
+        finally:
+            with self.requests_lock:
+                self.streams['active'] -= 1
+
+    def send_body(self, file_id, start, end, is_chunked=False):
+        """
+        Sends a range of a media file, capped at the bandwidth of a stream.
+
+        Args:
+            file_id (str): The identifier of the file.
+            start (int): The first byte of the range.
+            end (int): The last byte of the range.
+            is_chunked (bool, optional): Whether the body is sent with the
+                                         chunked transfer encoding. Defaults
+                                         to False.
+        """
+        started_at = time.monotonic()
+        position = start
+        for piece in iter_media(file_id, start, end, self.version):
+            if is_chunked:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+            else:
+                self.wfile.write(piece)
+            position += len(piece)
+            if self.rate and position <= end:
+                delay = (position - start) / self.rate - (
+                    time.monotonic() - started_at
+                )
+                if delay > 0:
+                    time.sleep(delay)
+
+        if is_chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+    def handle_request(self, send_body):
+        """
+        Routes a request to the page or file it asks for.
+
+        Args:
+            send_body (bool): Whether the body is sent.
+        """
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+        host = self.headers.get('Host', 'localhost')
+        base = f"http://{host}"
+
+        if self.is_failing():
+            self.send_error(503)
+            return
+
+        if parts[0] == 'hentai' and len(parts) == 2:
+            etag = f'"{parts[1]}-{self.episodes}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+            self.send_page(
+                series_page(base, parts[1], self.episodes), send_body,
+                {'ETag': etag}
+            )
+        elif parts[0] == 'ep' and len(parts) == 3:
+            self.send_page(
+                episode_page(base, f"{parts[1]}-{parts[2]}"), send_body
+            )
+        elif parts[0] == 'watch' and 'file' in query:
+            file_id = query['file'][0]
+            if 'server' in query:
+                self.send_page(alt_player_page(base, file_id), send_body)
+            else:
+                has_link = file_id.rsplit('-', 1)[-1] not in self.no_link
+                self.send_page(
+                    player_page(base, file_id, has_link), send_body
+                )
+        elif parts[0] == 'v' and len(parts) == 2:
+            self.send_page(streamtape_page(host, parts[1]), send_body)
+        elif parts[0] == 'media' and len(parts) == 2:
+            self.send_media(parts[1].rsplit('.', 1)[0], send_body)
+        else:
+            self.send_error(404)
+
+class FakeSiteServer(ThreadingHTTPServer):
+    """
+    Serves the fake site, one thread per connection.
+    """
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """
+        Ignores the connections the client drops, as when a download is
+        cancelled, and reports the other errors.
+        """
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def start_site(port=0, **settings):
+    """
+    Starts the fake site in a background thread. The settings not given are
+    reset to their defaults, and the recorded requests are cleared.
+
+    Args:
+        port (int, optional): The port to listen on. Defaults to 0, for any
+                              free port.
+        **settings: The settings of the site (see `DEFAULT_SETTINGS`).
+
+    Returns:
+        tuple: The server and the base URL of the site.
+
+    Raises:
+        ValueError: If a setting is unknown.
+    """
+    unknown = set(settings) - set(DEFAULT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+    for (key, value) in {**DEFAULT_SETTINGS, **settings}.items():
+        setattr(FakeSite, key, value)
+    FakeSite.requests_seen.clear()
+    FakeSite.media_requests.clear()
+    FakeSite.streams.update(active=0, peak=0)
+
+    server = FakeSiteServer(('127.0.0.1', port), FakeSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def setup_parser():
+    """
+    Set up the argument parser of the fake site.
+
+    Returns:
+        argparse.ArgumentParser: The configured argument parser instance.
+    """
+    parser = argparse.ArgumentParser(
+        description="Serve an offline stand-in of the scraped sites."
+    )
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument(
+        '--episodes', type=int, default=4,
+        help="The number of episodes of every series."
+    )
+    parser.add_argument(
+        '--size', type=parse_rate, default='64M',
+        help="The size of every media file (e.g. 500K, 64M)."
+    )
+    parser.add_argument(
+        '--latency', type=float, default=0.0,
+        help="Seconds before every page is answered."
+    )
+    parser.add_argument(
+        '--rate', type=parse_rate, default=None,
+        help="The bandwidth of every media stream in bytes/s (e.g. 2M)."
+    )
+    parser.add_argument(
+        '--error-rate', type=float, default=0.0,
+        help="The share of requests answered with 503."
+    )
+    parser.add_argument(
+        '--chunked', action='store_true',
+        help="Send full media files with the chunked transfer encoding."
+    )
+    parser.add_argument(
+        '--no-link', type=lambda value: frozenset(value.split(',')),
+        default=frozenset(),
+        help="Episode numbers whose player page has no download link."
+    )
+    return parser
+
+def main():
+    """
+    Serves the fake site until interrupted, printing its base URL.
+    """
+    args = setup_parser().parse_args()
+    (server, base) = start_site(
+        args.port, episodes=args.episodes, size=int(args.size),
+        latency=args.latency, rate=args.rate, error_rate=args.error_rate,
+        no_link=args.no_link, chunked=args.chunked
+    )
+    print(base, flush=True)
+
+    try:
+        while True:
+            time.sleep(3600)
+
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
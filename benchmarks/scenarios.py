@@ -0,0 +1,188 @@
+"""
+This module holds the end-to-end scenarios of the performance regression
+suite. Each scenario runs the real download path against the offline fake
+site, in a process of its own started from a temporary working directory, so
+that its CPU time and peak RSS are not mixed with those of the test runner:
+
+    python3 benchmarks/scenarios.py <scenario> <base URL>
+
+prints the measurements of one run as JSON. The scenarios are run and
+compared with the baseline by `bench_end_to_end.py`.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MB = 1024 * 1024
+
+# The site settings of every scenario
+SCENARIOS = {
+    'scrape': {'episodes': 100, 'size': MB, 'latency': 0.02},
+    'series': {'episodes': 8, 'size': 24 * MB},
+    'series_async': {'episodes': 8, 'size': 24 * MB},
+    'segmented': {'episodes': 1, 'size': 128 * MB},
+    'streamtape': {'episodes': 100, 'size': MB, 'latency': 0.02},
+    'flaky': {'episodes': 8, 'size': 8 * MB, 'error_rate': 0.1},
+}
+
+# Scenarios measured in pages per second rather than bytes per second
+PAGE_SCENARIOS = ('scrape', 'streamtape')
+
+def get_peak_rss():
+    """
+    Returns the peak resident set size of the current process.
+
+    Returns:
+        int: The peak RSS in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def get_downloaded_bytes():
+    """
+    Returns the size of the episodes downloaded in the working directory.
+
+    Returns:
+        int: The total size in bytes of the finished episode files.
+    """
+    # pylint: disable=import-outside-toplevel
+    from helpers.general_utils import DOWNLOAD_FOLDER
+
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for (root, _, names) in os.walk(DOWNLOAD_FOLDER)
+        for name in names if name.endswith('.mp4')
+    )
+
+def run_scenario(name, base, settings):
+    """
+    Runs a scenario in the current process.
+
+    Args:
+        name (str): The name of the scenario.
+        base (str): The base URL of the fake site.
+        settings (dict): The site settings of the scenario.
+
+    Returns:
+        int: The number of items (episodes or pages) processed.
+
+    Raises:
+        RuntimeError: If the scenario didn't process every item.
+    """
+    # pylint: disable=import-outside-toplevel
+    import hanime_downloader
+    from helpers.cache_utils import configure_cache
+    from helpers.progress_utils import configure_progress
+    from helpers.streamtape_utils import STREAMTAPE_RESOLVER
+
+    configure_cache(enabled=False)
+    configure_progress('silent')
+    episodes = settings['episodes']
+    series_url = f"{base}/hentai/{name}"
+
+    if name == 'scrape':
+        pages = [
+            (number, f"{base}/ep/{name}/{number}")
+            for number in range(1, episodes + 1)
+        ]
+        done = sum(
+            1 for (_, video_url) in hanime_downloader.resolve_video_urls(pages)
+            if video_url
+        )
+    elif name == 'streamtape':
+        urls = [f"{base}/v/{name}-{number}" for number in range(episodes)]
+        done = sum(
+            1 for (_, result, _) in STREAMTAPE_RESOLVER.resolve_many(urls)
+            if result
+        )
+    else:
+        engine = 'async' if name.endswith('_async') else 'thread'
+        (hanime_name, download_path, pages) = (
+            hanime_downloader.prepare_hanime_download(series_url)
+        )
+        hanime_downloader.download_episodes(
+            hanime_name, pages, download_path, engine
+        )
+        done = get_downloaded_bytes() // settings['size']
+
+    if done != episodes:
+        raise RuntimeError(f"{name}: {done} of {episodes} items processed")
+
+    return done
+
+def measure_scenario(name, base):
+    """
+    Runs a scenario and measures it.
+
+    Args:
+        name (str): The name of the scenario.
+        base (str): The base URL of the fake site.
+
+    Returns:
+        dict: The wall time and CPU time in seconds, the peak RSS in bytes,
+              the throughput in bytes (or pages) per second and the number of
+              items processed.
+    """
+    settings = SCENARIOS[name]
+    item_size = 1 if name in PAGE_SCENARIOS else settings['size']
+    # Same retry delays on every run
+    random.seed(0)
+    started_at = time.perf_counter()
+    times_before = os.times()
+
+    items = run_scenario(name, base, settings)
+
+    times_after = os.times()
+    wall = time.perf_counter() - started_at
+    cpu = (
+        times_after.user - times_before.user
+        + times_after.system - times_before.system
+    )
+    return {
+        'wall': wall,
+        'cpu': cpu,
+        'rss': get_peak_rss(),
+        'throughput': items * item_size / wall,
+        'items': items
+    }
+
+def run_in_process(name, base, work_dir):
+    """
+    Runs a scenario in a fresh process.
+
+    Args:
+        name (str): The name of the scenario.
+        base (str): The base URL of the fake site.
+        work_dir (str): The working directory of the process.
+
+    Returns:
+        dict: The measurements of the run.
+
+    Raises:
+        RuntimeError: If the run fails.
+    """
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), name, base],
+        cwd=work_dir, capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    """
+    Runs the scenario given on the command line and prints its measurements.
+    """
+    (name, base) = sys.argv[1:3]
+    print(json.dumps(measure_scenario(name, base)))
+
+if __name__ == '__main__':
+    main()
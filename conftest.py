@@ -0,0 +1,77 @@
+"""
+Shared fixtures of the tests and the benchmarks: the offline fake site and a
+clean working directory, with the module-level state of the helpers reset, for
+every test.
+"""
+
+import pytest
+
+from benchmarks.fake_site import start_site
+from helpers.cache_utils import CACHE_STATE, configure_cache
+from helpers.checksum_utils import configure_checksum
+from helpers.concurrency_utils import (
+    DOWNLOAD_LIMITER, MIN_WORKERS, MAX_WORKERS, INITIAL_WORKERS
+)
+from helpers.download_utils import configure_fsync
+from helpers.progress_utils import SILENT, configure_progress
+from helpers.queue_utils import QUEUE_STATE
+from helpers.rate_limit_utils import HOST_BUCKETS, configure_limits
+from helpers.retry_utils import FAILURES
+from helpers.streamtape_utils import STREAMTAPE_RESOLVER
+from helpers.sync_utils import SYNC_STATE
+
+def reset_state():
+    """
+    Resets the configuration and the caches of the helpers to those of a
+    fresh run, closing the databases opened in another working directory.
+    """
+    for state in (CACHE_STATE, QUEUE_STATE, SYNC_STATE):
+        if state['connection'] is not None:
+            state['connection'].close()
+            state['connection'] = None
+
+    configure_cache(enabled=False)
+    configure_progress(SILENT)
+    configure_checksum('blake2b')
+    configure_fsync()
+    configure_limits()
+    HOST_BUCKETS.clear()
+    DOWNLOAD_LIMITER.configure(MIN_WORKERS, MAX_WORKERS, INITIAL_WORKERS)
+    STREAMTAPE_RESOLVER.cache.clear()
+    FAILURES.clear()
+
+@pytest.fixture
+def work_dir(tmp_path, monkeypatch):
+    """
+    Runs the test in an empty working directory, where the `Downloads` folder
+    is created, with the state of the helpers reset.
+
+    Yields:
+        pathlib.Path: The working directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    reset_state()
+    yield tmp_path
+    reset_state()
+
+@pytest.fixture
+def fake_site():
+    """
+    Starts fake sites for the test and stops them afterwards.
+
+    Yields:
+        callable: Starts a fake site with the given settings and returns its
+                  base URL.
+    """
+    servers = []
+
+    def start(**settings):
+        (server, base) = start_site(**settings)
+        servers.append(server)
+        return base
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
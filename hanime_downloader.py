@@ -13,29 +13,116 @@ Usage:
 import os
 import re
 import sys
+import asyncio
 import argparse
 from urllib.parse import urlparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
-from rich.live import Live
-
-from helpers.streamtape_utils import get_curl_command as get_alt_download_link
-from helpers.download_utils import save_file_with_progress, run_in_parallel
-from helpers.progress_utils import create_progress_bar, create_progress_table
+from bs4 import SoupStrainer
+
+from helpers.streamtape_utils import STREAMTAPE_RESOLVER
+from helpers.download_utils import (
+    TASK_COLOR, save_file_with_progress, run_in_parallel, mark_task_complete,
+    mark_task_failed, queue_task, dequeue_task, start_task,
+    get_resume_headers, get_resume_offset, discard_partial_download,
+    FSYNC_NEVER, parse_fsync_policy, configure_fsync
+)
+from helpers.checksum_utils import (
+    HASH_ALGORITHMS, NO_CHECKSUM, CHECKSUM_STATE, configure_checksum
+)
+from helpers.async_utils import (
+    create_client_session, fetch_text_async, download_file_async, run_pipeline
+)
+from helpers.http_utils import (
+    http_get, get_host_slot, get_scrape_workers, configure_http2
+)
+from helpers.concurrency_utils import (
+    DOWNLOAD_LIMITER, MIN_WORKERS, MAX_WORKERS
+)
+from helpers.rate_limit_utils import (
+    CONTROL_FILE, parse_rate, configure_limits, watch_control_file
+)
+from helpers.retry_utils import (
+    HOST_ATTEMPTS, PAGE_ATTEMPTS, RetryBudget, get_status, retry_call,
+    retry_call_async, record_failure, print_failure_summary
+)
+from helpers.manifest_utils import (
+    record_episode, find_completed_episode, check_remote_file
+)
+from helpers.cache_utils import (
+    EPISODES, VIDEO, LINK, configure_cache, cache_get, cache_set,
+    cache_invalidate, is_link_expired
+)
+from helpers.metrics_utils import (
+    METRICS_FILE, ACTIVE_DOWNLOADS, DOWNLOADS, PARSE_SECONDS,
+    start_metrics_server, write_metrics_summary
+)
+from helpers.trace_utils import (
+    TRACE_FILE, PROFILE_FOLDER, traced, trace_queue_wait, configure_tracing,
+    finish_tracing
+)
+from helpers.progress_utils import (
+    PROGRESS_MODES, AUTO, create_progress_bar, progress_display,
+    configure_progress, is_interactive, report_message
+)
+from helpers.sync_utils import (
+    get_sync_state, get_conditional_headers, save_sync_state,
+    mark_series_unchanged
+)
 from helpers.format_utils import extract_hanime_name, format_hanime_name
 from helpers.general_utils import (
-    fetch_page, create_download_directory, clear_terminal
+    DOWNLOAD_FOLDER, fetch_page, fetch_text, fetch_text_if_modified,
+    parse_page, create_download_directory, clear_terminal, setup_logging
 )
 
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) "
-        "Gecko/20100101 Firefox/117.0"
-    ),
-    "Connection": "keep-alive"
-}
+ALT_SERVER_SUFFIX = "&server=1"
+SCRAPE_WORKERS = 4
+DOWNLOAD_LINK_PATTERN = re.compile(r'file:\s*"([^"]+)"')
+
+# Errors after which an episode is retried from the alternative host
+FAILOVER_ERRORS = (requests.RequestException, ValueError, IndexError)
+
+def is_series_tag(name, attrs):
+    """
+    Tells whether a tag of the series page is needed to extract the title and
+    the episode buttons, so that only those tags are parsed.
+
+    Args:
+        name (str): The name of the tag.
+        attrs (dict): The attributes of the tag.
+
+    Returns:
+        bool: True if the tag must be kept in the parsed tree.
+    """
+    return name == 'a' or (
+        name == 'div' and 'hentai-title-as' in attrs.get('class', '')
+    )
+
+# Parse strategies restricting each page type to the tags actually read
+SERIES_STRAINER = SoupStrainer(is_series_tag)
+EPISODE_STRAINER = SoupStrainer('a', href=True)
+ALT_PLAYER_STRAINER = SoupStrainer('a', href=True, target="_blank")
+
+def select_episodes(episodes, start_episode=None, end_episode=None):
+    """
+    Selects the episodes within the requested range.
+
+    Args:
+        episodes (list): Every episode of the series, in order.
+        start_episode (int, optional): The starting episode number. Defaults to
+                                       None.
+        end_episode (int, optional): The ending episode number. Defaults to
+                                     None.
 
+    Returns:
+        list: The selected episodes.
+    """
+    start_index = start_episode - 1 if start_episode else 0
+    end_index = end_episode if end_episode else len(episodes)
+    return episodes[start_index:end_index]
+
+@traced('parse')
 def get_episode_urls(soup, start_episode=None, end_episode=None):
     """
     Extracts URLs based on a given tag, attribute from a BeautifulSoup object.
@@ -55,57 +142,117 @@ def get_episode_urls(soup, start_episode=None, end_episode=None):
         }
     )
 
-    # Determine the correct slice based on start_episode and end_episode
-    start_index = start_episode - 1 if start_episode else 0
-    end_index = end_episode if end_episode else len(episode_items)
-    return [
-        item.get('href') for item in episode_items[start_index:end_index]
-    ]
+    return select_episodes(
+        [item.get('href') for item in episode_items],
+        start_episode=start_episode,
+        end_episode=end_episode
+    )
 
-def get_video_urls(episode_urls):
+@traced('parse')
+def extract_video_url(soup):
     """
-    Retrieves video URLs from a list of episode URLs.
+    Extracts the URL of the video player from an episode page.
 
     Args:
-        episode_urls (list): A list of episode URLs.
+        soup (BeautifulSoup): A BeautifulSoup object representing the HTML
+                              content of the episode page.
 
     Returns:
-        list: A list of video URLs.
+        str: The URL of the video player, or None if it is not found.
+    """
+    video_url_container = soup.find(
+        'a',
+        {
+            'class':"btn btn-light w-100 mt-3 mb-3 font-weight-bold",
+            'href': True
+        }
+    )
+    return video_url_container['href'] if video_url_container else None
 
-    Raises:
-        requests.RequestException: If an error occurs while making an
-                                   HTTP request.
+@traced('resolve')
+def fetch_video_url(episode_url):
     """
-    def extract_video_url(episode_url):
-        try:
-            soup = fetch_page(episode_url)
-            video_url_container = soup.find(
-                'a',
-                {
-                    'class':"btn btn-light w-100 mt-3 mb-3 font-weight-bold",
-                    'href': True
-                }
-            )
-            return video_url_container['href']
+    Retrieves the video URL of an episode page, from the cache when possible.
 
-        except requests.RequestException as req_err:
-            print(f"Error fetching episode URL {episode_url}: {req_err}")
-            return None
+    Args:
+        episode_url (str): The URL of the episode page.
 
-    video_urls = []
+    Returns:
+        str: The video URL, or None if it can't be retrieved, in which case
+             the episode is recorded as a failure.
+    """
+    video_url = cache_get(VIDEO, episode_url)
+    if video_url:
+        return video_url
 
-    with ThreadPoolExecutor(max_workers=4) as executor:
+    try:
+        soup = fetch_page(episode_url, parse_only=EPISODE_STRAINER)
+        video_url = extract_video_url(soup)
+        if not video_url:
+            raise ValueError("No video player found.")
+
+        cache_set(VIDEO, episode_url, video_url)
+        return video_url
+
+    except (requests.RequestException, ValueError) as err:
+        record_failure('episode', episode_url, err)
+        return None
+
+def resolve_video_urls(episodes):
+    """
+    Resolves the video URLs of episode pages concurrently, yielding each one
+    as soon as it is available, so that its download can start while the
+    other pages are still being fetched.
+
+    Args:
+        episodes (list): The `(episode_number, episode_url)` pairs to resolve.
+
+    Yields:
+        tuple: The episode number and its video URL (None if it can't be
+               retrieved), in completion order.
+    """
+    with ThreadPoolExecutor(
+        max_workers=get_scrape_workers(SCRAPE_WORKERS)
+    ) as executor:
         futures = {
-            executor.submit(extract_video_url, episode_url): episode_url
-            for episode_url in episode_urls
+            executor.submit(
+                trace_queue_wait(fetch_video_url), episode_url
+            ): episode_number
+            for (episode_number, episode_url) in episodes
         }
 
         for future in as_completed(futures):
-            video_url = future.result()
-            if video_url:
-                video_urls.append(video_url)
+            yield futures[future], future.result()
+
+def get_episode_label(episode_number, episodes):
+    """
+    Builds the progress label of an episode.
 
-    return video_urls
+    Args:
+        episode_number (int): The number of the episode in the series.
+        episodes (list): The `(episode_number, episode_url)` pairs being
+                         downloaded.
+
+    Returns:
+        str: The label of the episode, e.g. "Episode 2/4".
+    """
+    return f"Episode {episode_number}/{episodes[-1][0]}"
+
+def label_episodes(resolved_episodes, episodes):
+    """
+    Attaches its progress label to every resolved episode.
+
+    Args:
+        resolved_episodes (iterable): The `(episode_number, video_url)` pairs
+                                      yielded by `resolve_video_urls`.
+        episodes (list): The `(episode_number, episode_url)` pairs being
+                         downloaded.
+
+    Yields:
+        tuple: The label of the episode and its video URL.
+    """
+    for (episode_number, video_url) in resolved_episodes:
+        yield get_episode_label(episode_number, episodes), video_url
 
 def get_episode_filename(download_link):
     """
@@ -130,12 +277,40 @@ def get_episode_filename(download_link):
 
     return None
 
+def record_download(final_path, headers, source_url, checksum=None):
+    """
+    Records a finished episode in the manifest of its series, with the
+    validators of the remote file.
+
+    Args:
+        final_path (str): The path of the downloaded episode.
+        headers (Mapping): The headers of the remote file.
+        source_url (str): The video URL the episode was resolved from.
+        checksum (str, optional): The checksum computed while downloading.
+                                  Defaults to None, which keeps the recorded
+                                  one of an unchanged file.
+    """
+    record_episode(
+        final_path,
+        source_url=source_url,
+        etag=headers.get('etag'),
+        last_modified=headers.get('last-modified'),
+        checksum=checksum
+    )
+
+@traced('download')
 def download_episode(
-        download_link, download_path, task_info, is_default_host=True
+        download_link, download_path, task_info, is_default_host=True,
+        source_url=None
 ):
     """
     Downloads an episode from the specified link and provides real-time
-    progress updates.
+    progress updates. A partial download left by a previous run is resumed
+    with a Range request when the server supports it, and the number of
+    simultaneous transfers is set by the adaptive download limiter and capped
+    per host. An episode already on disk is skipped if a HEAD request shows
+    the remote file is unchanged, and finished episodes are recorded in the
+    series manifest.
 
     Args:
         download_link (str): The URL from which to download the episode.
@@ -147,26 +322,87 @@ def download_episode(
             - overall_task: The overall progress task being updated.
         is_default_host (bool): Indicates whether the default host is being
                                 used. Defaults to True.
+        source_url (str, optional): The video URL the episode was resolved
+                                    from, recorded in the manifest. Defaults
+                                    to None.
 
     Raises:
         requests.RequestException: If there is an error with the HTTP request,
                                    such as connectivity issues or invalid URLs.
+        ValueError: If the response does not continue the partial file.
     """
+    file_name = get_episode_filename(download_link)
+    host = urlparse(download_link).netloc
+    final_path = (
+        os.path.join(download_path, file_name) if is_default_host
+        else download_path
+    )
+
     try:
-        response = requests.get(
-            download_link, stream=True, headers=HEADERS, timeout=10
-        )
-        response.raise_for_status()
+        remote_headers = check_remote_file(download_link, final_path)
+        if remote_headers is not None:
+            record_download(final_path, remote_headers, source_url)
+            mark_task_complete(task_info)
+            DOWNLOADS.inc(host, 'skipped')
+            return
+
+        with DOWNLOAD_LIMITER.slot(), get_host_slot(download_link):
+            start_task(task_info)
+            resume_headers = get_resume_headers(final_path)
+            response = http_get(
+                download_link, headers=resume_headers, stream=True
+            )
 
-        file_name = get_episode_filename(download_link)
-        final_path = (
-            os.path.join(download_path, file_name) if is_default_host
-            else download_path
-        )
-        save_file_with_progress(response, final_path, task_info)
+            # Fall back to a full download when the partial file can't be
+            # resumed
+            if resume_headers and (
+                response.status_code == 416
+                or get_resume_offset(response, final_path) is None
+            ):
+                response.close()
+                discard_partial_download(final_path)
+                response = http_get(download_link, stream=True)
+
+            response.raise_for_status()
+            with ACTIVE_DOWNLOADS.track():
+                checksum = save_file_with_progress(
+                    response, final_path, task_info
+                )
+
+            record_download(
+                final_path, response.headers, source_url, checksum
+            )
+            DOWNLOADS.inc(host, 'done')
 
     except requests.RequestException as req_error:
-        print(f"HTTP request failed: {req_error}")
+        DOWNLOAD_LIMITER.record_error(get_status(req_error))
+        DOWNLOADS.inc(host, 'failed')
+        raise
+
+    except ValueError:
+        DOWNLOADS.inc(host, 'failed')
+        raise
+
+@traced('parse')
+def extract_alt_video_url(soup):
+    """
+    Extracts the URL of the alternative host from the alternative player page.
+
+    Args:
+        soup (BeautifulSoup): A BeautifulSoup object representing the HTML
+                              content of the alternative player page.
+
+    Returns:
+        str: The alternative video URL found in the anchor tag.
+
+    Raises:
+        IndexError: If no valid anchor tags are found in the page.
+    """
+    url_container = soup.find('a', {'href': True, 'target': "_blank"})
+    if not url_container:
+        raise IndexError("No tags found with the target '_blank'.")
+
+    return url_container['href']
 
 def get_alt_video_url(url):
     """
@@ -183,24 +419,9 @@ def get_alt_video_url(url):
         requests.RequestException: If there is an issue with the GET request.
         IndexError: If no valid anchor tags are found in the response.
     """
-    alt_url = url + "&server=1"
-
-    try:
-        soup = fetch_page(alt_url)
-
-        url_container = soup.find('a', {'href': True, 'target': "_blank"})
-        if not url_container:
-            raise IndexError("No tags found with the target '_blank'.")
-
-        return url_container['href']
-
-    except requests.RequestException as req_err:
-        print(f"Error processing video URL {url}: {req_err}")
-
-    except IndexError as indx_err:
-        print(f"Error finding alternative video URL: {indx_err}")
-
-    return None
+    alt_url = url + ALT_SERVER_SUFFIX
+    soup = fetch_page(alt_url, parse_only=ALT_PLAYER_STRAINER, attempts=1)
+    return extract_alt_video_url(soup)
 
 def download_from_alt_host(url, download_path, task_info):
     """
@@ -215,93 +436,506 @@ def download_from_alt_host(url, download_path, task_info):
         task_info (tuple): A tuple containing progress tracking information.
 
     Raises:
+        requests.RequestException: If there is an error with the HTTP request.
         ValueError: If the alternative video URL cannot be retrieved.
     """
-    alt_video_url = get_alt_video_url(url)
-    if not alt_video_url:
+    try:
+        alt_video_url = get_alt_video_url(url)
+
+    except IndexError as indx_err:
         raise ValueError(
             f"Failed to retrieve alternative video URL for {url}."
-        )
+        ) from indx_err
 
-    (alt_filename, alt_download_link) = get_alt_download_link(alt_video_url)
-    alt_download_path = os.path.join(download_path, alt_filename)
-    download_episode(
-        alt_download_link, alt_download_path, task_info, is_default_host=False
+    (alt_filename, alt_download_link) = STREAMTAPE_RESOLVER.resolve(
+        alt_video_url, attempts=1
     )
+    cache_set(LINK, url, {'link': alt_download_link, 'filename': alt_filename})
+    alt_download_path = os.path.join(download_path, alt_filename)
 
-def extract_download_link(soup):
+    try:
+        download_episode(
+            alt_download_link, alt_download_path, task_info,
+            is_default_host=False, source_url=url
+        )
+
+    except requests.RequestException:
+        STREAMTAPE_RESOLVER.forget(alt_video_url)
+        raise
+
+@traced('parse')
+def extract_download_link(html):
     """
-    Extract the download link for a video from the provided BeautifulSoup
-    object.
+    Extract the download link for a video from the HTML content of the player
+    page. The link is set in a script, so it is searched for directly in the
+    text without building a tree.
 
     Args:
-        soup (BeautifulSoup): A BeautifulSoup object representing the HTML
-                              content of a webpage.
+        html (str): The HTML content of the player page.
 
     Returns:
         str: The extracted download link for the video, or None if no link is
              found.
     """
-    pattern = r'file:\s*"([^"]+)"'
-    script_tags = soup.find_all('script')
+    with PARSE_SECONDS.time('regex'):
+        match = DOWNLOAD_LINK_PATTERN.search(html)
 
-    for script_tag in script_tags:
-        if script_tag.string:
-            match = re.search(pattern, script_tag.string)
-            if match:
-                return match.group(1)
+    return match.group(1) if match else None
 
-    print("No download link found.")
-    return None
+def download_cached_link(url, download_path, task_info):
+    """
+    Downloads an episode from the download link cached for its video URL.
+    A cached link that has expired or fails is dropped from the cache.
+
+    Args:
+        url (str): The video URL.
+        download_path (str): The path to save the downloaded episode.
+        task_info (tuple): A tuple containing progress tracking information.
+
+    Returns:
+        bool: True if the episode was downloaded from the cached link, False
+              if it still has to be resolved.
+    """
+    cached_link = cache_get(LINK, url)
+    if not cached_link:
+        return False
+
+    (download_link, filename) = (cached_link['link'], cached_link['filename'])
+    if not is_link_expired(download_link):
+        try:
+            if filename:
+                download_episode(
+                    download_link, os.path.join(download_path, filename),
+                    task_info, is_default_host=False, source_url=url
+                )
+            else:
+                download_episode(
+                    download_link, download_path, task_info, source_url=url
+                )
+
+            return True
+
+        except (requests.RequestException, ValueError):
+            pass
+
+    cache_invalidate(LINK, url)
+    return False
+
+def download_from_default_host(url, download_path, task_info):
+    """
+    Resolves the download link of the default host from the player page and
+    downloads the episode.
+
+    Args:
+        url (str): The video URL.
+        download_path (str): The path to save the downloaded episode.
+        task_info (tuple): A tuple containing progress tracking information.
+
+    Raises:
+        requests.RequestException: If there is an error with the HTTP request.
+        ValueError: If the player page has no download link.
+    """
+    download_link = extract_download_link(fetch_text(url, attempts=1))
+    if not download_link:
+        raise ValueError(f"No download link found for {url}.")
+
+    cache_set(LINK, url, {'link': download_link, 'filename': None})
+    download_episode(download_link, download_path, task_info, source_url=url)
 
 def process_video_url(url, download_path, task_info):
     """
     Processes a video URL to extract and download its associated files.
-    If no source links are found, it attempts to download from an alternative
-    host.
+    Episodes recorded as finished in the series manifest are skipped without
+    any request, and a download link cached by a previous run is used before
+    scraping the player page.
+
+    Transient errors are retried with backoff within a retry budget shared by
+    both hosts. When the default host keeps failing, or has no download link,
+    the episode fails over to the alternative host, and an episode that still
+    can't be downloaded is recorded for the failure summary.
 
     Args:
         url (str): The video URL.
         download_path (str): The path to save the downloaded episode.
         task_info (tuple): A tuple containing progress tracking information.
 
+    Returns:
+        bool: True if the episode is on disk, False if it failed.
+    """
+    if find_completed_episode(download_path, url):
+        mark_task_complete(task_info)
+        return True
+
+    if download_cached_link(url, download_path, task_info):
+        return True
+
+    budget = RetryBudget()
+    for download in (download_from_default_host, download_from_alt_host):
+        try:
+            retry_call(
+                download, url, download_path, task_info, budget=budget,
+                attempts=HOST_ATTEMPTS
+            )
+            return True
+
+        except FAILOVER_ERRORS as err:
+            error = err
+            if budget.exhausted:
+                break
+
+    record_failure('download', url, error, budget.used)
+    mark_task_failed(task_info, error)
+    return False
+
+def download_hanime(hanime_name, episodes, download_path):
+    """
+    Concurrently downloads episodes of a specified anime and tracks the
+    download progress in real-time. Each episode starts downloading as soon as
+    its page is resolved.
+
+    Parameters:
+        hanime_name (str): The name of the hanime being downloaded.
+        episodes (list): The `(episode_number, episode_url)` pairs of the
+                         episodes to download.
+        download_path (str): The local directory path where the downloaded
+                             episodes will be saved.
+
+    Returns:
+        bool: True if every episode is on disk.
+    """
+    job_progress = create_progress_bar()
+    records = label_episodes(resolve_video_urls(episodes), episodes)
+
+    with progress_display(hanime_name, job_progress):
+        results = run_in_parallel(
+            process_video_url, records, job_progress, download_path,
+            total=len(episodes)
+        )
+
+    return len(results) == len(episodes) and all(results)
+
+async def fetch_page_async(session, url, parse_only=None):
+    """
+    Fetches a webpage and parses it into a BeautifulSoup object in a worker
+    thread, so the parsing does not stall the event loop.
+
+    Args:
+        session (aiohttp.ClientSession): The client session.
+        url (str): The URL of the webpage to fetch.
+        parse_only (SoupStrainer, optional): Restricts the tree to the tags the
+                                             caller needs. Defaults to None.
+
+    Returns:
+        BeautifulSoup: A BeautifulSoup object representing the HTML content of
+                       the page.
+
     Raises:
-        requests.RequestException: If there is an error with the HTTP request
-                                   while processing the video URL.
+        requests.RequestException: If there is an error with the HTTP request.
     """
-    try:
-        soup = fetch_page(url)
+    html = await fetch_text_async(session, url)
+    return await asyncio.to_thread(parse_page, html, parse_only)
+
+async def resolve_alt_download_link_async(session, video_url):
+    """
+    Resolves a video player page into the download link of the alternative
+    host.
+
+    Args:
+        session (aiohttp.ClientSession): The client session.
+        video_url (str): The URL of the video player.
+
+    Returns:
+        tuple: The download link and the original filename.
+
+    Raises:
+        requests.RequestException: If there is an error with the HTTP request.
+        IndexError: If the alternative host link is not found.
+        ValueError: If the alternative host page has no download link.
+    """
+    alt_video_url = extract_alt_video_url(
+        await fetch_page_async(
+            session, video_url + ALT_SERVER_SUFFIX, ALT_PLAYER_STRAINER
+        )
+    )
+    (alt_filename, alt_download_link) = (
+        STREAMTAPE_RESOLVER.get_cached(alt_video_url)
+        or STREAMTAPE_RESOLVER.resolve_html(
+            alt_video_url, await fetch_text_async(session, alt_video_url)
+        )
+    )
+    return alt_download_link, alt_filename
+
+async def resolve_download_link_async(session, video_url):
+    """
+    Resolves a video player page into the final download link, falling back
+    to the alternative host when the player has no source link.
+
+    Args:
+        session (aiohttp.ClientSession): The client session.
+        video_url (str): The URL of the video player.
+
+    Returns:
+        tuple: The download link and, for the alternative host, the original
+               filename (None for the default host).
+
+    Raises:
+        requests.RequestException: If there is an error with the HTTP request.
+        IndexError: If the alternative host link is not found.
+        ValueError: If the alternative host page has no download link.
+    """
+    download_link = extract_download_link(
+        await fetch_text_async(session, video_url)
+    )
+    if download_link:
+        return download_link, None
+
+    return await resolve_alt_download_link_async(session, video_url)
+
+async def resolve_episode_async(session, episode, download_path):
+    """
+    Resolves an episode page into the final download link of the episode,
+    using the links cached by previous runs when they are still valid.
+    Transient errors are retried with backoff, and episodes that still can't
+    be resolved are recorded for the failure summary.
+
+    Args:
+        session (aiohttp.ClientSession): The client session.
+        episode (tuple): The episode number and the episode page URL.
+        download_path (str): The directory path where the episode will be
+                             saved.
 
-        download_link = extract_download_link(soup)
-        if download_link:
-            download_episode(download_link, download_path, task_info)
+    Returns:
+        tuple: The episode number, the video URL, the download link and the
+               path where the episode will be saved, or None if the episode
+               can't be resolved. The download link is None when the episode
+               is already recorded as finished in the series manifest.
+    """
+    (episode_number, episode_url) = episode
+    budget = RetryBudget(PAGE_ATTEMPTS)
+
+    try:
+        video_url = cache_get(VIDEO, episode_url) or extract_video_url(
+            await retry_call_async(
+                fetch_page_async, session, episode_url, EPISODE_STRAINER,
+                budget=budget, attempts=PAGE_ATTEMPTS
+            )
+        )
+        if not video_url:
+            raise IndexError("No video player found.")
+
+        cache_set(VIDEO, episode_url, video_url)
+        completed_path = find_completed_episode(download_path, video_url)
+        if completed_path:
+            return episode_number, video_url, None, completed_path
+
+        cached_link = cache_get(LINK, video_url)
+        if cached_link and not is_link_expired(cached_link['link']):
+            (download_link, file_name) = (
+                cached_link['link'], cached_link['filename']
+            )
         else:
-            download_from_alt_host(url, download_path, task_info)
+            (download_link, file_name) = await retry_call_async(
+                resolve_download_link_async, session, video_url,
+                budget=RetryBudget(PAGE_ATTEMPTS), attempts=PAGE_ATTEMPTS
+            )
+            cache_set(
+                LINK, video_url, {'link': download_link, 'filename': file_name}
+            )
+
+        file_name = file_name or get_episode_filename(download_link)
+        return (
+            episode_number, video_url, download_link,
+            os.path.join(download_path, file_name)
+        )
+
+    except (requests.RequestException, IndexError, ValueError) as err:
+        record_failure('episode', episode_url, err, budget.used)
+
+    return None
+
+async def download_job_async(session, job, task_info):
+    """
+    Downloads a resolved episode with the asyncio engine. Transient errors
+    are retried with backoff, and when the download link keeps failing the
+    episode fails over to the alternative host, within a retry budget shared
+    by both hosts.
+
+    Args:
+        session (aiohttp.ClientSession): The client session.
+        job (tuple): The episode number, the video URL, the download link and
+                     the path where the episode will be saved.
+        task_info (tuple): A tuple containing progress tracking information.
+
+    Returns:
+        bool: True if the episode was downloaded, False if it failed.
+    """
+    (_, video_url, download_link, final_path) = job
+    budget = RetryBudget()
+
+    try:
+        (headers, checksum) = await retry_call_async(
+            download_file_async, session, download_link, final_path,
+            task_info, budget=budget, attempts=HOST_ATTEMPTS
+        )
 
-    except requests.RequestException as req_err:
-        print(f"Error processing video URL {url}: {req_err}")
+    except (requests.RequestException, ValueError) as download_err:
+        cache_invalidate(LINK, video_url)
+        error = download_err
+        headers = None
+
+    if headers is None and not budget.exhausted:
+        try:
+            (alt_download_link, alt_filename) = (
+                await resolve_alt_download_link_async(session, video_url)
+            )
+            if alt_download_link == download_link:
+                raise error
+
+            final_path = os.path.join(
+                os.path.dirname(final_path), alt_filename
+            )
+            (headers, checksum) = await retry_call_async(
+                download_file_async, session, alt_download_link, final_path,
+                task_info, budget=budget, attempts=HOST_ATTEMPTS
+            )
 
-def download_hanime(hanime_name, video_urls, download_path):
+        except FAILOVER_ERRORS as alt_err:
+            error = alt_err
+
+    if headers is None:
+        record_failure('download', video_url, error, budget.used)
+        mark_task_failed(task_info, error)
+        return False
+
+    record_download(final_path, headers, video_url, checksum)
+    return True
+
+async def download_hanime_async(hanime_name, episodes, download_path):
     """
-    Concurrently downloads episodes of a specified anime from provided video
-    URLs and tracks the download progress in real-time.
+    Downloads episodes with the asyncio engine: every episode is resolved and
+    queued for download as soon as its pages are scraped, instead of waiting
+    for the whole series to be resolved.
 
     Parameters:
         hanime_name (str): The name of the hanime being downloaded.
-        video_urls (list): A list of URLs corresponding to each episode to be
-                           downloaded.
+        episodes (list): The `(episode_number, episode_url)` pairs of the
+                         episodes to download.
         download_path (str): The local directory path where the downloaded
                              episodes will be saved.
+
+    Returns:
+        bool: True if every episode is on disk.
     """
     job_progress = create_progress_bar()
-    progress_table = create_progress_table(hanime_name, job_progress)
+    overall_task = job_progress.add_task(
+        f"[{TASK_COLOR}]Progress", total=len(episodes), visible=True
+    )
+    results = []
+
+    async with create_client_session() as session:
+        async def resolve(episode):
+            job = await resolve_episode_async(session, episode, download_path)
+            if job is None:
+                task = job_progress.add_task(
+                    f"[{TASK_COLOR}]{get_episode_label(episode[0], episodes)}",
+                    total=None, visible=False
+                )
+                mark_task_failed((job_progress, task, overall_task))
+
+            return job
+
+        async def download(job):
+            (episode_number, _, download_link, _) = job
+            task = job_progress.add_task(
+                f"[{TASK_COLOR}]{get_episode_label(episode_number, episodes)}",
+                total=None, visible=False
+            )
+            task_info = (job_progress, task, overall_task)
+            if download_link is None:
+                mark_task_complete(task_info)
+                results.append(True)
+                return
+
+            # Shown once the transfer holds a slot of the download limiter
+            queue_task(task_info)
+            try:
+                results.append(
+                    await download_job_async(session, job, task_info)
+                )
+
+            finally:
+                dequeue_task(task_info)
 
-    with Live(progress_table, refresh_per_second=10):
-        run_in_parallel(
-            process_video_url, video_urls, job_progress, download_path
+        with progress_display(hanime_name, job_progress):
+            await run_pipeline(episodes, resolve, download)
+
+    return len(results) == len(episodes) and all(results)
+
+def prepare_hanime_download(url, start_episode=None, end_episode=None):
+    """
+    Fetches the page of a Hanime series and prepares its download: extracts
+    the name, creates the download directory and lists the episode URLs.
+
+    Args:
+        url (str): The URL of the Hanime series to download.
+        start_episode (int, optional): The starting episode number. Defaults to
+                                       None.
+        end_episode (int, optional): The ending episode number. Defaults to
+                                     None.
+
+    Returns:
+        tuple: The hanime name, the download path and the list of
+               `(episode_number, episode_url)` pairs of the selected episodes.
+
+    Raises:
+        requests.RequestException: If the series page can't be fetched.
+        ValueError: If there is an issue extracting the Hanime name from the
+                    page content.
+        OSError: If the download directory can't be created.
+    """
+    cached_series = cache_get(EPISODES, url)
+    if cached_series:
+        (hanime_name, all_episode_urls) = cached_series
+    else:
+        soup = fetch_page(url, parse_only=SERIES_STRAINER)
+        hanime_name = format_hanime_name(extract_hanime_name(soup))
+        all_episode_urls = get_episode_urls(soup)
+        cache_set(EPISODES, url, [hanime_name, all_episode_urls])
+
+    download_path = create_download_directory(hanime_name)
+    episodes = select_episodes(
+        list(enumerate(all_episode_urls, 1)),
+        start_episode=start_episode,
+        end_episode=end_episode
+    )
+    return hanime_name, download_path, episodes
+
+def download_episodes(hanime_name, episodes, download_path, engine='thread'):
+    """
+    Downloads episodes with the selected engine.
+
+    Args:
+        hanime_name (str): The name of the hanime being downloaded.
+        episodes (list): The `(episode_number, episode_url)` pairs of the
+                         episodes to download.
+        download_path (str): The local directory path where the downloaded
+                             episodes will be saved.
+        engine (str, optional): The download engine, either 'thread' or
+                                'async'. Defaults to 'thread'.
+
+    Returns:
+        bool: True if every episode is on disk.
+    """
+    if engine == 'async':
+        return asyncio.run(
+            download_hanime_async(hanime_name, episodes, download_path)
         )
 
-def process_hanime_download(url, start_episode=None, end_episode=None):
+    return download_hanime(hanime_name, episodes, download_path)
+
+def process_hanime_download(
+        url, start_episode=None, end_episode=None, engine='thread'
+):
     """
     Download a series of Hanime episodes from the specified URL.
 
@@ -311,27 +945,290 @@ def process_hanime_download(url, start_episode=None, end_episode=None):
                                        None.
         end_episode (int, optional): The ending episode number. Defaults to
                                      None.
+        engine (str, optional): The download engine, either 'thread' or
+                                'async'. Defaults to 'thread'.
 
-    Raises:
-        ValueError: If there is an issue extracting the Hanime ID or name
-                    from the URL or the page content.
+    A series whose page can't be fetched or parsed, or whose directory can't
+    be created, is recorded for the failure summary.
+    """
+    try:
+        (hanime_name, download_path, episodes) = prepare_hanime_download(
+            url, start_episode=start_episode, end_episode=end_episode
+        )
+        download_episodes(hanime_name, episodes, download_path, engine)
+
+    except (requests.RequestException, ValueError, OSError) as err:
+        record_failure('series', url, err)
+
+    except RuntimeError as engine_err:
+        # The async engine is unavailable without aiohttp
+        report_message(f"Error downloading {url}: {engine_err}")
+
+def sync_hanime_download(
+        url, start_episode=None, end_episode=None, engine='thread'
+):
+    """
+    Downloads the episodes added to a series since its last sync. The series
+    page is requested with the validators stored by the last sync, so that an
+    unchanged series costs a single 304 response, and only the episodes
+    missing from the stored episode list are resolved and downloaded. The
+    state of the series is stored once all of them are on disk, so that the
+    episodes that failed are tried again by the next sync.
+
+    Args:
+        url (str): The URL of the Hanime series to sync.
+        start_episode (int, optional): The starting episode number. Defaults to
+                                       None.
+        end_episode (int, optional): The ending episode number. Defaults to
+                                     None.
+        engine (str, optional): The download engine, either 'thread' or
+                                'async'. Defaults to 'thread'.
+
+    A series whose page can't be fetched or parsed, or whose directory can't
+    be created, is recorded for the failure summary.
     """
-    soup = fetch_page(url)
+    state = get_sync_state(url)
 
     try:
+        page = fetch_text_if_modified(url, get_conditional_headers(state))
+        if page is None:
+            mark_series_unchanged(url)
+            return
+
+        (html, etag, last_modified) = page
+        soup = parse_page(html, parse_only=SERIES_STRAINER)
         hanime_name = format_hanime_name(extract_hanime_name(soup))
-        download_path = create_download_directory(hanime_name)
+        all_episode_urls = get_episode_urls(soup)
+        cache_set(EPISODES, url, [hanime_name, all_episode_urls])
+
+        known_urls = set(state['episodes']) if state else set()
+        episodes = [
+            (episode_number, episode_url)
+            for (episode_number, episode_url) in select_episodes(
+                list(enumerate(all_episode_urls, 1)),
+                start_episode=start_episode,
+                end_episode=end_episode
+            )
+            if episode_url not in known_urls
+        ]
+        if episodes and not download_episodes(
+            hanime_name, episodes, create_download_directory(hanime_name),
+            engine
+        ):
+            return
+
+        save_sync_state(
+            url, etag, last_modified,
+            sorted(known_urls.union(
+                episode_url for (_, episode_url) in episodes
+            ))
+        )
+
+    except (requests.RequestException, ValueError, OSError) as err:
+        record_failure('series', url, err)
+
+    except RuntimeError as engine_err:
+        # The async engine is unavailable without aiohttp
+        report_message(f"Error syncing {url}: {engine_err}")
+
+def add_cache_arguments(parser):
+    """
+    Adds the options controlling the scraping cache to an argument parser.
 
-        episode_urls = get_episode_urls(
-            soup,
-            start_episode=start_episode,
-            end_episode=end_episode
+    Args:
+        parser (argparse.ArgumentParser): The argument parser to extend.
+    """
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help="Neither read nor write the cache of scraped pages and links."
+    )
+    parser.add_argument(
+        '--refresh', action='store_true',
+        help="Ignore the cached pages and links, and scrape them again."
+    )
+
+def add_concurrency_arguments(parser):
+    """
+    Adds the bounds of the adaptive download limiter to an argument parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The argument parser to extend.
+    """
+    parser.add_argument(
+        '--min-workers', type=int, default=MIN_WORKERS,
+        help="The lowest number of simultaneous downloads."
+    )
+    parser.add_argument(
+        '--max-workers', type=int, default=MAX_WORKERS,
+        help="The highest number of simultaneous downloads."
+    )
+
+def add_http_arguments(parser):
+    """
+    Adds the transport of the page requests to an argument parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The argument parser to extend.
+    """
+    parser.add_argument(
+        '--http2', action='store_true',
+        help=(
+            "Scrape the pages over HTTP/2, multiplexing the requests to each "
+            "host over one connection (requires httpx and h2)."
+        )
+    )
+
+def configure_http(args):
+    """
+    Sets the transport of the page requests from the command line.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments.
+    """
+    if args.http2 and not configure_http2(True):
+        report_message(
+            "HTTP/2 requires the httpx and h2 packages, using HTTP/1.1.",
+            event='warning'
+        )
+
+def add_rate_limit_arguments(parser):
+    """
+    Adds the bandwidth and request rate limits to an argument parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The argument parser to extend.
+    """
+    parser.add_argument(
+        '--limit-rate', type=parse_rate, default=None,
+        help="The total download speed limit in bytes/s (e.g. 500K, 2M)."
+    )
+    parser.add_argument(
+        '--host-limit-rate', type=parse_rate, default=None,
+        help="The download speed limit of each host in bytes/s."
+    )
+    parser.add_argument(
+        '--requests-per-second', type=float, default=None,
+        help="The maximum number of page requests per second."
+    )
+    parser.add_argument(
+        '--limits-file', default=CONTROL_FILE,
+        help="A JSON file whose edits change the limits while running."
+    )
+
+def configure_rate_limits(args):
+    """
+    Applies the rate limits given on the command line and starts watching the
+    control file for changes.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments.
+    """
+    configure_limits(
+        bandwidth=args.limit_rate,
+        host_bandwidth=args.host_limit_rate,
+        requests_per_second=args.requests_per_second
+    )
+    watch_control_file(args.limits_file)
+
+def add_progress_arguments(parser):
+    """
+    Adds the choice of the progress display to an argument parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The argument parser to extend.
+    """
+    parser.add_argument(
+        '--progress', choices=PROGRESS_MODES, default=AUTO,
+        help=(
+            "How to report the progress: rendered in the terminal (rich), as "
+            "JSON-lines events (json) or not at all (silent). By default, it "
+            "is rendered only when the output is a terminal."
         )
-        video_urls = get_video_urls(episode_urls)
-        download_hanime(hanime_name, video_urls, download_path)
+    )
 
-    except ValueError as val_err:
-        print(f"Value error: {val_err}")
+def add_write_arguments(parser):
+    """
+    Adds the fsync policy and the checksum algorithm of the downloaded files
+    to an argument parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The argument parser to extend.
+    """
+    parser.add_argument(
+        '--fsync', type=parse_fsync_policy, default=FSYNC_NEVER,
+        help=(
+            "When to sync the downloaded files to disk: never, once complete "
+            "(complete), or every given amount of data (e.g. 64M)."
+        )
+    )
+    parser.add_argument(
+        '--checksum', choices=HASH_ALGORITHMS + (NO_CHECKSUM,),
+        default=CHECKSUM_STATE['algorithm'],
+        help=(
+            "The hash algorithm of the checksums recorded in the manifests "
+            f"(default: {CHECKSUM_STATE['algorithm']})."
+        )
+    )
+
+def add_metrics_arguments(parser):
+    """
+    Adds the options of the metrics endpoint and summary to an argument
+    parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The argument parser to extend.
+    """
+    parser.add_argument(
+        '--metrics-port', type=int, default=None,
+        help="Serve Prometheus metrics on http://127.0.0.1:<port>/metrics."
+    )
+    parser.add_argument(
+        '--metrics-file', default=os.path.join(DOWNLOAD_FOLDER, METRICS_FILE),
+        help="The file the final metrics are written to."
+    )
+
+def start_metrics(args):
+    """
+    Starts the metrics endpoint if a port was given on the command line.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments.
+    """
+    if args.metrics_port is None:
+        return
+
+    try:
+        start_metrics_server(args.metrics_port)
+
+    except OSError as os_err:
+        report_message(f"Error starting the metrics endpoint: {os_err}")
+
+def add_trace_arguments(parser):
+    """
+    Adds the options of the phase trace and profiles to an argument parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The argument parser to extend.
+    """
+    parser.add_argument(
+        '--trace', nargs='?', const=os.path.join(DOWNLOAD_FOLDER, TRACE_FILE),
+        default=None, metavar='FILE',
+        help=(
+            "Record the page fetches, parsing, transfers and writes of every "
+            "thread, and export them as a Chrome trace viewable in Perfetto "
+            f"(default file: {DOWNLOAD_FOLDER}/{TRACE_FILE})."
+        )
+    )
+    parser.add_argument(
+        '--profile', nargs='?',
+        const=os.path.join(DOWNLOAD_FOLDER, PROFILE_FOLDER), default=None,
+        metavar='DIR',
+        help=(
+            "Profile every phase with cProfile and write one <phase>.prof "
+            f"file per phase (default directory: "
+            f"{DOWNLOAD_FOLDER}/{PROFILE_FOLDER})."
+        )
+    )
 
 def setup_parser():
     """
@@ -350,6 +1247,25 @@ def setup_parser():
     parser.add_argument(
         '--end', type=int, default=None, help="The ending episode number."
     )
+    parser.add_argument(
+        '--engine', choices=['thread', 'async'], default='thread',
+        help="The download engine to use (the async one requires aiohttp)."
+    )
+    parser.add_argument(
+        '--sync', action='store_true',
+        help=(
+            "Only download the episodes added since the last sync, checking "
+            "the series page with a conditional request."
+        )
+    )
+    add_cache_arguments(parser)
+    add_concurrency_arguments(parser)
+    add_http_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_progress_arguments(parser)
+    add_write_arguments(parser)
+    add_metrics_arguments(parser)
+    add_trace_arguments(parser)
     return parser
 
 def main():
@@ -360,14 +1276,31 @@ def main():
         <hanime_url> (str): The URL of the hanime page to download
                             episodes from.
     """
-    clear_terminal()
     parser = setup_parser()
     args = parser.parse_args()
-    process_hanime_download(
+    configure_progress(args.progress)
+    if is_interactive():
+        clear_terminal()
+
+    configure_cache(enabled=not args.no_cache, refresh=args.refresh)
+    DOWNLOAD_LIMITER.configure(args.min_workers, args.max_workers)
+    configure_fsync(args.fsync)
+    configure_checksum(args.checksum)
+    setup_logging()
+    configure_http(args)
+    configure_rate_limits(args)
+    start_metrics(args)
+    configure_tracing(args.trace, args.profile)
+    download = sync_hanime_download if args.sync else process_hanime_download
+    download(
         args.url,
         start_episode=args.start,
-        end_episode=args.end
+        end_episode=args.end,
+        engine=args.engine
     )
+    print_failure_summary()
+    write_metrics_summary(args.metrics_file)
+    finish_tracing(args.trace, args.profile)
 
 if __name__ == '__main__':
     main()
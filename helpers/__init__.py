@@ -4,13 +4,25 @@ the main application. These utilities include functions for downloading,
 file management, URL handling, progress tracking, and more.
 
 Modules:
+    - async_utils: Building blocks of the optional asyncio download engine.
+    - cache_utils: Persistent cache of scraped pages and resolved links.
+    - checksum_utils: Inline and memory-mapped checksums of the downloads.
+    - concurrency_utils: Adaptive controller of simultaneous downloads.
     - download_utils: Functions for handling downloads.
     - file_utils: Utilities for managing file operations.
     - format_utils: Utilities for processing and formatting strings or URLs.
     - general_utils: Miscellaneous utility functions.
+    - http_utils: Shared pooled HTTP sessions for scraping and downloading.
+    - manifest_utils: Per-series manifest of finished downloads.
+    - metrics_utils: Prometheus-style metrics, endpoint and summary file.
     - progress_utils: Tools for progress tracking and reporting.
+    - queue_utils: Durable job queue of the download daemon.
+    - rate_limit_utils: Token-bucket bandwidth and request rate limits.
+    - retry_utils: Retry engine with backoff and the final failure summary.
     - streamtape_utils: Module for extracting the download link from a
                         Streamtape URL.
+    - sync_utils: Stored state of the series followed in sync mode.
+    - trace_utils: Phase spans with Chrome trace export and cProfile dumps.
 
 This package is designed to be reusable and modular, allowing its components 
 to be easily imported and used across different parts of the application.
@@ -19,10 +31,22 @@ to be easily imported and used across different parts of the application.
 # helpers/__init__.py
 
 __all__ = [
+    "async_utils",
+    "cache_utils",
+    "checksum_utils",
+    "concurrency_utils",
     "download_utils",
     "file_utils",
     "format_utils",
     "general_utils",
+    "http_utils",
+    "manifest_utils",
+    "metrics_utils",
     "progress_utils",
+    "queue_utils",
+    "rate_limit_utils",
+    "retry_utils",
     "streamtape_utils",
+    "sync_utils",
+    "trace_utils",
 ]
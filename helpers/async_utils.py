@@ -0,0 +1,445 @@
+"""
+This module provides the building blocks of the asyncio download engine: an
+aiohttp client session sharing the default headers, page and file transfers
+whose disk writes run off the event loop, and a pipeline that streams every
+resolved item straight into a download queue. The transfers share the
+adaptive download limiter and the per-host caps of the thread engine.
+
+The engine requires the optional `aiohttp` package.
+"""
+
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .http_utils import HEADERS, get_host_slot
+from .concurrency_utils import DOWNLOAD_LIMITER
+from .manifest_utils import check_remote_file
+from .metrics_utils import (
+    ACTIVE_DOWNLOADS, DOWNLOADS, PAGE_FETCH_SECONDS, QUEUE_DEPTH
+)
+from .progress_utils import PROGRESS_REPORTER
+from .rate_limit_utils import get_host_bucket, reserve_bytes, throttle_request
+from .checksum_utils import create_hasher, format_checksum
+from .retry_utils import get_status
+from .trace_utils import traced
+from .download_utils import (
+    PART_SUFFIX, OutputWriter, ChunkSizer, get_chunk_size, check_resume_range,
+    get_resume_headers, write_journal, open_part_file, commit_part_file,
+    discard_partial_download, mark_task_complete, start_task,
+    check_stream_length
+)
+
+SCRAPE_LIMIT = 4
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+SLOT_POLL_INTERVAL = 0.05    # Seconds between two tries to take a slot
+
+def create_client_session(connection_limit=None):
+    """
+    Creates an aiohttp client session with the default headers and a shared
+    connection pool.
+
+    Args:
+        connection_limit (int, optional): The maximum number of simultaneous
+                                          connections. Defaults to None, for
+                                          the scraping limit plus the highest
+                                          number of downloads.
+
+    Returns:
+        aiohttp.ClientSession: The client session.
+
+    Raises:
+        RuntimeError: If the `aiohttp` package is not installed.
+    """
+    if aiohttp is None:
+        raise RuntimeError(
+            "The async engine requires aiohttp (pip install aiohttp)."
+        )
+
+    if connection_limit is None:
+        connection_limit = SCRAPE_LIMIT + DOWNLOAD_LIMITER.max_limit
+
+    return aiohttp.ClientSession(
+        headers=HEADERS,
+        connector=aiohttp.TCPConnector(limit=connection_limit),
+        timeout=aiohttp.ClientTimeout(
+            sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+        )
+    )
+
+def to_request_error(client_err, message):
+    """
+    Converts an aiohttp error into the matching `requests` error, so that the
+    errors of both engines are classified alike by the retry engine.
+
+    Args:
+        client_err (Exception): The aiohttp or timeout error.
+        message (str): The message of the converted error.
+
+    Returns:
+        requests.RequestException: The converted error.
+    """
+    if isinstance(client_err, aiohttp.ClientResponseError):
+        response = requests.Response()
+        response.status_code = client_err.status
+        response.headers.update(client_err.headers or {})
+        return requests.HTTPError(message, response=response)
+
+    if isinstance(client_err, asyncio.TimeoutError):
+        return requests.Timeout(message)
+
+    if isinstance(client_err, aiohttp.ClientPayloadError):
+        return requests.exceptions.ChunkedEncodingError(message)
+
+    if isinstance(client_err, aiohttp.ClientConnectionError):
+        return requests.ConnectionError(message)
+
+    return requests.RequestException(message)
+
+@traced('network', 'GET')
+async def fetch_text_async(session, url):
+    """
+    Fetches the text content of a webpage.
+
+    Args:
+        session (aiohttp.ClientSession): The client session.
+        url (str): The URL of the webpage to fetch.
+
+    Returns:
+        str: The text content of the page.
+
+    Raises:
+        requests.RequestException: If the request fails or returns an error
+                                   status.
+    """
+    await asyncio.to_thread(throttle_request)
+
+    try:
+        with PAGE_FETCH_SECONDS.time():
+            async with session.get(url, raise_for_status=True) as response:
+                return await response.text()
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as client_err:
+        raise to_request_error(
+            client_err, f"Error fetching {url}: {client_err}"
+        ) from client_err
+
+async def acquire_async(lock):
+    """
+    Takes a lock or slot shared with the worker threads without blocking the
+    event loop, trying again at a short interval while none is free.
+
+    Args:
+        lock: An object with an `acquire(blocking=False)` method, such as a
+              semaphore or the download limiter.
+    """
+    while not lock.acquire(blocking=False):
+        await asyncio.sleep(SLOT_POLL_INTERVAL)
+
+@asynccontextmanager
+async def download_slot_async(download_link):
+    """
+    Holds a slot of the adaptive download limiter and a transfer slot of the
+    link's host for the duration of the context, as the thread engine does.
+
+    Args:
+        download_link (str): The URL of the file to download.
+    """
+    await acquire_async(DOWNLOAD_LIMITER)
+    try:
+        host_slot = get_host_slot(download_link)
+        await acquire_async(host_slot)
+        try:
+            yield
+
+        finally:
+            host_slot.release()
+
+    finally:
+        DOWNLOAD_LIMITER.release()
+
+async def iter_body_async(response, file_size):
+    """
+    Iterates over the body of a response. Bodies of known size are read in
+    chunks sized from the file size, and bodies of unknown size in chunks that
+    grow with the measured throughput.
+
+    Args:
+        response (aiohttp.ClientResponse): The response of the download.
+        file_size (int): The full size of the file in bytes, or -1 if unknown.
+
+    Yields:
+        bytes: The chunks of the decoded body.
+    """
+    if file_size > 0:
+        async for chunk in response.content.iter_chunked(
+            get_chunk_size(file_size)
+        ):
+            yield chunk
+        return
+
+    sizer = ChunkSizer()
+    while True:
+        chunk = await response.content.read(sizer.chunk_size)
+        if not chunk:
+            return
+
+        yield chunk
+        sizer.update(len(chunk))
+
+async def save_response_async(response, final_path, task_info):
+    """
+    Writes the body of a response to the `.part` file while tracking progress,
+    then renames it to the final path. The chunks are gathered in the buffer
+    of an `OutputWriter` and hashed on the way, and the writes to disk run in
+    a worker thread so they never block the event loop.
+
+    Args:
+        response (aiohttp.ClientResponse): The response of the download.
+        final_path (str): The path where the file will be saved.
+        task_info (tuple): A tuple containing progress-related objects:
+                           - job_progress: The progress tracker for the job.
+                           - task: The specific task being tracked.
+                           - overall_task: The overall task tracker.
+
+    Returns:
+        str: The checksum of the file, or None if checksums are disabled.
+
+    Raises:
+        aiohttp.ClientPayloadError: If the body is cut short.
+        ValueError: If the response is a range response that does not continue
+                    the partial file.
+    """
+    offset = check_resume_range(response.status, response.headers, final_path)
+    if offset is None:
+        raise ValueError(f"Range response does not match {final_path}.")
+
+    content_length = response.content_length
+    encoding = response.headers.get('content-encoding', 'identity')
+
+    # The length of a compressed body is not the size of the decoded file
+    file_size = (
+        offset + content_length
+        if content_length and encoding.lower() == 'identity' else -1
+    )
+    PROGRESS_REPORTER.track(task_info, file_size if file_size > 0 else None)
+    counter = PROGRESS_REPORTER.add_counter(task_info, offset)
+
+    await asyncio.to_thread(
+        write_journal, final_path, response, file_size, written=offset
+    )
+    file_descriptor = await asyncio.to_thread(
+        open_part_file, final_path, offset, file_size
+    )
+    writer = OutputWriter(file_descriptor, offset)
+    hasher = await asyncio.to_thread(
+        create_hasher, final_path + PART_SUFFIX, offset
+    )
+    host_bucket = get_host_bucket(str(response.url))
+
+    try:
+        async for chunk in iter_body_async(response, file_size):
+            if writer.needs_flush(len(chunk)):
+                await asyncio.to_thread(writer.write, chunk)
+            else:
+                writer.write(chunk)
+            if hasher:
+                hasher.update(chunk)
+            DOWNLOAD_LIMITER.record_bytes(len(chunk))
+            wait = reserve_bytes(host_bucket, len(chunk))
+            if wait > 0:
+                await asyncio.sleep(wait)
+            counter.completed += len(chunk)
+
+        await asyncio.to_thread(writer.close)
+        try:
+            check_stream_length(writer.position, file_size)
+
+        except requests.RequestException as length_err:
+            raise aiohttp.ClientPayloadError(str(length_err)) from length_err
+
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        await asyncio.to_thread(writer.flush)
+        await asyncio.to_thread(
+            write_journal, final_path, response, file_size,
+            written=writer.position
+        )
+        raise
+
+    finally:
+        await asyncio.to_thread(os.close, file_descriptor)
+
+    await asyncio.to_thread(commit_part_file, final_path)
+    mark_task_complete(task_info)
+    return format_checksum(hasher)
+
+@traced('download')
+async def download_file_async(session, download_link, final_path, task_info):
+    """
+    Downloads a file to the specified path, resuming a partial file left by a
+    previous run with a Range request when the server supports it. As in the
+    thread engine, a file already on disk is skipped if a HEAD request shows
+    the remote file is unchanged, and the transfer waits for a slot of the
+    adaptive download limiter and of its host.
+
+    Args:
+        session (aiohttp.ClientSession): The client session.
+        download_link (str): The URL of the file.
+        final_path (str): The path where the file will be saved.
+        task_info (tuple): A tuple containing progress-related objects.
+
+    Returns:
+        tuple: The headers of the download response
+               (`multidict.CIMultiDictProxy`), or of the HEAD response of a
+               skipped file, and the checksum of the file (None when
+               skipped).
+
+    Raises:
+        requests.RequestException: If the request fails or returns an error
+                                   status.
+        ValueError: If the response does not continue the partial file.
+    """
+    host = urlparse(download_link).netloc
+
+    try:
+        remote_headers = await asyncio.to_thread(
+            check_remote_file, download_link, final_path
+        )
+        if remote_headers is not None:
+            mark_task_complete(task_info)
+            DOWNLOADS.inc(host, 'skipped')
+            return remote_headers, None
+
+        async with download_slot_async(download_link):
+            start_task(task_info)
+            result = await transfer_file_async(
+                session, download_link, final_path, task_info
+            )
+
+    except requests.RequestException as req_err:
+        DOWNLOAD_LIMITER.record_error(get_status(req_err))
+        DOWNLOADS.inc(host, 'failed')
+        raise
+
+    except ValueError:
+        DOWNLOADS.inc(host, 'failed')
+        raise
+
+    DOWNLOADS.inc(host, 'done')
+    return result
+
+async def transfer_file_async(session, download_link, final_path, task_info):
+    """
+    Transfers a file, resuming its partial file when the range response
+    continues it, and starting over when the partial file can't be resumed
+    (416 response, wrong offset or changed ETag).
+
+    Args:
+        session (aiohttp.ClientSession): The client session.
+        download_link (str): The URL of the file.
+        final_path (str): The path where the file will be saved.
+        task_info (tuple): A tuple containing progress-related objects.
+
+    Returns:
+        tuple: The headers of the download response and the checksum of the
+               file.
+
+    Raises:
+        requests.RequestException: If the request fails or returns an error
+                                   status.
+        ValueError: If the response does not continue the partial file.
+    """
+    resume_headers = get_resume_headers(final_path)
+
+    try:
+        async with session.get(
+            download_link, headers=resume_headers
+        ) as response:
+            can_resume = not resume_headers or (
+                response.status != 416
+                and check_resume_range(
+                    response.status, response.headers, final_path
+                ) is not None
+            )
+            if can_resume:
+                response.raise_for_status()
+                with ACTIVE_DOWNLOADS.track():
+                    checksum = await save_response_async(
+                        response, final_path, task_info
+                    )
+
+                return response.headers, checksum
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as client_err:
+        raise to_request_error(
+            client_err, f"Error downloading {download_link}: {client_err}"
+        ) from client_err
+
+    # The partial file can't be resumed, start over with a full download
+    await asyncio.to_thread(discard_partial_download, final_path)
+    return await transfer_file_async(
+        session, download_link, final_path, task_info
+    )
+
+async def run_pipeline(
+        items, resolve, download, scrape_limit=SCRAPE_LIMIT,
+        transfer_limit=None
+):
+    """
+    Resolves items concurrently and hands each result to the download stage
+    as soon as it is available, so transfers start before the scraping of the
+    remaining items is over.
+
+    Args:
+        items (iterable): The items to resolve.
+        resolve (coroutine function): Resolves an item into a download job, or
+                                      returns None to drop it.
+        download (coroutine function): Downloads a resolved job.
+        scrape_limit (int, optional): The maximum number of items resolved at
+                                      once. Defaults to `SCRAPE_LIMIT`.
+        transfer_limit (int, optional): The maximum number of jobs handed to
+                                        the download stage at once. Defaults
+                                        to None, for the highest limit of the
+                                        adaptive download limiter, which
+                                        gates the transfers themselves.
+    """
+    queue = asyncio.Queue()
+    scrape_semaphore = asyncio.Semaphore(scrape_limit)
+    end_of_queue = object()
+
+    async def produce(item):
+        async with scrape_semaphore:
+            job = await resolve(item)
+
+        if job is not None:
+            QUEUE_DEPTH.inc()
+            await queue.put(job)
+
+    async def consume():
+        while True:
+            job = await queue.get()
+            if job is end_of_queue:
+                return
+
+            QUEUE_DEPTH.dec()
+            await download(job)
+
+    consumers = [
+        asyncio.create_task(consume())
+        for _ in range(transfer_limit or DOWNLOAD_LIMITER.max_limit)
+    ]
+    await asyncio.gather(*(produce(item) for item in items))
+
+    for _ in consumers:
+        await queue.put(end_of_queue)
+
+    await asyncio.gather(*consumers)
@@ -0,0 +1,178 @@
+"""
+This module provides a persistent cache of scraped data, stored in a SQLite
+database under the download folder. It maps series URLs to their episode
+lists, episode URLs to their video URLs and video URLs to their final download
+links, so that re-running a partly finished batch needs almost no scraping
+requests. Each kind of entry has its own time-to-live, and the least recently
+used entries are evicted once the cache grows past its maximum size.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from urllib.parse import urlparse, parse_qs
+
+from .general_utils import DOWNLOAD_FOLDER
+
+CACHE_FILE = os.path.join(DOWNLOAD_FOLDER, ".cache.sqlite3")
+MAX_ENTRIES = 5000
+
+EPISODES = 'episodes'
+VIDEO = 'video'
+LINK = 'link'
+
+TTLS = {
+    EPISODES: 6 * 60 * 60,      # New episodes may be added to a series
+    VIDEO: 30 * 24 * 60 * 60,   # Episode pages rarely change
+    LINK: 60 * 60               # Download links carry short-lived tokens
+}
+
+# Links expiring within this many seconds are treated as already expired
+LINK_EXPIRY_MARGIN = 5 * 60
+EXPIRY_PARAMS = ('expires', 'expire', 'e')
+
+CACHE_LOCK = threading.Lock()
+CACHE_STATE = {'connection': None, 'enabled': True, 'refresh': False}
+
+def configure_cache(enabled=True, refresh=False):
+    """
+    Configures how the cache is used for the current run.
+
+    Args:
+        enabled (bool, optional): Whether the cache is read and written at
+                                  all. Defaults to True.
+        refresh (bool, optional): Whether cached entries are ignored and
+                                  replaced by freshly scraped ones. Defaults to
+                                  False.
+    """
+    CACHE_STATE['enabled'] = enabled
+    CACHE_STATE['refresh'] = refresh
+
+def get_connection():
+    """
+    Returns the connection to the cache database, creating the database on
+    first use. Must be called with `CACHE_LOCK` held.
+
+    Returns:
+        sqlite3.Connection: The connection to the cache database.
+    """
+    if CACHE_STATE['connection'] is None:
+        os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+        connection = sqlite3.connect(CACHE_FILE, check_same_thread=False)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "kind TEXT, key TEXT, value TEXT, stored_at REAL, "
+            "accessed_at REAL, PRIMARY KEY (kind, key))"
+        )
+        connection.commit()
+        CACHE_STATE['connection'] = connection
+
+    return CACHE_STATE['connection']
+
+def cache_get(kind, key):
+    """
+    Retrieves a cached entry if it is present and has not expired.
+
+    Args:
+        kind (str): The kind of entry (`EPISODES`, `VIDEO` or `LINK`).
+        key (str): The URL the entry was scraped from.
+
+    Returns:
+        The cached value, or None if there is no usable entry.
+    """
+    if not CACHE_STATE['enabled'] or CACHE_STATE['refresh']:
+        return None
+
+    now = time.time()
+    with CACHE_LOCK:
+        connection = get_connection()
+        row = connection.execute(
+            "SELECT value, stored_at FROM cache WHERE kind = ? AND key = ?",
+            (kind, key)
+        ).fetchone()
+        if row is None:
+            return None
+
+        (value, stored_at) = row
+        if now - stored_at > TTLS[kind]:
+            connection.execute(
+                "DELETE FROM cache WHERE kind = ? AND key = ?", (kind, key)
+            )
+            connection.commit()
+            return None
+
+        connection.execute(
+            "UPDATE cache SET accessed_at = ? WHERE kind = ? AND key = ?",
+            (now, kind, key)
+        )
+        connection.commit()
+        return json.loads(value)
+
+def cache_set(kind, key, value):
+    """
+    Stores an entry in the cache, evicting the least recently used entries if
+    the cache is full.
+
+    Args:
+        kind (str): The kind of entry (`EPISODES`, `VIDEO` or `LINK`).
+        key (str): The URL the entry was scraped from.
+        value: The JSON-serializable value to store.
+    """
+    if not CACHE_STATE['enabled']:
+        return
+
+    now = time.time()
+    with CACHE_LOCK:
+        connection = get_connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+            (kind, key, json.dumps(value), now, now)
+        )
+        connection.execute(
+            "DELETE FROM cache WHERE rowid IN ("
+            "SELECT rowid FROM cache ORDER BY accessed_at DESC "
+            "LIMIT -1 OFFSET ?)",
+            (MAX_ENTRIES,)
+        )
+        connection.commit()
+
+def cache_invalidate(kind, key):
+    """
+    Removes an entry from the cache, for instance when a cached download link
+    turns out to be no longer valid.
+
+    Args:
+        kind (str): The kind of entry (`EPISODES`, `VIDEO` or `LINK`).
+        key (str): The URL the entry was scraped from.
+    """
+    if not CACHE_STATE['enabled']:
+        return
+
+    with CACHE_LOCK:
+        connection = get_connection()
+        connection.execute(
+            "DELETE FROM cache WHERE kind = ? AND key = ?", (kind, key)
+        )
+        connection.commit()
+
+def is_link_expired(download_link):
+    """
+    Checks whether the token of a download link has expired (or is about to),
+    based on the expiry timestamp carried in its query string.
+
+    Args:
+        download_link (str): The download link to check.
+
+    Returns:
+        bool: True if the link carries an expiry timestamp that has passed.
+    """
+    query = parse_qs(urlparse(download_link).query)
+
+    for param in EXPIRY_PARAMS:
+        value = query.get(param, [''])[0]
+        if value.isdigit():
+            return int(value) < time.time() + LINK_EXPIRY_MARGIN
+
+    return False
@@ -0,0 +1,167 @@
+"""
+This module provides the checksums of the downloaded files. The chunks of a
+download are hashed as they are written, so a finished file gets its
+checksum without being read again, and the checksum is recorded in the series
+manifest as `<algorithm>:<hex digest>`. Whole files are hashed through memory
+maps, which lets a process pool re-verify a download tree without copying the
+data through read buffers.
+"""
+
+import os
+import mmap
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+HASH_ALGORITHMS = ('blake2b', 'sha256')
+NO_CHECKSUM = 'none'
+CHECKSUM_STATE = {'algorithm': 'blake2b'}
+
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+OK = 'ok'
+UNVERIFIED = 'unverified'
+MISSING = 'missing'
+INCOMPLETE = 'incomplete'
+CORRUPTED = 'corrupted'
+
+def configure_checksum(algorithm):
+    """
+    Sets the hash algorithm of the checksums of new downloads.
+
+    Args:
+        algorithm (str): One of `HASH_ALGORITHMS`, or `NO_CHECKSUM` to skip
+                         hashing.
+    """
+    CHECKSUM_STATE['algorithm'] = algorithm
+
+def update_from_file(hasher, path, start=0, end=None):
+    """
+    Feeds a byte range of a file to a hash object through a memory map.
+
+    Args:
+        hasher: The hash object.
+        path (str): The path of the file.
+        start (int, optional): The first byte to hash. Defaults to 0.
+        end (int, optional): The byte after the last one to hash. Defaults to
+                             None, for the end of the file.
+    """
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if end <= start:
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for position in range(start, end, HASH_BLOCK_SIZE):
+                    hasher.update(
+                        view[position:min(position + HASH_BLOCK_SIZE, end)]
+                    )
+
+            finally:
+                view.release()
+
+def create_hasher(path=None, length=0):
+    """
+    Creates the hash object of a download stream. When the stream resumes a
+    partial file, the part already on disk is hashed first.
+
+    Args:
+        path (str, optional): The path of the partial file. Defaults to None.
+        length (int, optional): The number of bytes of the partial file the
+                                stream continues. Defaults to 0.
+
+    Returns:
+        The hash object, or None if checksums are disabled.
+    """
+    algorithm = CHECKSUM_STATE['algorithm']
+    if algorithm == NO_CHECKSUM:
+        return None
+
+    hasher = hashlib.new(algorithm)
+    if length:
+        update_from_file(hasher, path, end=length)
+
+    return hasher
+
+def format_checksum(hasher):
+    """
+    Formats the checksum of a hash object as recorded in the manifest.
+
+    Args:
+        hasher: The hash object, or None.
+
+    Returns:
+        str: The checksum prefixed with the algorithm, or None without a hash
+             object.
+    """
+    if hasher is None:
+        return None
+
+    return f"{hasher.name}:{hasher.hexdigest()}"
+
+def compute_checksum(path, algorithm=None):
+    """
+    Computes the checksum of a whole file.
+
+    Args:
+        path (str): The path of the file.
+        algorithm (str, optional): The hash algorithm. Defaults to None, for
+                                   the configured one.
+
+    Returns:
+        str: The checksum prefixed with the algorithm, or None if checksums
+             are disabled.
+    """
+    algorithm = algorithm or CHECKSUM_STATE['algorithm']
+    if algorithm == NO_CHECKSUM:
+        return None
+
+    hasher = hashlib.new(algorithm)
+    update_from_file(hasher, path)
+    return format_checksum(hasher)
+
+def check_file(path, size, checksum):
+    """
+    Checks a file against the size and checksum recorded for it.
+
+    Args:
+        path (str): The path of the file.
+        size (int): The recorded size of the file.
+        checksum (str): The recorded checksum, or None.
+
+    Returns:
+        str: `OK`, `UNVERIFIED` (no checksum was recorded), `MISSING`,
+             `INCOMPLETE` (wrong size) or `CORRUPTED` (wrong checksum).
+    """
+    if not os.path.isfile(path):
+        return MISSING
+
+    if os.path.getsize(path) != size:
+        return INCOMPLETE
+
+    if not checksum:
+        return UNVERIFIED
+
+    (algorithm, _) = checksum.split(':', 1)
+    return OK if compute_checksum(path, algorithm) == checksum else CORRUPTED
+
+def check_files(entries, workers=None):
+    """
+    Checks several files in parallel worker processes.
+
+    Args:
+        entries (list): The `(path, size, checksum)` tuples of the files.
+        workers (int, optional): The number of worker processes. Defaults to
+                                 None, for one per CPU.
+
+    Yields:
+        tuple: The path of each file and its status, in the order of the
+               entries.
+    """
+    (paths, sizes, checksums) = zip(*entries) if entries else ((), (), ())
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from zip(
+            paths, executor.map(check_file, paths, sizes, checksums)
+        )
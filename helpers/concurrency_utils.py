@@ -0,0 +1,262 @@
+"""
+This module provides an adaptive controller for the number of simultaneous
+downloads. It follows an AIMD scheme (additive increase, multiplicative
+decrease): every few seconds it looks at the aggregate throughput, the
+per-stream speed and the errors seen since the last evaluation, then grows
+the number of active downloads by one while the throughput keeps improving,
+and halves it when the server starts answering 429/503.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+KB = 1024
+
+MIN_WORKERS = 1
+INITIAL_WORKERS = 3
+MAX_WORKERS = 8
+
+EVALUATION_INTERVAL = 5.0
+GROWTH_THRESHOLD = 0.05           # Minimum throughput gain to keep growing
+MIN_STREAM_SPEED = 100 * KB       # Slower streams risk timing out
+CONGESTION_STATUSES = (429, 503)
+
+logger = logging.getLogger(__name__)
+
+class AdaptiveLimiter:
+    """
+    Gates the active downloads behind a limit that is adjusted from the
+    observed throughput and errors.
+    """
+
+    def __init__(
+            self, min_limit=MIN_WORKERS, max_limit=MAX_WORKERS,
+            initial_limit=INITIAL_WORKERS, interval=EVALUATION_INTERVAL
+    ):
+        """
+        Initializes the limiter.
+
+        Args:
+            min_limit (int, optional): The lowest number of active downloads.
+                                       Defaults to `MIN_WORKERS`.
+            max_limit (int, optional): The highest number of active downloads.
+                                       Defaults to `MAX_WORKERS`.
+            initial_limit (int, optional): The number of active downloads to
+                                           start with. Defaults to
+                                           `INITIAL_WORKERS`.
+            interval (float, optional): The time (in seconds) between two
+                                        evaluations. Defaults to
+                                        `EVALUATION_INTERVAL`.
+        """
+        self.condition = threading.Condition()
+        self.counter_lock = threading.Lock()
+        self.listeners = []
+        self.interval = interval
+        self.thread = None
+        self.active = 0
+        self.limit = initial_limit
+        self.configure(min_limit, max_limit)
+        self.reset_counters()
+        self.previous_throughput = 0.0
+
+    def configure(self, min_limit, max_limit, initial_limit=None):
+        """
+        Sets the bounds of the limit.
+
+        Args:
+            min_limit (int): The lowest number of active downloads.
+            max_limit (int): The highest number of active downloads.
+            initial_limit (int, optional): The new limit. Defaults to None,
+                                           which keeps the current limit within
+                                           the new bounds.
+        """
+        with self.condition:
+            self.min_limit = max(1, min_limit)
+            self.max_limit = max(self.min_limit, max_limit)
+            limit = initial_limit or self.limit
+            self.limit = min(max(limit, self.min_limit), self.max_limit)
+            self.condition.notify_all()
+
+    def reset_counters(self):
+        """
+        Resets the byte and error counters of the current interval.
+        """
+        with self.counter_lock:
+            self.bytes = 0
+            self.errors = 0
+            self.congestion = 0
+            self.started_at = time.monotonic()
+
+    def add_listener(self, listener):
+        """
+        Registers a function called with the limiter whenever the limit
+        changes.
+
+        Args:
+            listener (callable): The function to call.
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """
+        Unregisters a listener.
+
+        Args:
+            listener (callable): The function to unregister.
+        """
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def acquire(self, blocking=True):
+        """
+        Takes a download slot, waiting until one is free unless `blocking` is
+        False. Starts the evaluation thread on first use.
+
+        Args:
+            blocking (bool, optional): Whether to wait for a free slot.
+                                       Defaults to True.
+
+        Returns:
+            bool: True if the slot was taken, False if none was free.
+        """
+        self.start()
+        with self.condition:
+            while self.active >= self.limit:
+                if not blocking:
+                    return False
+                self.condition.wait()
+            self.active += 1
+            return True
+
+    def release(self):
+        """
+        Frees a download slot taken with `acquire`.
+        """
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    @contextmanager
+    def slot(self):
+        """
+        Waits until a download slot is free and holds it for the duration of
+        the context.
+        """
+        self.acquire()
+        try:
+            yield
+
+        finally:
+            self.release()
+
+    def record_bytes(self, num_bytes):
+        """
+        Adds downloaded bytes to the throughput of the current interval.
+
+        Args:
+            num_bytes (int): The number of bytes downloaded.
+        """
+        with self.counter_lock:
+            self.bytes += num_bytes
+
+    def record_error(self, status=None):
+        """
+        Records a failed download.
+
+        Args:
+            status (int, optional): The HTTP status of the failure, if any.
+                                    Defaults to None.
+        """
+        with self.counter_lock:
+            self.errors += 1
+            if status in CONGESTION_STATUSES:
+                self.congestion += 1
+
+    def start(self):
+        """
+        Starts the evaluation thread if it is not running yet.
+        """
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="adaptive-limiter", daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        """
+        Evaluates the limit at a fixed interval. The thread sleeps in between,
+        so it costs nothing while the downloads are running.
+        """
+        while True:
+            time.sleep(self.interval)
+            self.evaluate()
+
+    def decide(self, throughput, active, errors, congestion):
+        """
+        Computes the next limit from the measures of the last interval.
+
+        Args:
+            throughput (float): The aggregate throughput in bytes per second.
+            active (int): The number of active downloads.
+            errors (int): The number of failed downloads.
+            congestion (int): The number of failures caused by the server
+                              asking to slow down (429/503).
+
+        Returns:
+            tuple: The new limit and the reason of the decision.
+        """
+        if congestion:
+            return max(self.min_limit, self.limit // 2), "server congestion"
+
+        if errors:
+            return max(self.min_limit, self.limit - 1), "download errors"
+
+        if active < self.limit:
+            return self.limit, "not saturated"
+
+        if throughput / active < MIN_STREAM_SPEED:
+            return max(self.min_limit, self.limit - 1), "slow streams"
+
+        if throughput >= self.previous_throughput * (1 + GROWTH_THRESHOLD):
+            return min(self.max_limit, self.limit + 1), "throughput grew"
+
+        return self.limit, "throughput stalled"
+
+    def evaluate(self):
+        """
+        Adjusts the limit from the throughput and errors of the last interval,
+        then notifies the listeners if it changed.
+        """
+        with self.counter_lock:
+            elapsed = max(time.monotonic() - self.started_at, 1e-6)
+            throughput = self.bytes / elapsed
+            (errors, congestion) = (self.errors, self.congestion)
+            idle = self.bytes == 0 and errors == 0
+
+        with self.condition:
+            active = self.active
+            if idle or (active == 0 and errors == 0):
+                self.reset_counters()
+                return
+
+            (new_limit, reason) = self.decide(
+                throughput, active, errors, congestion
+            )
+            previous_limit = self.limit
+            self.limit = new_limit
+            self.previous_throughput = throughput
+            self.condition.notify_all()
+
+        self.reset_counters()
+        if new_limit != previous_limit:
+            logger.info(
+                "Downloads %d -> %d (%s, %.1f KB/s over %d streams)",
+                previous_limit, new_limit, reason, throughput / KB, active
+            )
+            for listener in list(self.listeners):
+                listener(self)
+
+DOWNLOAD_LIMITER = AdaptiveLimiter()
@@ -1,16 +1,70 @@
 """
 This module provides utilities for handling file downloads with progress
-tracking.
+tracking. Downloads are written to a `.part` file next to the final path,
+along with a small JSON journal, so that interrupted transfers can be resumed
+with an HTTP Range request. Large files served with range support are fetched
+as several byte-range segments over parallel connections.
+
+The `.part` file is preallocated when the size is known, written through
+large block-aligned buffers rather than one write per chunk, optionally
+synced to disk following an fsync policy, and atomically renamed to the final
+path once complete. Single streams are hashed as they are written, and every
+stream must deliver the number of bytes announced by the server.
 """
 
+import os
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
 from concurrent.futures import ThreadPoolExecutor
 
-MAX_WORKERS = 3
+import requests
+from urllib3.exceptions import (
+    DecodeError, ProtocolError, ReadTimeoutError, SSLError
+)
+
+from .http_utils import get_session, get_host_slot
+from .concurrency_utils import DOWNLOAD_LIMITER
+from .metrics_utils import QUEUE_DEPTH
+from .rate_limit_utils import parse_rate, get_host_bucket, throttle_bytes
+from .progress_utils import PROGRESS_REPORTER
+from .checksum_utils import create_hasher, format_checksum, compute_checksum
+from .retry_utils import record_failure
+from .trace_utils import span, trace_queue_wait
+
+MAX_SEGMENTS = 4
 TASK_COLOR = 'cyan'
 
+PART_SUFFIX = '.part'
+PART_FILE_MODE = 0o666    # Less the umask, as with `open`
+JOURNAL_SUFFIX = '.part.json'
+CONTENT_RANGE_PATTERN = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
 KB = 1024
 MB = 1024 * KB
 
+MIN_SEGMENT_SIZE = 32 * MB
+JOURNAL_INTERVAL = 8 * MB
+
+MIN_CHUNK_SIZE = 64 * KB
+MAX_CHUNK_SIZE = 1 * MB
+CHUNK_DURATION = 0.1    # Seconds of transfer per chunk of unknown-size bodies
+
+BLOCK_SIZE = 4 * KB
+WRITE_BUFFER_SIZE = 2 * MB
+
+FSYNC_NEVER = 'never'
+FSYNC_COMPLETE = 'complete'
+WRITE_STATE = {'fsync': FSYNC_NEVER}
+
+# The tasks of the items waiting for a transfer slot
+QUEUED_TASKS = set()
+QUEUED_TASKS_LOCK = threading.Lock()
+
+WRITE_LOCK = threading.Lock()
+
 def get_chunk_size(file_size):
     """
     Determines the optimal chunk size based on the file size.
@@ -32,12 +86,878 @@ def get_chunk_size(file_size):
         if file_size < threshold:
             return chunk_size
 
-    return 1 * MB
+    return MAX_CHUNK_SIZE
+
+class ChunkSizer:
+    """
+    Sizes the chunks of a body whose length is unknown (chunked or compressed
+    responses), so that each chunk takes about `CHUNK_DURATION` to arrive at
+    the throughput measured so far.
+    """
+
+    def __init__(self):
+        """
+        Initializes the sizer with the smallest chunk size.
+        """
+        self.chunk_size = MIN_CHUNK_SIZE
+        self.received = 0
+        self.started_at = time.monotonic()
+
+    def update(self, received):
+        """
+        Accounts for a received chunk and adjusts the chunk size.
+
+        Args:
+            received (int): The size of the chunk in bytes.
+
+        Returns:
+            int: The size of the next chunk, a power of two between
+                 `MIN_CHUNK_SIZE` and `MAX_CHUNK_SIZE`.
+        """
+        self.received += received
+        elapsed = time.monotonic() - self.started_at
+        if elapsed > 0:
+            target = self.received / elapsed * CHUNK_DURATION
+            chunk_size = MIN_CHUNK_SIZE
+            while chunk_size * 2 <= min(target, MAX_CHUNK_SIZE):
+                chunk_size *= 2
+            self.chunk_size = chunk_size
+
+        return self.chunk_size
+
+def iter_body(response, file_size):
+    """
+    Iterates over the body of a streamed response. Bodies of known size are
+    read in chunks sized from the file size, and bodies of unknown size in
+    chunks that grow with the measured throughput.
+
+    Args:
+        response (requests.Response): The streamed response.
+        file_size (int): The full size of the file in bytes, or -1 if unknown.
+
+    Yields:
+        bytes: The chunks of the decoded body.
+
+    Raises:
+        requests.RequestException: If the transfer is interrupted or the body
+                                   can't be decoded.
+    """
+    if file_size > 0:
+        yield from response.iter_content(chunk_size=get_chunk_size(file_size))
+        return
+
+    sizer = ChunkSizer()
+    chunk_size = sizer.chunk_size
+    while True:
+        # The same errors as `iter_content`, which reads fixed-size chunks
+        try:
+            chunk = response.raw.read(chunk_size, decode_content=True)
+
+        except ProtocolError as protocol_err:
+            raise requests.exceptions.ChunkedEncodingError(
+                protocol_err
+            ) from protocol_err
+
+        except DecodeError as decode_err:
+            raise requests.exceptions.ContentDecodingError(
+                decode_err
+            ) from decode_err
+
+        except ReadTimeoutError as timeout_err:
+            raise requests.ConnectionError(timeout_err) from timeout_err
+
+        except SSLError as ssl_err:
+            raise requests.exceptions.SSLError(ssl_err) from ssl_err
+
+        if not chunk:
+            return
+
+        yield chunk
+        chunk_size = sizer.update(len(chunk))
+
+def check_stream_length(received, expected):
+    """
+    Checks that a stream delivered the number of bytes announced for it.
+
+    Args:
+        received (int): The number of bytes received.
+        expected (int): The number of bytes announced, or -1 if unknown.
+
+    Raises:
+        requests.exceptions.ChunkedEncodingError: If the stream ended early or
+                                                  ran past its length.
+    """
+    if expected >= 0 and received != expected:
+        raise requests.exceptions.ChunkedEncodingError(
+            f"Stream ended after {received} of {expected} bytes."
+        )
+
+def read_journal(final_path):
+    """
+    Reads the journal of a partial download.
+
+    Args:
+        final_path (str): The path where the file will be saved.
+
+    Returns:
+        dict: The journal entries (URL, ETag, Last-Modified and size), or an
+              empty dictionary if there is no readable journal.
+    """
+    try:
+        with open(final_path + JOURNAL_SUFFIX, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    except (OSError, ValueError):
+        return {}
+
+def write_journal(
+        final_path, response, file_size, segments=None, written=None
+):
+    """
+    Records the validators of a download in its journal, so that a later
+    resume can check the remote file has not changed.
+
+    Args:
+        final_path (str): The path where the file will be saved.
+        response (requests.Response): The response of the download.
+        file_size (int): The full size of the file in bytes, or -1 if unknown.
+        segments (list, optional): The `[start, end, downloaded]` entries of a
+                                   segmented download. Defaults to None.
+        written (int, optional): The bytes of a single-stream download already
+                                 on disk, as a preallocated `.part` file is
+                                 larger than its content. Defaults to None.
+    """
+    journal = {
+        'url': str(response.url),
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified'),
+        'size': file_size
+    }
+    if segments:
+        journal['segments'] = segments
+    if written is not None:
+        journal['written'] = written
+
+    with open(final_path + JOURNAL_SUFFIX, 'w', encoding='utf-8') as file:
+        json.dump(journal, file)
+
+def discard_partial_download(final_path):
+    """
+    Removes the partial file and the journal of a download, if present.
+
+    Args:
+        final_path (str): The path where the file will be saved.
+    """
+    for suffix in (PART_SUFFIX, JOURNAL_SUFFIX):
+        try:
+            os.remove(final_path + suffix)
+
+        except FileNotFoundError:
+            pass
+
+def get_part_offset(final_path):
+    """
+    Returns the number of bytes of a single-stream download already on disk.
+
+    Args:
+        final_path (str): The path where the file will be saved.
+
+    Returns:
+        int: The journaled number of written bytes, or the size of the
+             `.part` file for journals that don't record it, or 0 if there
+             is no partial file.
+    """
+    part_path = final_path + PART_SUFFIX
+    if not os.path.isfile(part_path):
+        return 0
+
+    size = os.path.getsize(part_path)
+    written = read_journal(final_path).get('written')
+    return min(size, written) if written is not None else size
+
+def get_resume_headers(final_path):
+    """
+    Builds the request headers needed to resume a partial download.
+
+    Args:
+        final_path (str): The path where the file will be saved.
+
+    Returns:
+        dict: The `Range` header (plus `If-Range` when a validator was
+              journaled) or an empty dictionary if there is nothing to resume.
+    """
+    offset = get_part_offset(final_path)
+    journal = read_journal(final_path)
+
+    # Segmented downloads are preallocated and resume their own segments
+    if offset == 0 or journal.get('segments'):
+        return {}
+
+    headers = {'Range': f"bytes={offset}-"}
+    validator = journal.get('etag') or journal.get('last_modified')
+    if validator:
+        headers['If-Range'] = validator
+
+    return headers
+
+def check_resume_range(status, headers, final_path):
+    """
+    Determines where the body of a response starts within the file, from its
+    status and headers, so that the responses of both engines are checked
+    alike.
+
+    Args:
+        status (int): The HTTP status of the response.
+        headers (Mapping): The case-insensitive headers of the response.
+        final_path (str): The path where the file will be saved.
+
+    Returns:
+        int: 0 for a full response, the size of the partial file for a range
+             response that continues it, or None if the range response cannot
+             be appended to the partial file (wrong offset or the remote file
+             changed since the partial file was written).
+    """
+    if status != 206:
+        return 0
+
+    content_range = headers.get('content-range', '')
+    match = CONTENT_RANGE_PATTERN.match(content_range)
+    offset = get_part_offset(final_path)
+    if not match or int(match.group(1)) != offset:
+        return None
+
+    journaled_etag = read_journal(final_path).get('etag')
+    etag = headers.get('etag')
+    if journaled_etag and etag and journaled_etag != etag:
+        return None
+
+    return offset
+
+def get_resume_offset(response, final_path):
+    """
+    Determines where the body of a response starts within the file.
+
+    Args:
+        response (requests.Response): The response of the download.
+        final_path (str): The path where the file will be saved.
+
+    Returns:
+        int: The offset of the body, or None if the range response cannot be
+             appended to the partial file (see `check_resume_range`).
+    """
+    return check_resume_range(
+        response.status_code, response.headers, final_path
+    )
+
+def get_file_size(response, offset):
+    """
+    Determines the full size of the file being downloaded.
+
+    Args:
+        response (requests.Response): The response of the download.
+        offset (int): The position of the response body within the file.
+
+    Returns:
+        int: The full size of the file in bytes, or -1 if unknown.
+    """
+    # The length of a compressed body is not the size of the decoded file
+    encoding = response.headers.get('content-encoding', 'identity')
+    if encoding.lower() != 'identity':
+        return -1
+
+    content_range = response.headers.get('content-range', '')
+    match = CONTENT_RANGE_PATTERN.match(content_range)
+    if match and match.group(3) != '*':
+        return int(match.group(3))
+
+    content_length = int(response.headers.get('content-length', -1))
+    return offset + content_length if content_length >= 0 else -1
+
+def get_segment_count(file_size):
+    """
+    Determines how many segments a file should be split into.
+
+    Args:
+        file_size (int): The size of the file in bytes, or -1 if unknown.
+
+    Returns:
+        int: The number of segments, between 1 and `MAX_SEGMENTS`.
+    """
+    if file_size <= 0:
+        return 1
+
+    return max(1, min(MAX_SEGMENTS, file_size // MIN_SEGMENT_SIZE))
+
+def can_download_in_segments(response, offset, file_size):
+    """
+    Checks whether a download can be split into byte-range segments.
+
+    Args:
+        response (requests.Response): The response of the download.
+        offset (int): The position of the response body within the file.
+        file_size (int): The full size of the file in bytes, or -1 if unknown.
+
+    Returns:
+        bool: True if the server accepts ranges and the file is large enough.
+    """
+    return (
+        offset == 0
+        and response.status_code == 200
+        and response.headers.get('accept-ranges', '').lower() == 'bytes'
+        and get_segment_count(file_size) > 1
+    )
+
+def load_segments(final_path, response, file_size):
+    """
+    Returns the segments of a download, resuming the journaled ones when the
+    validators of the remote file (ETag and Last-Modified) are unchanged, or
+    preallocating the `.part` file and splitting
+    it into fresh segments otherwise.
+
+    Args:
+        final_path (str): The path where the file will be saved.
+        response (requests.Response): The response of the download.
+        file_size (int): The full size of the file in bytes.
+
+    Returns:
+        list: The `[start, end, downloaded]` entries of the segments.
+    """
+    part_path = final_path + PART_SUFFIX
+    journal = read_journal(final_path)
+    etag = response.headers.get('etag')
+    last_modified = response.headers.get('last-modified')
+    # Without a validator, an unchanged remote file can't be told apart
+    if (
+        journal.get('segments')
+        and (etag or last_modified)
+        and journal.get('etag') == etag
+        and journal.get('last_modified') == last_modified
+        and journal.get('size') == file_size
+        and os.path.isfile(part_path)
+        and os.path.getsize(part_path) == file_size
+    ):
+        return journal['segments']
+
+    os.close(open_part_file(final_path, 0, file_size))
+
+    segment_count = get_segment_count(file_size)
+    segment_size = -(-file_size // segment_count)
+    return [
+        [start, min(start + segment_size, file_size) - 1, 0]
+        for start in range(0, file_size, segment_size)
+    ]
+
+def check_segment_response(headers, validators, start, end):
+    """
+    Checks that the response of a segment carries the requested byte range of
+    the file the download started with, before any of it is written.
+
+    Args:
+        headers (Mapping): The case-insensitive headers of the segment
+                           response.
+        validators (Mapping): The headers of the initial response of the
+                              download.
+        start (int): The first byte requested.
+        end (int): The last byte requested.
+
+    Raises:
+        requests.RequestException: If the response covers another range, or
+                                   the ETag or Last-Modified of the remote
+                                   file changed.
+    """
+    match = CONTENT_RANGE_PATTERN.match(headers.get('content-range', ''))
+    if not match or (int(match.group(1)), int(match.group(2))) != (
+        start, end
+    ):
+        raise requests.RequestException(
+            f"Segment response does not cover bytes {start}-{end}."
+        )
+
+    for name in ('etag', 'last-modified'):
+        if validators.get(name) and headers.get(name) != validators[name]:
+            raise requests.RequestException(
+                f"Remote file changed during segment {start}-{end}."
+            )
+
+@contextmanager
+def hold_segment_slots(url, segment_count):
+    """
+    Holds a slot of the download limiter and of the host for every extra
+    connection of a segmented download, for the duration of the context. Only
+    the slots free right away are taken, and the first connection runs in the
+    slots already held by the transfer.
+
+    Args:
+        url (str): The URL of the file.
+        segment_count (int): The number of segments of the download.
+
+    Yields:
+        int: The number of connections the segments may open at once.
+    """
+    host_slot = get_host_slot(url)
+    extra = 0
+
+    try:
+        while (
+            extra < segment_count - 1
+            and DOWNLOAD_LIMITER.acquire(blocking=False)
+        ):
+            if not host_slot.acquire(blocking=False):
+                DOWNLOAD_LIMITER.release()
+                break
+            extra += 1
+
+        yield 1 + extra
+
+    finally:
+        for _ in range(extra):
+            host_slot.release()
+            DOWNLOAD_LIMITER.release()
+
+def write_at(file_descriptor, data, offset):
+    """
+    Writes data at the given offset of a file, using `os.pwrite` where it is
+    available.
+
+    Args:
+        file_descriptor (int): The descriptor of the file opened for writing.
+        data (bytes): The data to write.
+        offset (int): The position in the file where the data is written.
+    """
+    if hasattr(os, 'pwrite'):
+        os.pwrite(file_descriptor, data, offset)
+        return
+
+    with WRITE_LOCK:
+        os.lseek(file_descriptor, offset, os.SEEK_SET)
+        os.write(file_descriptor, data)
+
+def parse_fsync_policy(value):
+    """
+    Parses an fsync policy.
+
+    Args:
+        value (str): 'never', 'complete', or a size with an optional K, M or G
+                     suffix (e.g. '64M') to sync every time that much data is
+                     written.
+
+    Returns:
+        str | int: `FSYNC_NEVER`, `FSYNC_COMPLETE` or the interval in bytes.
+
+    Raises:
+        ValueError: If the policy is not in a valid format.
+    """
+    if value in (FSYNC_NEVER, FSYNC_COMPLETE):
+        return value
+
+    interval = parse_rate(value)
+    if not interval:
+        raise ValueError(f"Invalid fsync policy: {value}")
+
+    return int(interval)
+
+def configure_fsync(policy=FSYNC_NEVER):
+    """
+    Sets when the downloaded files are synced to disk: never (the operating
+    system writes them back on its own), once complete before they are
+    renamed, or every given number of bytes.
+
+    Args:
+        policy (str | int, optional): A policy returned by
+                                      `parse_fsync_policy`. Defaults to
+                                      `FSYNC_NEVER`.
+    """
+    WRITE_STATE['fsync'] = policy
+
+def preallocate(file_descriptor, file_size):
+    """
+    Reserves the disk space of a file, so that parallel streams don't
+    interleave their blocks. Where `posix_fallocate` is unavailable or not
+    supported by the file system, the file is only extended.
+
+    Args:
+        file_descriptor (int): The descriptor of the file opened for writing.
+        file_size (int): The full size of the file in bytes, or -1 if unknown.
+    """
+    if file_size <= 0:
+        return
+
+    try:
+        os.posix_fallocate(file_descriptor, 0, file_size)
+        return
+
+    except (AttributeError, OSError):
+        pass
+
+    if os.fstat(file_descriptor).st_size < file_size:
+        os.ftruncate(file_descriptor, file_size)
+
+def open_part_file(final_path, offset, file_size):
+    """
+    Opens the `.part` file of a download for writing, emptied unless the
+    download resumes from an offset, and preallocated when its size is known.
+
+    Args:
+        final_path (str): The path where the file will be saved.
+        offset (int): The position the download resumes from.
+        file_size (int): The full size of the file in bytes, or -1 if unknown.
+
+    Returns:
+        int: The descriptor of the `.part` file.
+    """
+    file_descriptor = os.open(
+        final_path + PART_SUFFIX,
+        os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0),
+        PART_FILE_MODE
+    )
+
+    try:
+        if offset == 0:
+            os.ftruncate(file_descriptor, 0)
+        preallocate(file_descriptor, file_size)
+
+    except OSError:
+        os.close(file_descriptor)
+        raise
+
+    return file_descriptor
+
+def commit_part_file(final_path):
+    """
+    Atomically renames a complete `.part` file to the final path and removes
+    its journal. Unless the fsync policy is 'never', the rename itself is
+    synced to disk.
+
+    Args:
+        final_path (str): The path where the file will be saved.
+    """
+    os.replace(final_path + PART_SUFFIX, final_path)
+    if WRITE_STATE['fsync'] != FSYNC_NEVER and hasattr(os, 'O_DIRECTORY'):
+        directory = os.open(
+            os.path.dirname(final_path) or '.', os.O_RDONLY | os.O_DIRECTORY
+        )
+        try:
+            os.fsync(directory)
+
+        finally:
+            os.close(directory)
+
+    discard_partial_download(final_path)
+
+class OutputWriter:
+    """
+    Gathers the chunks of a download stream into a reusable buffer and writes
+    it at the stream's position of the file in large writes that end on block
+    boundaries, instead of issuing a small write per chunk.
+    """
+
+    def __init__(
+            self, file_descriptor, position, buffer_size=WRITE_BUFFER_SIZE
+    ):
+        """
+        Initializes the writer.
+
+        Args:
+            file_descriptor (int): The descriptor of the file opened for
+                                   writing, possibly shared with other
+                                   streams.
+            position (int): The position in the file where the stream starts.
+            buffer_size (int, optional): The size of the buffer in bytes.
+                                         Defaults to `WRITE_BUFFER_SIZE`.
+        """
+        self.file_descriptor = file_descriptor
+        self.position = position
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.filled = 0
+        self.unsynced = 0
+
+    def needs_flush(self, size):
+        """
+        Tells whether writing data of the given size will write to the file,
+        rather than only fill the buffer.
+
+        Args:
+            size (int): The size of the data in bytes.
+
+        Returns:
+            bool: True if the write will reach the file.
+        """
+        # The buffer ends on a block boundary of the file
+        capacity = len(self.buffer) - self.position % BLOCK_SIZE
+        return self.filled + size > capacity or size >= len(self.buffer) // 2
+
+    def write(self, data):
+        """
+        Adds data to the stream. Large chunks bypass the buffer.
+
+        Args:
+            data (bytes): The data to write.
+        """
+        size = len(data)
+        if self.needs_flush(size):
+            self.flush()
+            if size >= len(self.buffer) // 2:
+                self.write_through(data)
+                return
+
+        self.view[self.filled:self.filled + size] = data
+        self.filled += size
+
+    def flush(self):
+        """
+        Writes the buffered data to the file. `position` is then the end of
+        the data on disk.
+        """
+        if self.filled:
+            self.write_through(self.view[:self.filled])
+            self.filled = 0
+
+    def write_through(self, data):
+        """
+        Writes data at the current position of the file, syncing it when the
+        fsync policy interval is reached.
+
+        Args:
+            data (bytes-like): The data to write.
+        """
+        with span('write', 'write', bytes=len(data)):
+            write_at(self.file_descriptor, data, self.position)
+        self.position += len(data)
+        self.unsynced += len(data)
+
+        interval = WRITE_STATE['fsync']
+        if isinstance(interval, int) and self.unsynced >= interval:
+            os.fsync(self.file_descriptor)
+            self.unsynced = 0
+
+    def close(self):
+        """
+        Flushes the stream once it is complete and syncs the file to disk
+        unless the fsync policy is 'never'. The file descriptor is left open.
+        """
+        self.flush()
+        if WRITE_STATE['fsync'] != FSYNC_NEVER and self.unsynced:
+            os.fsync(self.file_descriptor)
+            self.unsynced = 0
+
+def save_file_in_segments(response, final_path, task_info, file_size):
+    """
+    Downloads a file as several byte ranges fetched over parallel connections,
+    each written at its offset into the preallocated `.part` file. Every
+    connection beyond the first holds a slot of the download limiter and of
+    the host, so the segments run at once only as far as slots are free, and
+    every range response is checked against the initial response before it
+    is written.
+
+    Args:
+        response (requests.Response): The initial response of the download,
+                                      used for its URL and request headers.
+        final_path (str): The path where the file will be saved.
+        task_info (tuple): A tuple containing progress-related objects.
+        file_size (int): The full size of the file in bytes.
+
+    Raises:
+        requests.RequestException: If a segment request fails, is cut short,
+                                   the server does not honour its range, or
+                                   the remote file changed.
+    """
+    segments = load_segments(final_path, response, file_size)
+    headers = {
+        key: value for key, value in response.request.headers.items()
+        if key.lower() not in ('range', 'if-range')
+    }
+    response.close()
+
+    journal_lock = threading.Lock()
+    write_journal(final_path, response, file_size, segments)
+    host_bucket = get_host_bucket(response.url)
+
+    def fetch_segment(session, file_descriptor, segment):
+        (start, end, downloaded) = segment
+        counter = PROGRESS_REPORTER.add_counter(task_info, downloaded)
+        if start + downloaded > end:
+            return
+
+        range_header = {'Range': f"bytes={start + downloaded}-{end}"}
+        with session.get(
+            response.url, headers={**headers, **range_header}, stream=True,
+            timeout=10
+        ) as segment_response:
+            segment_response.raise_for_status()
+            if segment_response.status_code != 206:
+                raise requests.RequestException(
+                    f"Server ignored the range of segment {start}-{end}."
+                )
+            check_segment_response(
+                segment_response.headers, response.headers,
+                start + downloaded, end
+            )
+
+            # Only the data on disk is journaled, so a resumed segment never
+            # skips buffered data lost with the process
+            writer = OutputWriter(file_descriptor, start + downloaded)
+            unjournaled = 0
+            chunk_size = get_chunk_size(end - start + 1)
+            try:
+                for chunk in segment_response.iter_content(
+                    chunk_size=chunk_size
+                ):
+                    writer.write(chunk)
+                    counter.completed += len(chunk)
+                    DOWNLOAD_LIMITER.record_bytes(len(chunk))
+                    throttle_bytes(host_bucket, len(chunk))
+
+                    unjournaled += len(chunk)
+                    if unjournaled >= JOURNAL_INTERVAL:
+                        writer.flush()
+                        segment[2] = writer.position - start
+                        with journal_lock:
+                            write_journal(
+                                final_path, response, file_size, segments
+                            )
+                        unjournaled = 0
+
+            finally:
+                writer.flush()
+                segment[2] = writer.position - start
+
+            check_stream_length(writer.position - start, end - start + 1)
+
+    session = get_session(response.url)
+    file_descriptor = os.open(
+        final_path + PART_SUFFIX, os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+    )
+
+    try:
+        with hold_segment_slots(response.url, len(segments)) as connections, \
+                ThreadPoolExecutor(max_workers=connections) as executor:
+            futures = [
+                executor.submit(
+                    fetch_segment, session, file_descriptor, segment
+                )
+                for segment in segments
+            ]
+            for future in futures:
+                future.result()
+
+        if WRITE_STATE['fsync'] != FSYNC_NEVER:
+            os.fsync(file_descriptor)
+
+    except (requests.RequestException, OSError):
+        with journal_lock:
+            write_journal(final_path, response, file_size, segments)
+        raise
+
+    finally:
+        os.close(file_descriptor)
+
+def save_file_sequentially(response, final_path, task_info, offset, file_size):
+    """
+    Writes the body of a response to the `.part` file as a single stream,
+    appending to it when the response continues a partial download.
+
+    Args:
+        response (requests.Response): The response of the download.
+        final_path (str): The path where the file will be saved.
+        task_info (tuple): A tuple containing progress-related objects.
+        offset (int): The position of the response body within the file.
+        file_size (int): The full size of the file in bytes, or -1 if unknown.
+
+    Returns:
+        str: The checksum of the file, or None if checksums are disabled.
+
+    Raises:
+        requests.RequestException: If the stream fails or is cut short.
+    """
+    counter = PROGRESS_REPORTER.add_counter(task_info, offset)
+    hasher = create_hasher(final_path + PART_SUFFIX, offset)
+
+    write_journal(final_path, response, file_size, written=offset)
+    file_descriptor = open_part_file(final_path, offset, file_size)
+    writer = OutputWriter(file_descriptor, offset)
+    host_bucket = get_host_bucket(response.url)
+    unjournaled = 0
+
+    try:
+        for chunk in iter_body(response, file_size):
+            if chunk:
+                writer.write(chunk)
+                if hasher:
+                    hasher.update(chunk)
+                counter.completed += len(chunk)
+                DOWNLOAD_LIMITER.record_bytes(len(chunk))
+                throttle_bytes(host_bucket, len(chunk))
+
+                unjournaled += len(chunk)
+                if unjournaled >= JOURNAL_INTERVAL:
+                    writer.flush()
+                    write_journal(
+                        final_path, response, file_size,
+                        written=writer.position
+                    )
+                    unjournaled = 0
+
+        writer.close()
+        check_stream_length(writer.position, file_size)
+
+    except requests.RequestException:
+        writer.flush()
+        write_journal(
+            final_path, response, file_size, written=writer.position
+        )
+        raise
+
+    finally:
+        os.close(file_descriptor)
+
+    return format_checksum(hasher)
+
+def mark_task_complete(task_info):
+    """
+    Marks the task of an item as complete, hides it and advances the overall
+    progress.
+
+    Args:
+        task_info (tuple): A tuple containing progress-related objects:
+                           - job_progress: The progress tracker for the job.
+                           - task: The specific task being tracked.
+                           - overall_task: The overall task tracker.
+    """
+    (job_progress, task, overall_task) = task_info
+    PROGRESS_REPORTER.finish(task_info)
+    job_progress.update(task, visible=False, status='done')
+    job_progress.advance(overall_task)
+
+def mark_task_failed(task_info, error=None):
+    """
+    Hides the task of an item that could not be downloaded and advances the
+    overall progress, so that the overall task still reaches its total.
+
+    Args:
+        task_info (tuple): A tuple containing progress-related objects.
+        error (Exception, optional): The error of the item. Defaults to None.
+    """
+    (job_progress, task, overall_task) = task_info
+    PROGRESS_REPORTER.finish(task_info)
+    job_progress.update(
+        task, visible=False, status='failed',
+        error=str(error) if error else None
+    )
+    job_progress.advance(overall_task)
 
 def save_file_with_progress(response, final_path, task_info):
     """
     Saves a file to the specified path while tracking and updating progress.
 
+    The content is appended to the `.part` file when the response is a range
+    response continuing it, fetched in parallel segments when the file is
+    large and the server accepts ranges, and written from scratch otherwise.
+    The `.part` file is atomically renamed to the final path once the
+    transfer is complete. A single stream is hashed as it is written, while
+    the segments, written out of order, are hashed once complete, when their
+    data is still in the page cache.
+
     Args:
         response (requests.Response): The response object containing the file
                                       content to be downloaded.
@@ -46,70 +966,224 @@ def save_file_with_progress(response, final_path, task_info):
                            - job_progress: The progress tracker for the job.
                            - task: The specific task being tracked.
                            - overall_task: The overall task tracker.
+
+    Returns:
+        str: The checksum of the file, or None if checksums are disabled.
+
+    Raises:
+        requests.RequestException: If the transfer fails or is cut short.
+        ValueError: If the response is a range response that does not continue
+                    the partial file.
     """
-    (job_progress, task, overall_task) = task_info
-    file_size = int(response.headers.get('content-length', -1))
-    chunk_size = get_chunk_size(file_size)
-    total_downloaded = 0
+    offset = get_resume_offset(response, final_path)
+    if offset is None:
+        raise ValueError(f"Range response does not match {final_path}.")
 
-    with open(final_path, 'wb') as file:
-        for chunk in response.iter_content(chunk_size=chunk_size):
-            if chunk:
-                file.write(chunk)
-                total_downloaded += len(chunk)
-                progress_percentage = (total_downloaded / file_size) * 100
-                job_progress.update(task, completed=progress_percentage)
+    file_size = get_file_size(response, offset)
+    PROGRESS_REPORTER.track(task_info, file_size if file_size > 0 else None)
+    if can_download_in_segments(response, offset, file_size):
+        save_file_in_segments(response, final_path, task_info, file_size)
+        checksum = compute_checksum(final_path + PART_SUFFIX)
+    else:
+        checksum = save_file_sequentially(
+            response, final_path, task_info, offset, file_size
+        )
 
-    job_progress.update(task, completed=100, visible=False)
-    job_progress.advance(overall_task)
+    commit_part_file(final_path)
+    mark_task_complete(task_info)
+    return checksum
+
+def queue_task(task_info):
+    """
+    Counts the task of an item in the queue depth until a transfer slot is
+    free for it.
+
+    Args:
+        task_info (tuple): A tuple containing progress-related objects.
+    """
+    with QUEUED_TASKS_LOCK:
+        QUEUED_TASKS.add(task_info[:2])
+    QUEUE_DEPTH.inc()
+
+def dequeue_task(task_info):
+    """
+    Takes the task of an item out of the queue depth, if it is still queued.
+
+    Args:
+        task_info (tuple): A tuple containing progress-related objects.
+
+    Returns:
+        bool: True if the task was still queued.
+    """
+    with QUEUED_TASKS_LOCK:
+        if task_info[:2] not in QUEUED_TASKS:
+            return False
+        QUEUED_TASKS.remove(task_info[:2])
 
-def manage_running_tasks(futures, job_progress):
+    QUEUE_DEPTH.dec()
+    return True
+
+def start_task(task_info):
     """
-    Manage the status of running tasks and update their progress.
+    Reveals the progress task of an item and takes it out of the queue depth,
+    once a transfer slot is held for it. The retries and failovers of the item
+    start it again without effect.
 
     Args:
-        futures (dict): A dictionary where keys are futures representing the
-                        tasks that have been submitted for execution, and
-                        values are the associated task identifiers in the
-                        job progress tracking system.
-        job_progress: An object responsible for tracking the progress of tasks,
-                      providing methods to update and manage task visibility.
+        task_info (tuple): A tuple containing progress-related objects.
     """
-    while futures:
-        for future in list(futures.keys()):
-            if future.running():
-                task = futures.pop(future)
-                job_progress.update(task, visible=True)
+    (job_progress, task, _) = task_info
+    dequeue_task(task_info)
+    job_progress.update(task, visible=True)
 
-def run_in_parallel(func, items, job_progress, *args):
+def run_task(func, item, *args):
     """
-    Execute a function in parallel for a list of items, updating progress in a
-    job tracker.
+    Runs a function on an item from a worker thread. The progress task of the
+    item stays hidden and queued until the transfer takes a slot of the
+    download limiter, and an item that never gets there, such as a skipped or
+    failed one, leaves the queue when the function returns.
+
+    Since the task is made visible from the worker itself, the submitting
+    thread simply blocks on the executor while the downloads are in progress.
+    An error raised by the function is recorded for the failure summary and
+    fails the task, instead of being left unseen in its future.
 
     Args:
-        func (callable): The function to be executed for each item in the
-                         `items` list.
-        items (iterable): A list of items to be processed by the `func`.
+        func (callable): The function to be executed for the item.
+        item: The item to be processed by `func`, either its URL or a tuple
+              ending with it.
+        *args: Additional positional arguments to be passed to `func`. The last
+               one must be the `task_info` tuple of the item.
+
+    Returns:
+        The value returned by `func`, or None if it raised.
+    """
+    task_info = args[-1]
+    try:
+        return func(item, *args)
+
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        url = item[-1] if isinstance(item, tuple) else item
+        record_failure('download', url, err)
+        mark_task_failed(task_info, err)
+        return None
+
+    finally:
+        dequeue_task(task_info)
+
+def submit_tasks(
+        executor, func, records, job_progress, *args, total,
+        title="Progress"
+):
+    """
+    Submits a function for each item of a stream of records to an executor,
+    adding an overall progress task and a hidden task per item to the job
+    tracker.
+
+    The records are consumed lazily, so every item is submitted as soon as it
+    is produced and starts running while the next ones are still being
+    produced.
+
+    Args:
+        executor (concurrent.futures.Executor): The executor running the
+                                                tasks, possibly shared with
+                                                other lists of items.
+        func (callable): The function to be executed for each item.
+        records (iterable): The `(label, item)` pairs to process, in any
+                            order. An item of None stands for an item that
+                            could not be produced, whose task is marked as
+                            failed right away.
         job_progress: An object responsible for managing and displaying the
                       progress of tasks.
         *args: Additional positional arguments to be passed to the `func`.
-        max_workers (int, optional): The maximum number of threads to use for
-                                     concurrent processing. Defaults to 3.
+        total (int): The number of records, used as the total of the overall
+                     progress task.
+        title (str, optional): The description of the overall progress task.
+                               Defaults to "Progress".
+
+    Returns:
+        list: The futures of the submitted tasks.
     """
-    num_items = len(items)
-    futures = {}
+    overall_task = job_progress.add_task(
+        f"[{TASK_COLOR}]{title}", total=total, visible=True
+    )
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        overall_task = job_progress.add_task(
-            f"[{TASK_COLOR}]Progress", total=num_items, visible=True
+    futures = []
+    for (label, item) in records:
+        task = job_progress.add_task(
+            f"[{TASK_COLOR}]{label}", total=None, visible=False
         )
+        task_info = (job_progress, task, overall_task)
+        if item is None:
+            mark_task_failed(task_info)
+            continue
 
-        for indx, item in enumerate(items):
-            task = job_progress.add_task(
-                f"[{TASK_COLOR}]Episode {indx + 1}/{num_items}",
-                total=100, visible=False
-            )
-            task_info = (job_progress, task, overall_task)
-            future = executor.submit(func, item, *args, task_info)
-            futures[future] = task
-            manage_running_tasks(futures, job_progress)
+        queue_task(task_info)
+        futures.append(executor.submit(
+            trace_queue_wait(run_task), func, item, *args, task_info
+        ))
+
+    return futures
+
+def add_workers_task(job_progress):
+    """
+    Adds a task showing the number of active downloads allowed by the adaptive
+    limiter, kept up to date whenever the limiter changes it.
+
+    Args:
+        job_progress: An object responsible for managing and displaying the
+                      progress of tasks.
+
+    Returns:
+        callable: The listener registered on the limiter, to be removed once
+                  the downloads are over.
+    """
+    def get_description(limiter):
+        return f"[{TASK_COLOR}]Workers {limiter.limit}/{limiter.max_limit}"
+
+    workers_task = job_progress.add_task(
+        get_description(DOWNLOAD_LIMITER), total=DOWNLOAD_LIMITER.max_limit,
+        completed=DOWNLOAD_LIMITER.limit, visible=True
+    )
+
+    def show_limit(limiter):
+        job_progress.update(
+            workers_task,
+            description=get_description(limiter),
+            completed=limiter.limit
+        )
+
+    DOWNLOAD_LIMITER.add_listener(show_limit)
+    return show_limit
+
+def run_in_parallel(func, records, job_progress, *args, total):
+    """
+    Execute a function in parallel for a stream of records, updating progress
+    in a job tracker. The executor is sized for the upper bound of the
+    adaptive limiter, which decides how many of the items actually run at
+    once.
+
+    Args:
+        func (callable): The function to be executed for each item.
+        records (iterable): The `(label, item)` pairs to process, consumed
+                            lazily.
+        job_progress: An object responsible for managing and displaying the
+                      progress of tasks.
+        *args: Additional positional arguments to be passed to the `func`.
+        total (int): The number of records.
+
+    Returns:
+        list: The values returned by `func` for the submitted items, in
+              submission order, None for those that raised.
+    """
+    listener = add_workers_task(job_progress)
+
+    with ThreadPoolExecutor(
+        max_workers=DOWNLOAD_LIMITER.max_limit
+    ) as executor:
+        futures = submit_tasks(
+            executor, func, records, job_progress, *args, total=total
+        )
+
+    DOWNLOAD_LIMITER.remove_listener(listener)
+    return [future.result() for future in futures]
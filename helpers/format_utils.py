@@ -5,8 +5,11 @@ removing specific patterns from strings, extracting anime IDs from URLs,
 and formatting anime names by removing designated substrings.
 """
 
+from .trace_utils import traced
+
 ENDSTRINGS = ["Sub ITA", "ITA"]
 
+@traced('parse')
 def extract_hanime_name(soup):
     """
     Extracts the hanime name from a BeautifulSoup object.
@@ -8,13 +8,110 @@ clearing the terminal, making it reusable across projects.
 import os
 import sys
 import re
+import logging
+from importlib.util import find_spec
 
-import requests
 from bs4 import BeautifulSoup
 
+from .http_utils import http_get_page
+from .metrics_utils import PAGE_FETCH_SECONDS, PARSE_SECONDS
+from .rate_limit_utils import throttle_request
+from .retry_utils import PAGE_ATTEMPTS, retry_call
+from .trace_utils import span, traced
+
 DOWNLOAD_FOLDER = "Downloads"
+LOG_FILE = os.path.join(DOWNLOAD_FOLDER, "downloader.log")
+
+# lxml builds trees several times faster than the standard library parser
+PARSER = 'lxml' if find_spec('lxml') else 'html.parser'
+
+def fetch_text(url, timeout=10, attempts=PAGE_ATTEMPTS):
+    """
+    Fetches the HTML content of a webpage as text, for pages whose data can be
+    extracted without building a tree. Transient errors are retried with
+    backoff.
+
+    Args:
+        url (str): The URL of the webpage to fetch.
+        timeout (int, optional): The maximum time (in seconds) to wait for a
+                                 response. Defaults to 10.
+        attempts (int, optional): The maximum number of attempts. Defaults to
+                                  `PAGE_ATTEMPTS`.
+
+    Returns:
+        str: The HTML content of the page.
+
+    Raises:
+        requests.RequestException: If the request fails with a fatal error or
+                                   still fails after the retries.
+    """
+    def get_text():
+        throttle_request()
+        with PAGE_FETCH_SECONDS.time(), span('GET', 'network', url=url):
+            response = http_get_page(url, timeout=timeout)
+        response.raise_for_status()
+        return response.text
 
-def fetch_page(url, timeout=10):
+    return retry_call(get_text, attempts=attempts)
+
+def fetch_text_if_modified(
+        url, headers, timeout=10, attempts=PAGE_ATTEMPTS
+):
+    """
+    Fetches a webpage with a conditional request. Transient errors are retried
+    with backoff.
+
+    Args:
+        url (str): The URL of the webpage to fetch.
+        headers (dict): The `If-None-Match` and `If-Modified-Since` headers.
+        timeout (int, optional): The maximum time (in seconds) to wait for a
+                                 response. Defaults to 10.
+        attempts (int, optional): The maximum number of attempts. Defaults to
+                                  `PAGE_ATTEMPTS`.
+
+    Returns:
+        tuple: The HTML content of the page and its ETag and Last-Modified
+               validators (None when missing), or None if the page is not
+               modified.
+
+    Raises:
+        requests.RequestException: If the request fails with a fatal error or
+                                   still fails after the retries.
+    """
+    def get_page():
+        throttle_request()
+        with PAGE_FETCH_SECONDS.time(), span('GET', 'network', url=url):
+            response = http_get_page(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            return None
+
+        response.raise_for_status()
+        return (
+            response.text, response.headers.get('etag'),
+            response.headers.get('last-modified')
+        )
+
+    return retry_call(get_page, attempts=attempts)
+
+def parse_page(html, parse_only=None):
+    """
+    Parses HTML content into a BeautifulSoup object with the fastest parser
+    available.
+
+    Args:
+        html (str): The HTML content to parse.
+        parse_only (SoupStrainer, optional): Restricts the tree to the tags the
+                                             caller needs. Defaults to None,
+                                             which parses the whole page.
+
+    Returns:
+        BeautifulSoup: A BeautifulSoup object representing the HTML content.
+    """
+    with PARSE_SECONDS.time(PARSER), span('parse_page', 'parse'):
+        return BeautifulSoup(html, PARSER, parse_only=parse_only)
+
+@traced('fetch')
+def fetch_page(url, timeout=10, parse_only=None, attempts=PAGE_ATTEMPTS):
     """
     Fetches the HTML content of a webpage and parses it into a BeautifulSoup
     object.
@@ -23,26 +120,22 @@ def fetch_page(url, timeout=10):
         url (str): The URL of the webpage to fetch.
         timeout (int, optional): The maximum time (in seconds) to wait for a
                                  response. Defaults to 10.
+        parse_only (SoupStrainer, optional): Restricts the tree to the tags the
+                                             caller needs. Defaults to None,
+                                             which parses the whole page.
+        attempts (int, optional): The maximum number of attempts. Defaults to
+                                  `PAGE_ATTEMPTS`.
 
     Returns:
         BeautifulSoup: A BeautifulSoup object representing the HTML content of
                        the page.
 
     Raises:
-        SystemExit: If an error occurs during the HTTP request, the program
-                    exits after printing the error message.
+        requests.RequestException: If the request fails with a fatal error or
+                                   still fails after the retries.
     """
-    # Create a new session per worker
-    session = requests.Session()
-
-    try:
-        response = session.get(url, timeout=timeout)
-        response.raise_for_status()
-        return BeautifulSoup(response.text, 'html.parser')
-
-    except requests.RequestException as req_err:
-        print(f"Error fetching page {url}: {req_err}")
-        sys.exit(1)
+    html = fetch_text(url, timeout=timeout, attempts=attempts)
+    return parse_page(html, parse_only=parse_only)
 
 def sanitize_directory_name(directory_name):
     """
@@ -81,18 +174,18 @@ def create_download_directory(directory_name):
         sanitize_directory_name(directory_name)
     )
 
-    try:
-        os.makedirs(download_path, exist_ok=True)
-        return download_path
-
-    except OSError as os_err:
-        print(f"Error creating directory: {os_err}")
-        sys.exit(1)
+    os.makedirs(download_path, exist_ok=True)
+    return download_path
 
 def clear_terminal():
     """
-    Clears the terminal screen based on the operating system.
+    Clears the terminal screen based on the operating system. Nothing is done
+    when the standard output is not a terminal, such as under cron or
+    systemd.
     """
+    if not sys.stdout.isatty():
+        return
+
     commands = {
         'nt': 'cls',      # Windows
         'posix': 'clear'  # macOS and Linux
@@ -101,3 +194,16 @@ def clear_terminal():
     command = commands.get(os.name)
     if command:
         os.system(command)
+
+def setup_logging():
+    """
+    Sends the log records of the downloader (such as the decisions of the
+    adaptive download limiter) to a log file in the download folder, so they
+    don't interfere with the progress display.
+    """
+    os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+    logging.basicConfig(
+        filename=LOG_FILE,
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
@@ -0,0 +1,303 @@
+"""
+This module provides a shared HTTP layer for scraping and downloading. It keeps
+one pooled `requests.Session` per host, with the default headers and
+keep-alive connections, so that every page fetch and file stream reuses the
+connections already open to that host. Requests are attempted once, the retry
+engine owning every retry.
+
+Page requests can optionally go through an HTTP/2 client instead, which
+multiplexes the concurrent scraping requests over one connection per host.
+It requires the optional `httpx` and `h2` packages, and hosts that don't
+negotiate HTTP/2 are still served over HTTP/1.1.
+"""
+
+import logging
+import threading
+from importlib.util import find_spec
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) "
+        "Gecko/20100101 Firefox/117.0"
+    ),
+    "Connection": "keep-alive"
+}
+
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+MAX_TRANSFERS_PER_HOST = 4
+
+# Scraping threads per stage once their requests share multiplexed connections
+HTTP2_SCRAPE_WORKERS = 16
+
+SESSIONS = {}
+SESSIONS_LOCK = threading.Lock()
+HOST_SLOTS = {}
+PAGE_CLIENT = {'client': None}
+
+logger = logging.getLogger(__name__)
+
+def create_session():
+    """
+    Creates a session with the default headers and a connection pool sized
+    for the concurrent downloads. The adapter makes a single attempt per
+    request: failed connections and error statuses are both left to the
+    retry engine, which counts every attempt, backs off with jitter and fails
+    over to the alternative host.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=Retry(total=0, read=False)
+    )
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_session(url):
+    """
+    Returns the shared session for the host of the given URL, creating it on
+    first use.
+
+    Args:
+        url (str): The URL whose host the session is for.
+
+    Returns:
+        requests.Session: The session of the host.
+    """
+    host = urlparse(url).netloc
+
+    with SESSIONS_LOCK:
+        session = SESSIONS.get(host)
+        if session is None:
+            session = create_session()
+            SESSIONS[host] = session
+
+        return session
+
+def get_host_slot(url):
+    """
+    Returns the semaphore capping the number of simultaneous file transfers
+    from the host of the given URL, creating it on first use.
+
+    Args:
+        url (str): The URL whose host the semaphore is for.
+
+    Returns:
+        threading.BoundedSemaphore: The semaphore of the host.
+    """
+    host = urlparse(url).netloc
+
+    with SESSIONS_LOCK:
+        slot = HOST_SLOTS.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(MAX_TRANSFERS_PER_HOST)
+            HOST_SLOTS[host] = slot
+
+        return slot
+
+def http_get(url, headers=None, stream=False, timeout=10):
+    """
+    Sends a GET request through the shared session of the URL's host.
+
+    Args:
+        url (str): The URL to request.
+        headers (dict, optional): Extra headers merged with the default ones.
+                                  Defaults to None.
+        stream (bool, optional): Whether to stream the response body. Defaults
+                                 to False.
+        timeout (int, optional): The maximum time (in seconds) to wait for a
+                                 response. Defaults to 10.
+
+    Returns:
+        requests.Response: The response of the request.
+
+    Raises:
+        requests.RequestException: If the request fails.
+    """
+    return get_session(url).get(
+        url, headers=headers, stream=stream, timeout=timeout
+    )
+
+def http_head(url, timeout=10):
+    """
+    Sends a HEAD request through the shared session of the URL's host,
+    following redirects.
+
+    Args:
+        url (str): The URL to request.
+        timeout (int, optional): The maximum time (in seconds) to wait for a
+                                 response. Defaults to 10.
+
+    Returns:
+        requests.Response: The response of the request.
+
+    Raises:
+        requests.RequestException: If the request fails.
+    """
+    return get_session(url).head(url, allow_redirects=True, timeout=timeout)
+
+def is_http2_available():
+    """
+    Checks whether the optional HTTP/2 client packages are installed.
+
+    Returns:
+        bool: True if `httpx` and `h2` can be used.
+    """
+    return httpx is not None and find_spec('h2') is not None
+
+def configure_http2(enabled):
+    """
+    Selects the transport of the page requests: the pooled `requests`
+    sessions, or a shared HTTP/2 client when enabled and available.
+
+    Args:
+        enabled (bool): Whether the page requests should use HTTP/2.
+
+    Returns:
+        bool: True if the page requests use the HTTP/2 client.
+    """
+    client = PAGE_CLIENT['client']
+    if client is not None:
+        client.close()
+        PAGE_CLIENT['client'] = None
+
+    if enabled and is_http2_available():
+        transport = httpx.HTTPTransport(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=POOL_MAXSIZE,
+                max_keepalive_connections=POOL_CONNECTIONS
+            )
+        )
+        PAGE_CLIENT['client'] = httpx.Client(
+            transport=transport,
+            # Connection-specific headers are not allowed in HTTP/2
+            headers={'User-Agent': HEADERS['User-Agent']},
+            follow_redirects=True
+        )
+
+    return PAGE_CLIENT['client'] is not None
+
+def get_scrape_workers(workers):
+    """
+    Returns the number of threads of a scraping stage, raised when the page
+    requests are multiplexed over HTTP/2.
+
+    Args:
+        workers (int): The number of threads over HTTP/1.1.
+
+    Returns:
+        int: The number of threads of the stage.
+    """
+    if PAGE_CLIENT['client'] is None:
+        return workers
+
+    return max(workers, HTTP2_SCRAPE_WORKERS)
+
+def to_requests_response(response):
+    """
+    Converts a response of the HTTP/2 client into a `requests.Response`, so
+    that the callers and the retry engine handle both transports alike.
+
+    Args:
+        response (httpx.Response): The response of the HTTP/2 client.
+
+    Returns:
+        requests.Response: The equivalent response.
+    """
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.reason = response.reason_phrase
+    converted.headers = CaseInsensitiveDict(response.headers)
+    converted.url = str(response.url)
+    converted.encoding = response.encoding
+    # pylint: disable=protected-access
+    converted._content = response.content
+    return converted
+
+def http_get_page(url, headers=None, timeout=10):
+    """
+    Sends the GET request of a page, through the HTTP/2 client when it is
+    enabled, and through the shared session of the URL's host otherwise. A
+    page whose HTTP/2 exchange fails at the protocol level is requested again
+    over HTTP/1.1.
+
+    Args:
+        url (str): The URL to request.
+        headers (dict, optional): Extra headers merged with the default ones.
+                                  Defaults to None.
+        timeout (int, optional): The maximum time (in seconds) to wait for a
+                                 response. Defaults to 10.
+
+    Returns:
+        requests.Response: The response of the request, with its body read.
+
+    Raises:
+        requests.RequestException: If the request fails.
+    """
+    client = PAGE_CLIENT['client']
+    if client is None:
+        return http_get(url, headers=headers, timeout=timeout)
+
+    try:
+        return to_requests_response(
+            client.get(url, headers=headers, timeout=timeout)
+        )
+
+    except httpx.TimeoutException as timeout_err:
+        raise requests.Timeout(str(timeout_err)) from timeout_err
+
+    except (httpx.RemoteProtocolError, httpx.LocalProtocolError) as h2_err:
+        logger.warning("HTTP/2 error on %s, using HTTP/1.1: %s", url, h2_err)
+        return http_get(url, headers=headers, timeout=timeout)
+
+    except httpx.TransportError as transport_err:
+        raise requests.ConnectionError(str(transport_err)) from transport_err
+
+    except httpx.HTTPError as http_err:
+        raise requests.RequestException(str(http_err)) from http_err
+
+def get_connection_stats():
+    """
+    Counts the connections opened so far and the requests that reused an
+    already open connection, across every host.
+
+    Returns:
+        dict: The number of `new` connections and `reused` connections.
+    """
+    new_connections = 0
+    total_requests = 0
+
+    with SESSIONS_LOCK:
+        sessions = list(SESSIONS.values())
+
+    for session in sessions:
+        for adapter in set(session.adapters.values()):
+            for pool_key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools.get(pool_key)
+                if pool is not None:
+                    new_connections += pool.num_connections
+                    total_requests += pool.num_requests
+
+    return {
+        'new': new_connections,
+        'reused': max(0, total_requests - new_connections)
+    }
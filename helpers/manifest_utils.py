@@ -0,0 +1,206 @@
+"""
+This module keeps a manifest of the finished downloads of each series, stored
+as JSON in the series directory. Every entry records the source URL, the final
+filename, the size, the ETag/Last-Modified validators and an optional
+checksum, so that episodes already on disk can be skipped with one small HEAD
+request, or none at all, instead of being downloaded again.
+"""
+
+import os
+import json
+import threading
+
+from .http_utils import http_head
+
+MANIFEST_FILE = ".manifest.json"
+MANIFEST_LOCK = threading.Lock()
+
+def read_manifest(download_path):
+    """
+    Reads the manifest of a series directory.
+
+    Args:
+        download_path (str): The directory of the series.
+
+    Returns:
+        dict: The manifest entries keyed by filename, or an empty dictionary if
+              there is no readable manifest.
+    """
+    try:
+        manifest_path = os.path.join(download_path, MANIFEST_FILE)
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    except (OSError, ValueError):
+        return {}
+
+def write_manifest(download_path, manifest):
+    """
+    Writes the manifest of a series directory. Must be called with
+    `MANIFEST_LOCK` held.
+
+    Args:
+        download_path (str): The directory of the series.
+        manifest (dict): The manifest entries keyed by filename.
+    """
+    manifest_path = os.path.join(download_path, MANIFEST_FILE)
+
+    # Write to a temporary file first so the manifest is never truncated
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def record_episode(
+        final_path, source_url=None, etag=None, last_modified=None,
+        checksum=None
+):
+    """
+    Records a finished download in the manifest of its series directory.
+
+    Args:
+        final_path (str): The path of the downloaded episode.
+        source_url (str, optional): The video URL the episode was resolved
+                                    from. Defaults to None.
+        etag (str, optional): The ETag of the remote file. Defaults to None.
+        last_modified (str, optional): The Last-Modified date of the remote
+                                       file. Defaults to None.
+        checksum (str, optional): The checksum of the file, prefixed with the
+                                  hash algorithm. Defaults to None, which
+                                  keeps the checksum already recorded for a
+                                  file of the same size.
+    """
+    (download_path, filename) = os.path.split(final_path)
+    size = os.path.getsize(final_path)
+
+    with MANIFEST_LOCK:
+        manifest = read_manifest(download_path)
+        previous = manifest.get(filename)
+        if checksum is None and previous and previous['size'] == size:
+            checksum = previous.get('checksum')
+
+        manifest[filename] = {
+            'source_url': source_url,
+            'filename': filename,
+            'size': size,
+            'etag': etag,
+            'last_modified': last_modified,
+            'checksum': checksum
+        }
+        write_manifest(download_path, manifest)
+
+def remove_episode(final_path):
+    """
+    Removes an episode from the manifest of its series directory, so that it
+    is downloaded again.
+
+    Args:
+        final_path (str): The path of the episode.
+    """
+    (download_path, filename) = os.path.split(final_path)
+
+    with MANIFEST_LOCK:
+        manifest = read_manifest(download_path)
+        if manifest.pop(filename, None) is not None:
+            write_manifest(download_path, manifest)
+
+def iter_manifest_entries(root):
+    """
+    Iterates over the episodes recorded in the manifests of every series
+    directory under a folder.
+
+    Args:
+        root (str): The folder containing the series directories.
+
+    Yields:
+        tuple: The path of each recorded episode and its manifest entry.
+    """
+    for (download_path, _, filenames) in os.walk(root):
+        if MANIFEST_FILE not in filenames:
+            continue
+
+        for (filename, entry) in sorted(read_manifest(download_path).items()):
+            yield os.path.join(download_path, filename), entry
+
+def is_file_complete(final_path, entry):
+    """
+    Checks whether a file on disk matches the size recorded in its manifest
+    entry.
+
+    Args:
+        final_path (str): The path of the episode.
+        entry (dict): The manifest entry of the episode.
+
+    Returns:
+        bool: True if the file exists with the recorded size.
+    """
+    return (
+        entry is not None
+        and os.path.isfile(final_path)
+        and os.path.getsize(final_path) == entry['size']
+    )
+
+def find_completed_episode(download_path, source_url):
+    """
+    Looks up a finished episode by the video URL it was resolved from, without
+    any request.
+
+    Args:
+        download_path (str): The directory of the series.
+        source_url (str): The video URL of the episode.
+
+    Returns:
+        str: The path of the finished episode, or None if it has not been
+             downloaded completely.
+    """
+    for entry in read_manifest(download_path).values():
+        final_path = os.path.join(download_path, entry['filename'])
+        if entry['source_url'] == source_url and is_file_complete(
+            final_path, entry
+        ):
+            return final_path
+
+    return None
+
+def check_remote_file(download_link, final_path):
+    """
+    Checks with a HEAD request whether an episode on disk is identical to the
+    remote file, comparing the recorded ETag or Last-Modified validators when
+    available and the sizes otherwise.
+
+    Args:
+        download_link (str): The URL of the remote file.
+        final_path (str): The path of the episode on disk.
+
+    Returns:
+        requests.structures.CaseInsensitiveDict: The headers of the remote
+                                                 file if the episode on disk
+                                                 is up to date, None
+                                                 otherwise.
+
+    Raises:
+        requests.RequestException: If the HEAD request fails.
+    """
+    if not os.path.isfile(final_path):
+        return None
+
+    (download_path, filename) = os.path.split(final_path)
+    entry = read_manifest(download_path).get(filename)
+    local_size = os.path.getsize(final_path)
+    if entry and entry['size'] != local_size:
+        return None
+
+    response = http_head(download_link)
+    if not response.ok:
+        return None
+
+    headers = response.headers
+    validators = (('etag', 'etag'), ('last_modified', 'last-modified'))
+    for (key, header) in validators:
+        if entry and entry[key] and headers.get(header):
+            return headers if entry[key] == headers[header] else None
+
+    content_length = headers.get('content-length')
+    is_current = (
+        content_length is not None and int(content_length) == local_size
+    )
+    return headers if is_current else None
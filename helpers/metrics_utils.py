@@ -0,0 +1,402 @@
+"""
+This module provides the internal instrumentation of the downloader: counters,
+gauges and histograms updated by the scraping and download code, rendered in
+the Prometheus text exposition format. The metrics can be served on a local
+`/metrics` endpoint while a run is in progress, and are written to a summary
+file at the end of the run.
+"""
+
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .concurrency_utils import DOWNLOAD_LIMITER
+from .http_utils import get_connection_stats
+
+PREFIX = "hsd_"
+METRICS_FILE = "metrics.prom"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+THROUGHPUT_BUCKETS = tuple(
+    1024 * 2 ** exponent for exponent in range(6, 17, 2)
+)    # 64 KB/s to 64 MB/s
+
+REGISTRY = []
+logger = logging.getLogger(__name__)
+
+def escape_label(value):
+    """
+    Escapes a label value for the Prometheus text format.
+
+    Args:
+        value: The value of the label.
+
+    Returns:
+        str: The escaped value.
+    """
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+def format_labels(names, values):
+    """
+    Formats the labels of a sample.
+
+    Args:
+        names (tuple): The names of the labels.
+        values (tuple): The values of the labels.
+
+    Returns:
+        str: The labels between braces, or an empty string without labels.
+    """
+    if not names:
+        return ""
+
+    pairs = (
+        f'{name}="{escape_label(value)}"'
+        for (name, value) in zip(names, values)
+    )
+    return "{" + ",".join(pairs) + "}"
+
+class Metric:
+    """
+    The base of the metrics: a name, a help text, the names of its labels and
+    one value per combination of label values.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labels=()):
+        """
+        Initializes the metric and adds it to the registry.
+
+        Args:
+            name (str): The name of the metric, without the common prefix.
+            documentation (str): The help text of the metric.
+            labels (tuple, optional): The names of its labels. Defaults to no
+                                      label.
+        """
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.values = {}
+        REGISTRY.append(self)
+
+    def samples(self):
+        """
+        Returns the samples of the metric.
+
+        Returns:
+            list: The `(suffix, label names, label values, value)` tuples of
+                  the samples.
+        """
+        with self.lock:
+            return [
+                ("", self.labels, key, value)
+                for (key, value) in sorted(self.values.items())
+            ]
+
+    def render(self):
+        """
+        Renders the metric in the Prometheus text format.
+
+        Returns:
+            str: The lines of the metric.
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}"
+        ]
+        for (suffix, names, values, value) in self.samples():
+            labels = format_labels(names, values)
+            lines.append(f"{self.name}{suffix}{labels} {value!r}")
+
+        return "\n".join(lines)
+
+class Counter(Metric):
+    """
+    A value that only goes up, such as a number of bytes or of retries.
+    """
+
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        """
+        Increases the counter.
+
+        Args:
+            *labels: The values of the labels of the counter.
+            amount (float, optional): The amount to add. Defaults to 1.
+        """
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, such as a number of active downloads. Its
+    value can also be read from a function when the metrics are rendered.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, function=None):
+        """
+        Initializes the gauge.
+
+        Args:
+            name (str): The name of the gauge, without the common prefix.
+            documentation (str): The help text of the gauge.
+            function (callable, optional): Returns the value of the gauge.
+                                           Defaults to None, for a gauge set
+                                           by `inc` and `dec`.
+        """
+        super().__init__(name, documentation)
+        self.function = function
+        self.values[()] = 0
+
+    def inc(self, amount=1):
+        """
+        Increases the gauge.
+
+        Args:
+            amount (float, optional): The amount to add. Defaults to 1.
+        """
+        with self.lock:
+            self.values[()] += amount
+
+    def dec(self, amount=1):
+        """
+        Decreases the gauge.
+
+        Args:
+            amount (float, optional): The amount to remove. Defaults to 1.
+        """
+        self.inc(-amount)
+
+    @contextmanager
+    def track(self):
+        """
+        Increases the gauge for the duration of the context.
+        """
+        self.inc()
+        try:
+            yield
+
+        finally:
+            self.dec()
+
+    def samples(self):
+        """
+        Returns the sample of the gauge.
+
+        Returns:
+            list: The single sample of the gauge.
+        """
+        if self.function is not None:
+            return [("", (), (), self.function())]
+
+        return super().samples()
+
+class Histogram(Metric):
+    """
+    The distribution of observed values, such as latencies, counted in
+    cumulative buckets along with their sum and count.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets, labels=()):
+        """
+        Initializes the histogram.
+
+        Args:
+            name (str): The name of the histogram, without the common prefix.
+            documentation (str): The help text of the histogram.
+            buckets (tuple): The upper bounds of the buckets, in increasing
+                             order.
+            labels (tuple, optional): The names of its labels. Defaults to no
+                                      label.
+        """
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+
+    def observe(self, value, *labels):
+        """
+        Records an observed value.
+
+        Args:
+            value (float): The observed value.
+            *labels: The values of the labels of the histogram.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+                self.values[labels] = entry
+
+            entry['counts'][index] += 1
+            entry['sum'] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """
+        Observes the duration of the context, in seconds.
+
+        Args:
+            *labels: The values of the labels of the histogram.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+
+        finally:
+            self.observe(time.perf_counter() - started_at, *labels)
+
+    def samples(self):
+        """
+        Returns the cumulative buckets, sum and count of each combination of
+        label values.
+
+        Returns:
+            list: The samples of the histogram.
+        """
+        names = self.labels + ('le',)
+        samples = []
+        with self.lock:
+            for (key, entry) in sorted(self.values.items()):
+                cumulative = 0
+                bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+                for (bound, count) in zip(bounds, entry['counts']):
+                    cumulative += count
+                    samples.append(
+                        ("_bucket", names, key + (bound,), cumulative)
+                    )
+
+                samples.append(("_sum", self.labels, key, entry['sum']))
+                samples.append(("_count", self.labels, key, cumulative))
+
+        return samples
+
+BYTES_DOWNLOADED = Counter(
+    "bytes_downloaded_total", "Bytes written to disk by the downloads."
+)
+STREAM_THROUGHPUT = Histogram(
+    "stream_throughput_bytes_per_second",
+    "Average speed of each finished download stream.", THROUGHPUT_BUCKETS
+)
+DOWNLOADS = Counter(
+    "downloads_total", "Episode downloads by host and result.",
+    ('host', 'result')
+)
+PAGE_FETCH_SECONDS = Histogram(
+    "page_fetch_seconds", "Latency of the page requests.", LATENCY_BUCKETS
+)
+PARSE_SECONDS = Histogram(
+    "parse_seconds", "Time spent parsing or extracting data from pages.",
+    LATENCY_BUCKETS, ('parser',)
+)
+RETRIES = Counter(
+    "retries_total", "Attempts retried after a transient error.",
+    ('operation',)
+)
+ACTIVE_DOWNLOADS = Gauge(
+    "active_downloads", "Downloads currently transferring."
+)
+WORKER_LIMIT = Gauge(
+    "download_workers_limit",
+    "Simultaneous downloads allowed by the adaptive limiter.",
+    function=lambda: DOWNLOAD_LIMITER.limit
+)
+QUEUE_DEPTH = Gauge(
+    "queue_depth", "Resolved episodes waiting for a transfer slot."
+)
+HTTP_CONNECTIONS = Gauge(
+    "http_connections_opened",
+    "Connections opened by the pooled sessions of the open host pools.",
+    function=lambda: get_connection_stats()['new']
+)
+HTTP_REUSED = Gauge(
+    "http_connections_reused",
+    "Requests of the open host pools served on an already open connection.",
+    function=lambda: get_connection_stats()['reused']
+)
+
+def render_metrics():
+    """
+    Renders every registered metric in the Prometheus text format.
+
+    Returns:
+        str: The text exposition of the metrics.
+    """
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serves the metrics on `/metrics`.
+    """
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answers a GET request with the metrics, or 404 for any other path.
+        """
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Sends the access log to the logger instead of the standard error, so
+        it does not interfere with the progress display.
+        """
+        logger.debug(format, *args)
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """
+    Starts serving the metrics on a local HTTP endpoint from a background
+    thread.
+
+    Args:
+        port (int): The port to listen on.
+        host (str, optional): The address to bind. Defaults to the loopback
+                              interface.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+
+    Raises:
+        OSError: If the port cannot be bound.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return server
+
+def write_metrics_summary(path):
+    """
+    Writes the final value of every metric to a file, in the Prometheus text
+    format.
+
+    Args:
+        path (str): The path of the summary file.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(render_metrics())
@@ -2,31 +2,476 @@
 This module provides utility functions for tracking download progress
 using the Rich library. It includes features for creating a progress bar
 and a formatted progress table specifically designed for monitoring
-the download status of the current task.
+the download status of the current task. The bytes written by the downloads
+are counted without any lock and pushed to the progress bar, and to the
+byte and throughput metrics, at a fixed low rate by a single reporting
+thread.
+
+The progress can be rendered with Rich, reported as JSON-lines events for log
+shippers, or not reported at all, so that unattended runs (cron, systemd) pay
+no terminal rendering cost.
 """
 
+import sys
+import json
+import time
+import threading
+from contextlib import nullcontext
+
+from rich import filesize
+from rich.live import Live
 from rich.panel import Panel
 from rich.table import Table
+from rich.text import Text
 from rich.progress import (
     Progress,
+    ProgressColumn,
     SpinnerColumn,
     BarColumn,
-    TextColumn,
     TimeRemainingColumn
 )
 
+from .metrics_utils import BYTES_DOWNLOADED, STREAM_THROUGHPUT
+
+REFRESH_PER_SECOND = 4
+REPORT_INTERVAL = 1 / REFRESH_PER_SECOND
+
+class ByteCounter:
+    """
+    Counts the bytes written by a single download stream. Only the stream
+    that owns it writes to it, so counting a chunk is a plain addition without
+    any lock.
+    """
+
+    __slots__ = ('completed',)
+
+    def __init__(self, completed=0):
+        """
+        Initializes the counter.
+
+        Args:
+            completed (int, optional): The bytes already on disk. Defaults to
+                                       0.
+        """
+        self.completed = completed
+
+class ProgressReporter:
+    """
+    Pushes the byte counters of the running downloads to their progress tasks
+    at a fixed low rate, from a single background thread, instead of updating
+    the progress display on every chunk.
+    """
+
+    def __init__(self, interval=REPORT_INTERVAL):
+        """
+        Initializes the reporter.
+
+        Args:
+            interval (float, optional): The time (in seconds) between two
+                                        updates of the progress tasks.
+                                        Defaults to `REPORT_INTERVAL`.
+        """
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.thread = None
+
+    def track(self, task_info, total):
+        """
+        Starts reporting the progress of a download. Its streams then count
+        their bytes on the counters returned by `add_counter`.
+
+        Args:
+            task_info (tuple): A tuple containing progress-related objects.
+            total (int): The size of the file in bytes, or None if unknown.
+        """
+        (job_progress, task, _) = task_info
+
+        with self.lock:
+            self.entries[(id(job_progress), task)] = {
+                'progress': job_progress,
+                'task': task,
+                'total': total,
+                'counters': [],
+                'started_at': time.monotonic(),
+                'initial': 0,
+                'reported': 0
+            }
+            self.start()
+
+    def add_counter(self, task_info, completed=0):
+        """
+        Adds the counter of a stream of a tracked download. Downloads written
+        by several threads at once get one counter per thread.
+
+        Args:
+            task_info (tuple): A tuple containing progress-related objects.
+            completed (int, optional): The bytes of the stream already on
+                                       disk. Defaults to 0.
+
+        Returns:
+            ByteCounter: The counter of the stream.
+        """
+        (job_progress, task, _) = task_info
+        counter = ByteCounter(completed)
+
+        with self.lock:
+            entry = self.entries[(id(job_progress), task)]
+            entry['counters'].append(counter)
+            entry['initial'] += completed
+            entry['reported'] += completed
+
+        return counter
+
+    def finish(self, task_info):
+        """
+        Reports the final progress of a download, records its throughput and
+        stops tracking it.
+
+        Args:
+            task_info (tuple): A tuple containing progress-related objects.
+        """
+        (job_progress, task, _) = task_info
+
+        with self.lock:
+            entry = self.entries.pop((id(job_progress), task), None)
+            if entry is None:
+                return
+
+            self.report(entry)
+
+        transferred = entry['reported'] - entry['initial']
+        elapsed = time.monotonic() - entry['started_at']
+        if transferred > 0 and elapsed > 0:
+            STREAM_THROUGHPUT.observe(transferred / elapsed)
+
+    @staticmethod
+    def report(entry):
+        """
+        Updates a progress task with the sum of its counters, and adds the
+        bytes written since the last report to the byte metric. Must be called
+        with the lock held.
+
+        Args:
+            entry (dict): The tracked download.
+        """
+        completed = sum(counter.completed for counter in entry['counters'])
+        BYTES_DOWNLOADED.inc(amount=completed - entry['reported'])
+        entry['reported'] = completed
+        entry['progress'].update(
+            entry['task'], completed=completed, total=entry['total']
+        )
+
+    def start(self):
+        """
+        Starts the reporting thread if it is not running yet. Must be called
+        with the lock held.
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self.run, name="progress-reporter", daemon=True
+            )
+            self.thread.start()
+
+    def run(self):
+        """
+        Reports the progress of every tracked download at a fixed interval.
+        """
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                for entry in self.entries.values():
+                    self.report(entry)
+
+PROGRESS_REPORTER = ProgressReporter()
+
+class AmountColumn(ProgressColumn):
+    """
+    Shows the percentage of a task, or for a download of unknown size, the
+    bytes received so far and the transfer rate.
+    """
+
+    def render(self, task):
+        """
+        Renders the column for a task.
+
+        Args:
+            task (rich.progress.Task): The task to render.
+
+        Returns:
+            Text: The percentage, or the amount and rate of the transfer.
+        """
+        style = "progress.percentage"
+        if task.total is not None:
+            return Text(f"{task.percentage:>3.0f}%", style=style)
+
+        if not task.completed:
+            return Text("  -", style=style)
+
+        amount = filesize.decimal(int(task.completed))
+        rate = filesize.decimal(int(task.speed or 0))
+        return Text(f"{amount} @ {rate}/s", style="progress.download")
+
+RICH = 'rich'
+JSON = 'json'
+SILENT = 'silent'
+AUTO = 'auto'
+PROGRESS_MODES = (AUTO, RICH, JSON, SILENT)
+
+EVENT_INTERVAL = 5.0    # Seconds between two progress events of a task
+PROGRESS_STATE = {'mode': RICH}
+
+class EventProgress:
+    """
+    Stands in for a Rich `Progress` when no terminal is rendered. It keeps
+    the same `add_task`/`update`/`advance` interface, and writes each task's
+    lifecycle as JSON-lines events (start, progress, finish and error, with
+    bytes, rate and ETA) to a stream, or nothing at all without a stream.
+    """
+
+    def __init__(self, stream=None, interval=EVENT_INTERVAL):
+        """
+        Initializes the progress.
+
+        Args:
+            stream (file, optional): The stream the events are written to.
+                                     Defaults to None, which reports nothing.
+            interval (float, optional): The minimum time (in seconds) between
+                                        two progress events of a task.
+                                        Defaults to `EVENT_INTERVAL`.
+        """
+        self.stream = stream
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.tasks = {}
+
+    def add_task(self, description, total=None, visible=True, **fields):
+        """
+        Adds a task, started right away if it is visible.
+
+        Args:
+            description (str): The description of the task.
+            total (float, optional): The total of the task. Defaults to None.
+            visible (bool, optional): Whether the task is started. Defaults to
+                                      True.
+            **fields: Ignored, for compatibility with Rich.
+
+        Returns:
+            int: The ID of the task.
+        """
+        now = time.monotonic()
+
+        with self.lock:
+            task_id = len(self.tasks)
+            self.tasks[task_id] = {
+                'description': Text.from_markup(description).plain,
+                'total': total,
+                'completed': 0,
+                'started': False,
+                'finished': False,
+                'started_at': now,
+                'reported_at': now,
+                'reported': 0
+            }
+
+        self.update(task_id, visible=visible, **fields)
+        return task_id
+
+    def advance(self, task_id, advance=1):
+        """
+        Advances a task.
+
+        Args:
+            task_id (int): The ID of the task.
+            advance (float, optional): The amount to add to the completed
+                                       total. Defaults to 1.
+        """
+        self.update(task_id, advance=advance)
+
+    def update(
+            self, task_id, *, total=None, completed=None, advance=None,
+            description=None, visible=None, **fields
+    ):
+        """
+        Updates a task and writes the events of its new state. A task starts
+        when it becomes visible, and finishes when it reaches its total or is
+        hidden with a `status` field of 'done' or 'failed', even if it never
+        started.
+
+        Args:
+            task_id (int): The ID of the task.
+            total (float, optional): The new total. Defaults to None.
+            completed (float, optional): The new completed amount. Defaults to
+                                         None.
+            advance (float, optional): The amount to add to the completed
+                                       amount. Defaults to None.
+            description (str, optional): The new description. Defaults to
+                                         None.
+            visible (bool, optional): Whether the task is shown. Defaults to
+                                      None.
+            **fields: The `status` of a hidden task and its `error` message.
+        """
+        with self.lock:
+            task = self.tasks[task_id]
+            if total is not None:
+                task['total'] = total
+            if completed is not None:
+                task['completed'] = completed
+            if advance is not None:
+                task['completed'] += advance
+            if description is not None:
+                task['description'] = Text.from_markup(description).plain
+
+            if visible and not task['started']:
+                self.start(task)
+            elif not task['finished'] and (
+                task['started'] or 'status' in fields
+            ):
+                self.check_progress(task, fields)
+
+    def start(self, task):
+        """
+        Starts a task. Must be called with the lock held.
+
+        Args:
+            task (dict): The task to start.
+        """
+        now = time.monotonic()
+        task.update(
+            started=True, started_at=now, reported_at=now,
+            reported=task['completed']
+        )
+        self.emit('start', task)
+
+    def check_progress(self, task, fields):
+        """
+        Writes the finish, error or progress event of a started task, if any
+        is due. Must be called with the lock held.
+
+        Args:
+            task (dict): The task to check.
+            fields (dict): The extra fields of the update.
+        """
+        status = fields.get('status')
+        total = task['total']
+        if status == 'failed':
+            task['finished'] = True
+            self.emit('error', task, error=fields.get('error'))
+        elif status == 'done' or (total and task['completed'] >= total):
+            task['finished'] = True
+            self.emit('finish', task)
+        elif time.monotonic() - task['reported_at'] >= self.interval:
+            self.emit('progress', task)
+
+    def emit(self, event, task, **extra):
+        """
+        Writes an event of a task, with its measured rate and ETA. Must be
+        called with the lock held.
+
+        Args:
+            event (str): The name of the event.
+            task (dict): The task the event is about.
+            **extra: Additional fields of the event.
+        """
+        now = time.monotonic()
+        if event == 'progress':
+            elapsed = now - task['reported_at']
+            rate = (task['completed'] - task['reported']) / elapsed
+        else:
+            elapsed = now - task['started_at']
+            rate = task['completed'] / elapsed if elapsed > 0 else 0.0
+
+        task.update(reported_at=now, reported=task['completed'])
+        if self.stream is None:
+            return
+
+        total = task['total']
+        remaining = total - task['completed'] if total else None
+        record = {
+            'event': event,
+            'time': round(time.time(), 3),
+            'task': task['description'],
+            'completed': task['completed'],
+            'total': total,
+            'rate': round(rate, 1),
+            'eta': round(remaining / rate, 1) if remaining and rate else None,
+            **extra
+        }
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+def configure_progress(mode=AUTO):
+    """
+    Selects how the progress is reported for the current run.
+
+    Args:
+        mode (str, optional): 'rich' to render the progress in the terminal,
+                              'json' to write JSON-lines events to the
+                              standard output, 'silent' to report nothing, or
+                              'auto' to render it only when the standard
+                              output is a terminal and write events
+                              otherwise. Defaults to 'auto'.
+    """
+    if mode == AUTO:
+        mode = RICH if sys.stdout.isatty() else JSON
+
+    PROGRESS_STATE['mode'] = mode
+
+def get_progress_mode():
+    """
+    Returns how the progress is reported for the current run.
+
+    Returns:
+        str: 'rich', 'json' or 'silent'.
+    """
+    return PROGRESS_STATE['mode']
+
+def is_interactive():
+    """
+    Tells whether the progress is rendered in the terminal.
+
+    Returns:
+        bool: True if the progress is rendered with Rich.
+    """
+    return get_progress_mode() == RICH
+
+def report_message(message, event='error'):
+    """
+    Reports a message outside of any task: as an event in the 'json' mode,
+    whose standard output only carries events, and on the standard error
+    otherwise.
+
+    Args:
+        message (str): The message to report.
+        event (str, optional): The name of the event, such as 'error' or
+                               'warning'. Defaults to 'error'.
+    """
+    if get_progress_mode() == JSON:
+        record = {
+            'event': event, 'time': round(time.time(), 3), 'message': message
+        }
+        print(json.dumps(record), flush=True)
+    else:
+        print(message, file=sys.stderr)
+
 def create_progress_bar():
     """
-    Creates and returns a progress bar for tracking download progress.
+    Creates and returns a progress bar for tracking download progress, or the
+    event reporter standing in for it when the progress is not rendered.
 
     Returns:
-        Progress: A Progress object configured with relevant columns.
+        Progress: A Progress object configured with relevant columns, or an
+                  `EventProgress` in the 'json' and 'silent' modes.
     """
+    mode = get_progress_mode()
+    if mode != RICH:
+        return EventProgress(sys.stdout if mode == JSON else None)
+
     return Progress(
         "{task.description}",
         SpinnerColumn(),
         BarColumn(),
-        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        AmountColumn(),
         "•",
         TimeRemainingColumn()
     )
@@ -55,3 +500,23 @@ def create_progress_table(title, job_progress):
         )
     )
     return progress_table
+
+def progress_display(title, job_progress):
+    """
+    Returns the context rendering a progress bar while the downloads run.
+
+    Args:
+        title (str): The title of the progress panel.
+        job_progress: The progress bar created by `create_progress_bar`.
+
+    Returns:
+        A `Live` display of the progress panel, or a context doing nothing
+        when the progress is not rendered.
+    """
+    if not isinstance(job_progress, Progress):
+        return nullcontext()
+
+    return Live(
+        create_progress_table(title, job_progress),
+        refresh_per_second=REFRESH_PER_SECOND
+    )
@@ -0,0 +1,267 @@
+"""
+This module provides the durable job queue of the download daemon, stored in
+a SQLite database under the download folder. Every series goes through the
+states series (its page must be scraped), episodes (its episode pages must be
+resolved) and done, and every episode through episodes (its page must be
+resolved), transfers (its video must be downloaded) and done or failed. Each
+step is committed as soon as it completes, so a daemon restarted after a
+crash picks up every job where it left off.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+from .general_utils import DOWNLOAD_FOLDER
+
+QUEUE_FILE = os.path.join(DOWNLOAD_FOLDER, ".queue.sqlite3")
+
+SERIES = 'series'
+EPISODES = 'episodes'
+TRANSFERS = 'transfers'
+DONE = 'done'
+FAILED = 'failed'
+
+PENDING_STATES = (EPISODES, TRANSFERS)
+
+QUEUE_LOCK = threading.Lock()
+QUEUE_STATE = {'connection': None}
+
+def get_connection():
+    """
+    Returns the connection to the queue database, creating the database on
+    first use. Must be called with `QUEUE_LOCK` held.
+
+    Returns:
+        sqlite3.Connection: The connection to the queue database.
+    """
+    if QUEUE_STATE['connection'] is None:
+        os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+        connection = sqlite3.connect(QUEUE_FILE, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS series ("
+            "url TEXT PRIMARY KEY, name TEXT, download_path TEXT, "
+            "state TEXT, error TEXT, added_at REAL, updated_at REAL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS episodes ("
+            "series_url TEXT, number INTEGER, episode_url TEXT, "
+            "video_url TEXT, state TEXT, updated_at REAL, "
+            "PRIMARY KEY (series_url, number))"
+        )
+        connection.commit()
+        QUEUE_STATE['connection'] = connection
+
+    return QUEUE_STATE['connection']
+
+def enqueue_series(url):
+    """
+    Adds a series to the queue. A series already finished is queued again,
+    along with its failed episodes, while its downloaded episodes are kept.
+
+    Args:
+        url (str): The URL of the series.
+    """
+    now = time.time()
+    with QUEUE_LOCK:
+        connection = get_connection()
+        with connection:
+            connection.execute(
+                "INSERT INTO series (url, state, added_at, updated_at) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET "
+                "state = excluded.state, error = NULL, "
+                "updated_at = excluded.updated_at "
+                "WHERE state IN (?, ?)",
+                (url, SERIES, now, now, DONE, FAILED)
+            )
+            connection.execute(
+                "UPDATE episodes SET state = ?, updated_at = ? "
+                "WHERE series_url = ? AND state = ?",
+                (EPISODES, now, url, FAILED)
+            )
+
+def get_active_series():
+    """
+    Returns the series that still have work to do, oldest first.
+
+    Returns:
+        list: The URLs of the series in the series or episodes state.
+    """
+    with QUEUE_LOCK:
+        rows = get_connection().execute(
+            "SELECT url FROM series WHERE state IN (?, ?) ORDER BY added_at",
+            (SERIES, EPISODES)
+        ).fetchall()
+
+    return [row['url'] for row in rows]
+
+def get_series(url):
+    """
+    Returns the queue entry of a series.
+
+    Args:
+        url (str): The URL of the series.
+
+    Returns:
+        dict: The name, download path, state and error of the series, or None
+              if it is not queued.
+    """
+    with QUEUE_LOCK:
+        row = get_connection().execute(
+            "SELECT * FROM series WHERE url = ?", (url,)
+        ).fetchone()
+
+    return dict(row) if row else None
+
+def set_series_state(url, state, error=None):
+    """
+    Moves a series to a new state.
+
+    Args:
+        url (str): The URL of the series.
+        state (str): The new state.
+        error (Exception, optional): The error of a failed series. Defaults to
+                                     None.
+    """
+    with QUEUE_LOCK:
+        connection = get_connection()
+        with connection:
+            connection.execute(
+                "UPDATE series SET state = ?, error = ?, updated_at = ? "
+                "WHERE url = ?",
+                (state, str(error) if error else None, time.time(), url)
+            )
+
+def save_episodes(url, hanime_name, download_path, episodes):
+    """
+    Records the episodes scraped from a series page and moves the series to
+    the episodes state, in a single transaction. Episodes already queued keep
+    their state.
+
+    Args:
+        url (str): The URL of the series.
+        hanime_name (str): The name of the series.
+        download_path (str): The directory the episodes are saved to.
+        episodes (list): The `(episode_number, episode_url)` pairs of the
+                         series.
+    """
+    now = time.time()
+    with QUEUE_LOCK:
+        connection = get_connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO episodes "
+                "(series_url, number, episode_url, state, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (url, number, episode_url, EPISODES, now)
+                    for (number, episode_url) in episodes
+                ]
+            )
+            connection.execute(
+                "UPDATE series SET name = ?, download_path = ?, state = ?, "
+                "updated_at = ? WHERE url = ?",
+                (hanime_name, download_path, EPISODES, now, url)
+            )
+
+def get_episodes(url):
+    """
+    Returns the queued episodes of a series.
+
+    Args:
+        url (str): The URL of the series.
+
+    Returns:
+        list: The episodes as dictionaries (number, episode URL, video URL and
+              state), by episode number.
+    """
+    with QUEUE_LOCK:
+        rows = get_connection().execute(
+            "SELECT number, episode_url, video_url, state FROM episodes "
+            "WHERE series_url = ? ORDER BY number",
+            (url,)
+        ).fetchall()
+
+    return [dict(row) for row in rows]
+
+def set_episode_state(url, number, state, video_url=None):
+    """
+    Moves an episode to a new state.
+
+    Args:
+        url (str): The URL of the series.
+        number (int): The number of the episode.
+        state (str): The new state.
+        video_url (str, optional): The video URL the episode page resolved
+                                   to, kept if None. Defaults to None.
+    """
+    with QUEUE_LOCK:
+        connection = get_connection()
+        with connection:
+            connection.execute(
+                "UPDATE episodes SET state = ?, "
+                "video_url = COALESCE(?, video_url), updated_at = ? "
+                "WHERE series_url = ? AND number = ?",
+                (state, video_url, time.time(), url, number)
+            )
+
+def finish_series(url):
+    """
+    Closes a series once none of its episodes is pending: it moves to the
+    failed state if some of its episodes failed, and to the done state
+    otherwise.
+
+    Args:
+        url (str): The URL of the series.
+
+    Returns:
+        bool: True if the series is closed.
+    """
+    with QUEUE_LOCK:
+        connection = get_connection()
+        with connection:
+            states = dict(connection.execute(
+                "SELECT state, COUNT(*) FROM episodes "
+                "WHERE series_url = ? GROUP BY state",
+                (url,)
+            ).fetchall())
+            if any(state in states for state in PENDING_STATES):
+                return False
+
+            connection.execute(
+                "UPDATE series SET state = ?, updated_at = ? WHERE url = ?",
+                (FAILED if FAILED in states else DONE, time.time(), url)
+            )
+            return True
+
+def requeue_episode(video_url):
+    """
+    Queues the episodes resolved to a video URL for download again, along
+    with their series.
+
+    Args:
+        video_url (str): The video URL of the episode.
+
+    Returns:
+        bool: True if the episode was in the queue.
+    """
+    now = time.time()
+    with QUEUE_LOCK:
+        connection = get_connection()
+        with connection:
+            requeued = connection.execute(
+                "UPDATE episodes SET state = ?, updated_at = ? "
+                "WHERE video_url = ?",
+                (TRANSFERS, now, video_url)
+            ).rowcount
+            connection.execute(
+                "UPDATE series SET state = ?, error = NULL, updated_at = ? "
+                "WHERE url IN "
+                "(SELECT series_url FROM episodes WHERE video_url = ?)",
+                (EPISODES, now, video_url)
+            )
+
+    return requeued > 0
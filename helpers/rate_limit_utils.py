@@ -0,0 +1,305 @@
+"""
+This module provides token-bucket rate limiting for the downloader: a global
+bandwidth limit shared by every download stream, a bandwidth limit per host
+and a cap on the number of page requests per second. The limits can be set
+from the command line and changed while running through a JSON control file,
+which is reloaded when it is modified or when the process receives SIGHUP.
+Download streams look up their host bucket once, and skip the buckets
+entirely while no bandwidth limit is set.
+"""
+
+import os
+import re
+import json
+import time
+import signal
+import logging
+import threading
+from urllib.parse import urlparse
+
+CONTROL_FILE = "RateLimits.json"
+CONTROL_POLL_INTERVAL = 1.0
+
+RATE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*$', re.I)
+RATE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. Consumers take tokens as they go and sleep
+    for as long as the bucket is in debt, so concurrent consumers share the
+    rate.
+    """
+
+    def __init__(self, rate=None):
+        """
+        Initializes the bucket.
+
+        Args:
+            rate (float, optional): The number of tokens added per second, or
+                                    None for no limit. Defaults to None.
+        """
+        self.lock = threading.Lock()
+        self.rate = None
+        self.capacity = 0
+        self.tokens = 0
+        self.updated_at = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """
+        Changes the rate of the bucket. Its capacity allows bursts of one
+        second worth of tokens.
+
+        Args:
+            rate (float): The number of tokens added per second, or None for
+                          no limit.
+        """
+        with self.lock:
+            self.rate = rate if rate and rate > 0 else None
+            self.capacity = max(1.0, self.rate or 0)
+            self.tokens = min(self.tokens, self.capacity)
+            self.updated_at = time.monotonic()
+
+    def take(self, amount):
+        """
+        Takes tokens from the bucket without waiting.
+
+        Args:
+            amount (float): The number of tokens to take.
+
+        Returns:
+            float: The time (in seconds) until the bucket is no longer in
+                   debt, which the consumer must wait.
+        """
+        with self.lock:
+            if self.rate is None:
+                return 0
+
+            now = time.monotonic()
+            elapsed = now - self.updated_at
+            self.tokens = min(
+                self.capacity, self.tokens + elapsed * self.rate
+            )
+            self.updated_at = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+    def consume(self, amount):
+        """
+        Takes tokens from the bucket, sleeping until the bucket is no longer
+        in debt.
+
+        Args:
+            amount (float): The number of tokens to take.
+        """
+        wait = self.take(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+BANDWIDTH_BUCKET = TokenBucket()
+REQUEST_BUCKET = TokenBucket()
+HOST_BUCKETS = {}
+LIMITS_LOCK = threading.Lock()
+LIMITS = {
+    'bandwidth': None,
+    'host_bandwidth': None,
+    'requests_per_second': None
+}
+
+# Set by the SIGHUP handler, and cleared by the thread reloading the limits
+RELOAD_STATE = {'requested': False}
+
+def parse_rate(value):
+    """
+    Parses a rate given as a number of bytes per second, optionally with a
+    K, M or G suffix (e.g. '500K', '2M').
+
+    Args:
+        value (str | int | float | None): The rate to parse.
+
+    Returns:
+        float: The rate in bytes per second, or None for no limit.
+
+    Raises:
+        ValueError: If the rate is not in a valid format.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return float(value) if value else None
+
+    match = RATE_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Invalid rate: {value}")
+
+    return float(match.group(1)) * RATE_UNITS[match.group(2).upper()]
+
+def configure_limits(
+        bandwidth=None, host_bandwidth=None, requests_per_second=None
+):
+    """
+    Sets the rate limits. They apply immediately to the running downloads.
+
+    Args:
+        bandwidth (str | float, optional): The global bandwidth limit in bytes
+                                           per second. Defaults to None.
+        host_bandwidth (str | float, optional): The bandwidth limit of each
+                                                host in bytes per second.
+                                                Defaults to None.
+        requests_per_second (float, optional): The maximum number of page
+                                               requests per second. Defaults
+                                               to None.
+
+    Raises:
+        ValueError: If a rate is not in a valid format.
+    """
+    with LIMITS_LOCK:
+        LIMITS['bandwidth'] = parse_rate(bandwidth)
+        LIMITS['host_bandwidth'] = parse_rate(host_bandwidth)
+        LIMITS['requests_per_second'] = (
+            float(requests_per_second) if requests_per_second else None
+        )
+
+        BANDWIDTH_BUCKET.set_rate(LIMITS['bandwidth'])
+        REQUEST_BUCKET.set_rate(LIMITS['requests_per_second'])
+        for bucket in HOST_BUCKETS.values():
+            bucket.set_rate(LIMITS['host_bandwidth'])
+
+def get_host_bucket(url):
+    """
+    Returns the bandwidth bucket of the host of the given URL, creating it on
+    first use.
+
+    Args:
+        url (str): The URL whose host the bucket is for.
+
+    Returns:
+        TokenBucket: The bucket of the host.
+    """
+    host = urlparse(url).netloc
+
+    with LIMITS_LOCK:
+        bucket = HOST_BUCKETS.get(host)
+        if bucket is None:
+            bucket = TokenBucket(LIMITS['host_bandwidth'])
+            HOST_BUCKETS[host] = bucket
+
+        return bucket
+
+def reserve_bytes(host_bucket, num_bytes):
+    """
+    Takes downloaded bytes from the global and per-host bandwidth buckets
+    without waiting.
+
+    Args:
+        host_bucket (TokenBucket): The bucket of the host the bytes were
+                                   downloaded from, from `get_host_bucket`.
+        num_bytes (int): The number of bytes downloaded.
+
+    Returns:
+        float: The time (in seconds) to wait before the bytes fit within both
+               limits, 0 when no bandwidth limit is set.
+    """
+    if LIMITS['bandwidth'] is None and LIMITS['host_bandwidth'] is None:
+        return 0
+
+    return max(
+        BANDWIDTH_BUCKET.take(num_bytes), host_bucket.take(num_bytes)
+    )
+
+def throttle_bytes(host_bucket, num_bytes):
+    """
+    Waits until the given number of downloaded bytes fits within the global
+    and per-host bandwidth limits.
+
+    Args:
+        host_bucket (TokenBucket): The bucket of the host the bytes were
+                                   downloaded from, from `get_host_bucket`.
+        num_bytes (int): The number of bytes downloaded.
+    """
+    wait = reserve_bytes(host_bucket, num_bytes)
+    if wait > 0:
+        time.sleep(wait)
+
+def throttle_request():
+    """
+    Waits until a page request fits within the requests-per-second cap.
+    """
+    REQUEST_BUCKET.consume(1)
+
+def load_control_file(control_file=CONTROL_FILE):
+    """
+    Applies the limits found in the control file. Limits missing from the
+    file are removed.
+
+    Args:
+        control_file (str, optional): The path of the JSON control file.
+                                      Defaults to `CONTROL_FILE`.
+    """
+    try:
+        with open(control_file, 'r', encoding='utf-8') as file:
+            limits = json.load(file)
+
+        configure_limits(
+            bandwidth=limits.get('bandwidth'),
+            host_bandwidth=limits.get('host_bandwidth'),
+            requests_per_second=limits.get('requests_per_second')
+        )
+        logger.info("Rate limits reloaded: %s", LIMITS)
+
+    except (OSError, ValueError, TypeError, AttributeError) as load_err:
+        logger.warning(
+            "Invalid rate limit file %s: %s", control_file, load_err
+        )
+
+def request_reload(*_):
+    """
+    Handles SIGHUP by asking the watching thread to reload the limits. The
+    handler only sets a flag, as it may interrupt the main thread while it
+    holds the locks the reload takes.
+    """
+    RELOAD_STATE['requested'] = True
+
+def watch_control_file(control_file=CONTROL_FILE):
+    """
+    Applies the limits of the control file if it exists, then reloads them
+    whenever the file is modified, and on SIGHUP where the platform supports
+    it, until the returned event is set. An existing control file overrides
+    the limits given on the command line. Must be called from the main
+    thread.
+
+    Args:
+        control_file (str, optional): The path of the JSON control file.
+                                      Defaults to `CONTROL_FILE`.
+
+    Returns:
+        threading.Event: Stops the watching thread when set.
+    """
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, request_reload)
+
+    def get_modified_time():
+        try:
+            return os.path.getmtime(control_file)
+
+        except OSError:
+            return None
+
+    last_modified = get_modified_time()
+    if last_modified is not None:
+        load_control_file(control_file)
+
+    stop = threading.Event()
+
+    def poll():
+        previous = last_modified
+        while not stop.wait(CONTROL_POLL_INTERVAL):
+            modified = get_modified_time()
+            is_modified = modified is not None and modified != previous
+            if is_modified or RELOAD_STATE['requested']:
+                RELOAD_STATE['requested'] = False
+                load_control_file(control_file)
+            previous = modified
+
+    threading.Thread(target=poll, name="rate-limits", daemon=True).start()
+    return stop
@@ -0,0 +1,290 @@
+"""
+This module provides the retry engine of the downloader. Errors are sorted
+into retryable ones (connection failures, timeouts, truncated streams and
+transient statuses such as 429 or 503) and fatal ones, retryable errors are
+retried with an exponential backoff and full jitter within a retry budget
+shared by every attempt made for an episode, and the items that still fail
+are collected into a summary printed at the end of the run.
+"""
+
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+
+import requests
+from rich.console import Console
+from rich.table import Table
+
+from .metrics_utils import RETRIES
+from .progress_utils import JSON, get_progress_mode
+
+EPISODE_ATTEMPTS = 6    # Attempts per episode, across every host
+HOST_ATTEMPTS = 3       # Attempts on a host before failing over
+PAGE_ATTEMPTS = 3       # Attempts for a single page fetch
+
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+
+RETRYABLE_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+RETRYABLE_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.ContentDecodingError,
+    requests.exceptions.RetryError
+)
+
+FAILURES = []
+FAILURES_LOCK = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+class RetryBudget:
+    """
+    Counts the attempts made for an item, so that retries and failovers
+    together never exceed a fixed number of attempts.
+    """
+
+    def __init__(self, attempts=EPISODE_ATTEMPTS):
+        """
+        Initializes the budget.
+
+        Args:
+            attempts (int, optional): The total number of attempts allowed.
+                                      Defaults to `EPISODE_ATTEMPTS`.
+        """
+        self.attempts = attempts
+        self.used = 0
+
+    @property
+    def exhausted(self):
+        """
+        bool: True if no attempt is left.
+        """
+        return self.used >= self.attempts
+
+    def spend(self):
+        """
+        Records an attempt.
+        """
+        self.used += 1
+
+def get_status(error):
+    """
+    Returns the HTTP status of the response behind an error, if any.
+
+    Args:
+        error (Exception): The error to inspect.
+
+    Returns:
+        int: The HTTP status, or None if the error carries no response.
+    """
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+def is_retryable(error):
+    """
+    Tells whether an error is transient and worth retrying.
+
+    Args:
+        error (Exception): The error to classify.
+
+    Returns:
+        bool: True for connection failures, timeouts, truncated streams and
+              transient HTTP statuses, False for any other error.
+    """
+    if isinstance(error, requests.HTTPError):
+        return get_status(error) in RETRYABLE_STATUSES
+
+    return isinstance(error, RETRYABLE_ERRORS)
+
+def get_retry_delay(attempt, error=None):
+    """
+    Computes the delay before the next attempt, using an exponential backoff
+    with full jitter, or the delay asked by the server in a `Retry-After`
+    header when it is longer.
+
+    Args:
+        attempt (int): The number of attempts made so far.
+        error (Exception, optional): The error of the last attempt. Defaults to
+                                     None.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+    response = getattr(error, 'response', None)
+    retry_after = getattr(response, 'headers', {}).get('retry-after', '')
+    if retry_after.isdigit():
+        delay = max(delay, min(MAX_DELAY, float(retry_after)))
+
+    return delay
+
+def should_retry(error, attempt, attempts, budget):
+    """
+    Decides whether a failed attempt is retried.
+
+    Args:
+        error (requests.RequestException): The error of the attempt.
+        attempt (int): The number of attempts made so far.
+        attempts (int): The maximum number of attempts.
+        budget (RetryBudget): The budget of the item.
+
+    Returns:
+        bool: True if the error is retryable and attempts are left.
+    """
+    return (
+        is_retryable(error) and attempt < attempts and not budget.exhausted
+    )
+
+def retry_call(func, *args, budget=None, attempts=HOST_ATTEMPTS):
+    """
+    Calls a function, retrying it with backoff while it fails with a
+    retryable error.
+
+    Args:
+        func (callable): The function to call.
+        *args: The positional arguments of the function.
+        budget (RetryBudget, optional): The budget the attempts are taken
+                                        from. Defaults to a new budget.
+        attempts (int, optional): The maximum number of attempts of this call.
+                                  Defaults to `HOST_ATTEMPTS`.
+
+    Returns:
+        The value returned by the function.
+
+    Raises:
+        requests.RequestException: The last error, if it is fatal or no
+                                   attempt is left.
+    """
+    budget = budget or RetryBudget(attempts)
+    attempt = 0
+
+    while True:
+        budget.spend()
+        attempt += 1
+
+        try:
+            return func(*args)
+
+        except requests.RequestException as req_err:
+            if not should_retry(req_err, attempt, attempts, budget):
+                raise
+
+            delay = get_retry_delay(attempt, req_err)
+            RETRIES.inc(func.__name__)
+            logger.info(
+                "Retrying %s in %.1fs: %s", func.__name__, delay, req_err
+            )
+            time.sleep(delay)
+
+async def retry_call_async(func, *args, budget=None, attempts=HOST_ATTEMPTS):
+    """
+    Awaits a coroutine function, retrying it with backoff while it fails with
+    a retryable error.
+
+    Args:
+        func (coroutine function): The coroutine function to await.
+        *args: The positional arguments of the function.
+        budget (RetryBudget, optional): The budget the attempts are taken
+                                        from. Defaults to a new budget.
+        attempts (int, optional): The maximum number of attempts of this call.
+                                  Defaults to `HOST_ATTEMPTS`.
+
+    Returns:
+        The value returned by the function.
+
+    Raises:
+        requests.RequestException: The last error, if it is fatal or no
+                                   attempt is left.
+    """
+    budget = budget or RetryBudget(attempts)
+    attempt = 0
+
+    while True:
+        budget.spend()
+        attempt += 1
+
+        try:
+            return await func(*args)
+
+        except requests.RequestException as req_err:
+            if not should_retry(req_err, attempt, attempts, budget):
+                raise
+
+            delay = get_retry_delay(attempt, req_err)
+            RETRIES.inc(func.__name__)
+            logger.info(
+                "Retrying %s in %.1fs: %s", func.__name__, delay, req_err
+            )
+            await asyncio.sleep(delay)
+
+def record_failure(stage, url, error, attempts=None):
+    """
+    Records an item that could not be processed, for the final summary.
+
+    Args:
+        stage (str): The step that failed (e.g. 'series', 'episode',
+                     'download').
+        url (str): The URL of the item.
+        error (Exception): The last error of the item.
+        attempts (int, optional): The number of attempts made. Defaults to
+                                  None when it is not known.
+    """
+    failure = {
+        'stage': stage,
+        'url': url,
+        'kind': 'retryable' if is_retryable(error) else 'fatal',
+        'error': type(error).__name__,
+        'message': str(error),
+        'attempts': attempts
+    }
+    logger.warning("Failed %s %s: %s", stage, url, error)
+
+    with FAILURES_LOCK:
+        FAILURES.append(failure)
+
+def get_failures():
+    """
+    Returns the failures recorded so far.
+
+    Returns:
+        list: The recorded failures, as dictionaries.
+    """
+    with FAILURES_LOCK:
+        return list(FAILURES)
+
+def print_failure_summary():
+    """
+    Prints a table of the items that failed during the run, if any, or one
+    JSON line per failure when the progress is reported as JSON events.
+    """
+    failures = get_failures()
+    if not failures:
+        return
+
+    if get_progress_mode() == JSON:
+        for failure in failures:
+            print(json.dumps({'event': 'failure', **failure}), flush=True)
+        return
+
+    table = Table(
+        title=f"{len(failures)} failed item(s)", title_style="bold red"
+    )
+    for column in ("Stage", "URL", "Error", "Kind", "Attempts"):
+        table.add_column(column, overflow="fold")
+
+    for failure in failures:
+        table.add_row(
+            failure['stage'],
+            failure['url'],
+            f"{failure['error']}: {failure['message']}",
+            failure['kind'],
+            str(failure['attempts'] or '-')
+        )
+
+    Console().print(table)
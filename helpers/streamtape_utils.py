@@ -1,70 +1,290 @@
+#!/usr/bin/env python
 """
 This module provides functionality to extract specific information from the
 HTML content of a given Streamtape URL and constructs a cURL command to
 download a file from the Streamtape website.
+
+Each field is located with a plain substring search for the literal that
+starts it, then read with a precompiled pattern anchored there, instead of
+backtracking over the whole page. Pages are fetched through the shared pooled
+session, and the resolved links are kept in a short-lived in-memory cache,
+since their tokens expire after a while.
 """
 
-#!/usr/bin/env python
+import os
 import re
 import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
 
+if not __package__:
+    # Run as a script: resolve the imports below within the helpers package
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__
+    ))))
+    __package__ = 'helpers'  # pylint: disable=redefined-builtin
+
+from .general_utils import fetch_text
+from .http_utils import get_scrape_workers
+from .metrics_utils import PARSE_SECONDS
+from .retry_utils import PAGE_ATTEMPTS
+from .trace_utils import traced, trace_queue_wait
+
 PREFIX = "https:/"
-NOROBOT_TOKEN_PATTERN = (
-    r".*document.getElementById.*\('norobotlink'\).innerHTML =.*?token=(.*?)'.*?;"
-)
-LINK_TOKEN_PATTERN = (
-    r'.*<div id="ideoooolink" style="display:none;">(.*?token=).*?<[/]div>'
-)
-TITLE_PATTERN = r'.*<meta name="og:title" content="(.*?)">'
 
-def get_curl_command(url):
+# The literal starting each field, and the pattern reading it from there
+FIELD_PATTERNS = {
+    'token': (
+        "('norobotlink').innerHTML =",
+        re.compile(r"\('norobotlink'\)\.innerHTML =.*?token=(.*?)'", re.S)
+    ),
+    'infix': (
+        '<div id="ideoooolink" style="display:none;">',
+        re.compile(
+            r'<div id="ideoooolink" style="display:none;">'
+            r'(.*?token=).*?</div>',
+            re.S
+        )
+    ),
+    'title': (
+        '<meta name="og:title" content="',
+        re.compile(r'<meta name="og:title" content="(.*?)">', re.S)
+    )
+}
+
+RESOLVE_TTL = 5 * 60    # Seconds a resolved link is reused
+RESOLVE_WORKERS = 4
+
+def find_last(html, anchor, pattern):
     """
-    Extracts specific information from the HTML content of a given URL and
-    constructs a final URL and the original title.
+    Finds the last match of an anchored pattern in a page.
 
     Args:
-        url (str): The URL to send the GET request to.
+        html (str): The HTML content of the page.
+        anchor (str): The literal the pattern starts with.
+        pattern (re.Pattern): The pattern to match at the anchor.
+
+    Returns:
+        str: The first group of the last match, or None if there is none.
+    """
+    position = html.rfind(anchor)
+    while position >= 0:
+        match = pattern.match(html, position)
+        if match:
+            return match.group(1)
+
+        position = html.rfind(anchor, 0, position)
+
+    return None
+
+@traced('parse')
+def extract_download_info(html):
+    """
+    Extracts the original title and the final download URL from the HTML
+    content of a Streamtape page. The last occurrence of each field wins, as
+    decoy links may precede the real one.
+
+    Args:
+        html (str): The HTML content of the Streamtape page.
 
     Returns:
         tuple: A tuple containing the original filename (str) and the
                final URL (str).
+
+    Raises:
+        ValueError: If a field is missing from the page.
     """
-    html = requests.get(url, timeout=10).content.decode()
+    with PARSE_SECONDS.time('streamtape'):
+        found = {
+            field: find_last(html, anchor, pattern)
+            for (field, (anchor, pattern)) in FIELD_PATTERNS.items()
+        }
+
+    missing = [field for (field, value) in found.items() if value is None]
+    if missing:
+        raise ValueError(
+            f"Streamtape page is missing: {', '.join(missing)}."
+        )
+
+    download_url = f"{PREFIX}{found['infix']}{found['token']}"
+    return found['title'], download_url
+
+class StreamtapeResolver:
+    """
+    Resolves Streamtape pages into their original filename and download URL,
+    reusing the links resolved during the last few minutes.
+    """
+
+    def __init__(self, ttl=RESOLVE_TTL):
+        """
+        Initializes the resolver.
+
+        Args:
+            ttl (float, optional): The time (in seconds) a resolved link is
+                                   reused. Defaults to `RESOLVE_TTL`.
+        """
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.cache = {}
+
+    def get_cached(self, url):
+        """
+        Returns the link resolved for a page, if it is still fresh.
+
+        Args:
+            url (str): The URL of the Streamtape page.
 
-    token = re.match(
-        NOROBOT_TOKEN_PATTERN, html, re.M|re.S
-    ).group(1)
+        Returns:
+            tuple: The original filename and the download URL, or None.
+        """
+        with self.lock:
+            entry = self.cache.get(url)
+            if entry is None:
+                return None
 
-    infix = re.match(
-        LINK_TOKEN_PATTERN, html, re.M|re.S
-    ).group(1)
+            (expires_at, info) = entry
+            if expires_at < time.monotonic():
+                del self.cache[url]
+                return None
 
-    download_url = f'{PREFIX}{infix}{token}'
+            return info
 
-    filename = re.match(
-        TITLE_PATTERN, html, re.M|re.S
-    ).group(1)
+    def remember(self, url, info):
+        """
+        Stores the link resolved for a page, and drops the expired ones.
 
-    return filename, download_url
+        Args:
+            url (str): The URL of the Streamtape page.
+            info (tuple): The original filename and the download URL.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.cache = {
+                key: entry for (key, entry) in self.cache.items()
+                if entry[0] >= now
+            }
+            self.cache[url] = (now + self.ttl, info)
+
+    def forget(self, url):
+        """
+        Drops the link resolved for a page, e.g. after it failed.
+
+        Args:
+            url (str): The URL of the Streamtape page.
+        """
+        with self.lock:
+            self.cache.pop(url, None)
+
+    def resolve_html(self, url, html):
+        """
+        Extracts the link of a page already fetched, and caches it.
+
+        Args:
+            url (str): The URL of the Streamtape page.
+            html (str): The HTML content of the page.
+
+        Returns:
+            tuple: The original filename and the download URL.
+
+        Raises:
+            ValueError: If a field is missing from the page.
+        """
+        info = extract_download_info(html)
+        self.remember(url, info)
+        return info
+
+    @traced('resolve', 'get_curl_command')
+    def resolve(self, url, attempts=PAGE_ATTEMPTS):
+        """
+        Resolves a Streamtape page, from the cache when possible.
+
+        Args:
+            url (str): The URL of the Streamtape page.
+            attempts (int, optional): The maximum number of attempts of the
+                                      page request. Defaults to
+                                      `PAGE_ATTEMPTS`.
+
+        Returns:
+            tuple: The original filename and the download URL.
+
+        Raises:
+            requests.RequestException: If the page can't be fetched.
+            ValueError: If a field is missing from the page.
+        """
+        return self.get_cached(url) or self.resolve_html(
+            url, fetch_text(url, attempts=attempts)
+        )
+
+    def resolve_many(self, urls, workers=RESOLVE_WORKERS):
+        """
+        Resolves several Streamtape pages concurrently, yielding each one as
+        soon as it is resolved.
+
+        Args:
+            urls (iterable): The URLs of the Streamtape pages.
+            workers (int, optional): The maximum number of pages fetched at
+                                     once over HTTP/1.1, raised over HTTP/2.
+                                     Defaults to `RESOLVE_WORKERS`.
+
+        Yields:
+            tuple: The URL, its filename and download URL (None on failure)
+                   and the error (None on success), in completion order.
+        """
+        with ThreadPoolExecutor(
+            max_workers=get_scrape_workers(workers)
+        ) as executor:
+            futures = {
+                executor.submit(trace_queue_wait(self.resolve), url): url
+                for url in urls
+            }
+
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+
+                except (requests.RequestException, ValueError) as err:
+                    yield futures[future], None, err
+
+STREAMTAPE_RESOLVER = StreamtapeResolver()
+
+def get_curl_command(url):
+    """
+    Extracts specific information from the HTML content of a given URL and
+    constructs a final URL and the original title.
+
+    Args:
+        url (str): The URL to send the GET request to.
+
+    Returns:
+        tuple: A tuple containing the original filename (str) and the
+               final URL (str).
+
+    Raises:
+        requests.RequestException: If the page can't be fetched.
+        ValueError: If a field is missing from the page.
+    """
+    return STREAMTAPE_RESOLVER.resolve(url)
 
 def main():
     """
     Main function to process URLs provided as command-line arguments and print
-    cURL commands to download files from the Streamtape website.
+    cURL commands to download files from the Streamtape website. The URLs are
+    resolved concurrently.
     """
     if len(sys.argv) < 2:
         print(f"Usage: {sys.argv[0]} <url>...", file=sys.stderr)
         sys.exit(1)
 
-    for url in sys.argv[1:]:
-        try:
-            (filename, download_url) = get_curl_command(url)
-            command = f"curl -L -o '{filename}' '{download_url}'"
-            print(command)
+    for (url, info, error) in STREAMTAPE_RESOLVER.resolve_many(sys.argv[1:]):
+        if error is not None:
+            print(f"{type(error).__name__}: {url}: {error}", file=sys.stderr)
+            continue
 
-        except ValueError as val_err:
-            print(f"ValueError: {val_err}", file=sys.stderr)
+        (filename, download_url) = info
+        print(f"curl -L -o '{filename}' '{download_url}'")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,124 @@
+"""
+This module keeps the state of the series followed in sync mode, stored in a
+SQLite database under the download folder: the ETag and Last-Modified
+validators of each series page and the episode URLs already downloaded from
+it. Unlike the cache, the state never expires, as it is what lets a sync
+request the page conditionally and download only the new episodes.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from .general_utils import DOWNLOAD_FOLDER
+
+SYNC_FILE = os.path.join(DOWNLOAD_FOLDER, ".sync.sqlite3")
+
+SYNC_LOCK = threading.Lock()
+SYNC_STATE = {'connection': None}
+
+def get_connection():
+    """
+    Returns the connection to the sync database, creating the database on
+    first use. Must be called with `SYNC_LOCK` held.
+
+    Returns:
+        sqlite3.Connection: The connection to the sync database.
+    """
+    if SYNC_STATE['connection'] is None:
+        os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+        connection = sqlite3.connect(SYNC_FILE, check_same_thread=False)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS series ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+            "episodes TEXT, checked_at REAL, changed_at REAL)"
+        )
+        connection.commit()
+        SYNC_STATE['connection'] = connection
+
+    return SYNC_STATE['connection']
+
+def get_sync_state(url):
+    """
+    Returns the state stored by the last sync of a series.
+
+    Args:
+        url (str): The URL of the series.
+
+    Returns:
+        dict: The validators of the series page (`etag`, `last_modified`) and
+              the episode URLs already downloaded (`episodes`), or None if the
+              series was never synced.
+    """
+    with SYNC_LOCK:
+        row = get_connection().execute(
+            "SELECT etag, last_modified, episodes FROM series WHERE url = ?",
+            (url,)
+        ).fetchone()
+
+    if row is None:
+        return None
+
+    return {
+        'etag': row[0],
+        'last_modified': row[1],
+        'episodes': json.loads(row[2])
+    }
+
+def get_conditional_headers(state):
+    """
+    Builds the headers of a conditional request of a series page.
+
+    Args:
+        state (dict): The state returned by `get_sync_state`, or None.
+
+    Returns:
+        dict: The `If-None-Match` and `If-Modified-Since` headers of the
+              stored validators.
+    """
+    headers = {}
+    if state and state['etag']:
+        headers['If-None-Match'] = state['etag']
+    if state and state['last_modified']:
+        headers['If-Modified-Since'] = state['last_modified']
+
+    return headers
+
+def save_sync_state(url, etag, last_modified, episode_urls):
+    """
+    Stores the state of a series after a successful sync.
+
+    Args:
+        url (str): The URL of the series.
+        etag (str): The ETag of the series page, or None.
+        last_modified (str): The Last-Modified date of the series page, or
+                             None.
+        episode_urls (list): The episode URLs already downloaded.
+    """
+    now = time.time()
+    with SYNC_LOCK:
+        connection = get_connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO series "
+            "(url, etag, last_modified, episodes, checked_at, changed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, json.dumps(episode_urls), now, now)
+        )
+        connection.commit()
+
+def mark_series_unchanged(url):
+    """
+    Records that a series page was found unchanged.
+
+    Args:
+        url (str): The URL of the series.
+    """
+    with SYNC_LOCK:
+        connection = get_connection()
+        connection.execute(
+            "UPDATE series SET checked_at = ? WHERE url = ?",
+            (time.time(), url)
+        )
+        connection.commit()
@@ -0,0 +1,345 @@
+"""
+This module records where the time of a run goes. Spans around the phases of
+the downloader (page fetches, parsing, link resolution, transfers, disk
+writes and waits in the executor queues) are recorded per thread, or per
+task in the asyncio engine, and exported in the Chrome trace-event format,
+which Perfetto and `chrome://tracing` open. Each phase can also be profiled
+with cProfile, giving one profile per phase. Both are off by default, and a
+span then costs a single check.
+
+From Python 3.12, cProfile hooks the whole interpreter rather than a thread,
+so only one span is profiled at a time: the spans of other threads starting
+meanwhile are left out of the profiles, which a warning reports once, and the
+profiled span also counts the calls of the threads running alongside it.
+"""
+
+import os
+import json
+import time
+import asyncio
+import cProfile
+import pstats
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+TRACE_FILE = "trace.json"
+PROFILE_FOLDER = "profiles"
+
+TRACE_LOCK = threading.Lock()
+TRACE_STATE = {
+    'events': None,        # The recorded events, None when not tracing
+    'profile_dir': None,   # The directory of the profiles, None when off
+    'profiles': {},        # The merged statistics of every phase
+    'skipped': 0,          # The spans left out of the profiles
+    'threads': {}          # The names of the tracks of the trace
+}
+
+ACTIVE = threading.local()
+
+logger = logging.getLogger(__name__)
+
+def configure_tracing(trace_file=None, profile_dir=None):
+    """
+    Enables the trace of the run, the profiles of its phases, or both.
+
+    Args:
+        trace_file (str, optional): The file the trace is exported to.
+                                    Defaults to None, for no trace.
+        profile_dir (str, optional): The directory the profiles are written
+                                     to. Defaults to None, for no profiles.
+    """
+    with TRACE_LOCK:
+        TRACE_STATE['events'] = [] if trace_file else None
+        TRACE_STATE['profile_dir'] = profile_dir
+        TRACE_STATE['profiles'] = {}
+        TRACE_STATE['skipped'] = 0
+        TRACE_STATE['threads'] = {}
+
+def is_tracing():
+    """
+    Tells whether spans are recorded or profiled.
+
+    Returns:
+        bool: True if the trace or the profiles are enabled.
+    """
+    return (
+        TRACE_STATE['events'] is not None
+        or TRACE_STATE['profile_dir'] is not None
+    )
+
+def get_track():
+    """
+    Returns the track of the current span: the running task in the asyncio
+    engine, whose spans overlap on the event loop thread, or the thread.
+
+    Returns:
+        tuple: The identifier and name of the track.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+
+    if task is not None:
+        return id(task), task.get_name()
+
+    thread = threading.current_thread()
+    return thread.ident, thread.name
+
+def get_timestamp():
+    """
+    Returns the current time in the unit of the trace.
+
+    Returns:
+        float: The time in microseconds.
+    """
+    return time.perf_counter_ns() / 1000
+
+def record_span(name, category, started_at, args=None):
+    """
+    Records a span that ends now.
+
+    Args:
+        name (str): The name of the span.
+        category (str): The phase of the span.
+        started_at (float): The start of the span, from `get_timestamp`.
+        args (dict, optional): Details shown with the span. Defaults to None.
+    """
+    events = TRACE_STATE['events']
+    if events is None:
+        return
+
+    (track, track_name) = get_track()
+    event = {
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': started_at,
+        'dur': get_timestamp() - started_at,
+        'pid': os.getpid(),
+        'tid': track
+    }
+    if args:
+        event['args'] = args
+
+    with TRACE_LOCK:
+        events.append(event)
+        TRACE_STATE['threads'][track] = track_name
+
+def start_profile():
+    """
+    Starts profiling the current thread for a new span, pausing the profiler
+    of the enclosing span so that each phase only counts its own time. A span
+    starting while another thread's span is profiled, which only happens from
+    Python 3.12, is left out of the profiles, with a warning the first time.
+
+    Returns:
+        cProfile.Profile: The running profiler, or None if profiles are
+                          disabled or another profiler is active.
+    """
+    if TRACE_STATE['profile_dir'] is None:
+        return None
+
+    stack = ACTIVE.__dict__.setdefault('profilers', [])
+    if stack:
+        stack[-1].disable()
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+
+    except ValueError:
+        # Another profiler is active on this interpreter
+        if stack:
+            stack[-1].enable()
+        with TRACE_LOCK:
+            TRACE_STATE['skipped'] += 1
+            first = TRACE_STATE['skipped'] == 1
+        if first:
+            logger.warning(
+                "Profiles are incomplete: this Python profiles a single "
+                "thread at a time, and the spans starting meanwhile are "
+                "left out."
+            )
+        return None
+
+    stack.append(profiler)
+    return profiler
+
+def stop_profile(profiler, category):
+    """
+    Stops the profiler of a span, merges its statistics into those of its
+    phase and resumes the profiler of the enclosing span.
+
+    Args:
+        profiler (cProfile.Profile): The profiler from `start_profile`.
+        category (str): The phase the profile belongs to.
+    """
+    profiler.disable()
+    stack = ACTIVE.profilers
+    stack.pop()
+    with TRACE_LOCK:
+        stats = TRACE_STATE['profiles'].get(category)
+        if stats is None:
+            TRACE_STATE['profiles'][category] = pstats.Stats(profiler)
+        else:
+            stats.add(profiler)
+
+    if stack:
+        stack[-1].enable()
+
+@contextmanager
+def span(name, category, profile=True, **args):
+    """
+    Records the duration of the context as a span of a phase, and profiles it
+    when profiles are enabled. The time of nested spans is only counted in
+    their own phase.
+
+    Args:
+        name (str): The name of the span.
+        category (str): The phase of the span (e.g. 'fetch', 'parse').
+        profile (bool, optional): Whether the span can be profiled, which
+                                  spans awaiting in the event loop can't.
+                                  Defaults to True.
+        **args: Details shown with the span.
+    """
+    if not is_tracing():
+        yield
+        return
+
+    profiler = start_profile() if profile else None
+    started_at = get_timestamp()
+    try:
+        yield
+
+    finally:
+        record_span(name, category, started_at, args)
+        if profiler:
+            stop_profile(profiler, category)
+
+def traced(category, name=None):
+    """
+    Decorates a function so that every call is recorded as a span. Coroutine
+    functions are recorded from their start to their return, without being
+    profiled.
+
+    Args:
+        category (str): The phase of the calls.
+        name (str, optional): The name of the spans. Defaults to None, for
+                              the name of the function.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not is_tracing():
+                    return await func(*args, **kwargs)
+
+                with span(span_name, category, profile=False):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_tracing():
+                return func(*args, **kwargs)
+
+            with span(span_name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+def trace_queue_wait(func, name='queued'):
+    """
+    Wraps a function submitted to an executor so that the time it waits for
+    a worker is recorded as a span of the queue phase.
+
+    Args:
+        func (callable): The submitted function.
+        name (str, optional): The name of the spans. Defaults to 'queued'.
+
+    Returns:
+        callable: The wrapped function, or `func` itself when not tracing.
+    """
+    if TRACE_STATE['events'] is None:
+        return func
+
+    submitted_at = get_timestamp()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        record_span(name, 'queue', submitted_at)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+def write_trace(trace_file):
+    """
+    Exports the recorded spans as a Chrome trace-event file, with the name of
+    every track.
+
+    Args:
+        trace_file (str): The path of the trace file.
+    """
+    with TRACE_LOCK:
+        events = list(TRACE_STATE['events'] or ())
+        threads = dict(TRACE_STATE['threads'])
+
+    metadata = [
+        {
+            'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(),
+            'tid': track, 'args': {'name': track_name}
+        }
+        for (track, track_name) in threads.items()
+    ]
+    os.makedirs(os.path.dirname(trace_file) or '.', exist_ok=True)
+    with open(trace_file, 'w', encoding='utf-8') as file:
+        json.dump(
+            {'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, file
+        )
+
+def write_profiles(profile_dir):
+    """
+    Writes the profile of every phase to `<phase>.prof` in a directory, in
+    the format read by `pstats` and profile viewers such as snakeviz, and
+    logs how many spans the profiles leave out.
+
+    Args:
+        profile_dir (str): The directory of the profiles.
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    with TRACE_LOCK:
+        for (category, stats) in TRACE_STATE['profiles'].items():
+            stats.dump_stats(os.path.join(profile_dir, f"{category}.prof"))
+        skipped = TRACE_STATE['skipped']
+
+    if skipped:
+        logger.warning(
+            "%d spans were left out of the profiles in %s.",
+            skipped, profile_dir
+        )
+
+def finish_tracing(trace_file=None, profile_dir=None):
+    """
+    Writes the trace and the profiles of the run, when enabled.
+
+    Args:
+        trace_file (str, optional): The path of the trace file. Defaults to
+                                    None.
+        profile_dir (str, optional): The directory of the profiles. Defaults
+                                     to None.
+    """
+    if trace_file:
+        write_trace(trace_file)
+    if profile_dir:
+        write_profiles(profile_dir)
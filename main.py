@@ -5,35 +5,486 @@ them for downloading Hanime content, and write results back to the file.
 Usage:
     To use this module, ensure that 'URLs.txt' is present in the same
     directory as this script. Execute the script to read URLs, download
-    content, and clear the URL list upon completion.
+    content, and clear the URL list upon completion. With `--concurrent`,
+    all the series are processed at once with a shared download budget and a
+    single progress dashboard. With `--daemon`, the script keeps running and
+    moves the URLs added to the file to a durable download queue, which
+    survives restarts. With `--sync`, the file is kept as the list of
+    followed series, and each run only downloads their new episodes.
+    `main.py verify` checks the downloaded episodes
+    against the sizes and checksums recorded in the series manifests.
 """
 
+import os
+import sys
+import time
+import signal
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
 from helpers.file_utils import read_file, write_file
-from helpers.general_utils import clear_terminal
-from hanime_downloader import process_hanime_download
+from helpers.general_utils import (
+    DOWNLOAD_FOLDER, clear_terminal, setup_logging
+)
+from helpers.download_utils import (
+    submit_tasks, add_workers_task, mark_task_failed, configure_fsync
+)
+from helpers.concurrency_utils import DOWNLOAD_LIMITER
+from helpers.progress_utils import (
+    create_progress_bar, progress_display, configure_progress, is_interactive
+)
+from helpers.cache_utils import configure_cache
+from helpers.retry_utils import record_failure, print_failure_summary
+from helpers.metrics_utils import write_metrics_summary
+from helpers.trace_utils import configure_tracing, finish_tracing
+from helpers.manifest_utils import iter_manifest_entries, remove_episode
+from helpers.checksum_utils import (
+    OK, UNVERIFIED, configure_checksum, check_files
+)
+from helpers.queue_utils import (
+    SERIES, TRANSFERS, DONE, FAILED, PENDING_STATES, enqueue_series,
+    get_active_series, get_series, set_series_state, save_episodes,
+    get_episodes, set_episode_state, finish_series, requeue_episode
+)
+from hanime_downloader import (
+    process_hanime_download, sync_hanime_download, prepare_hanime_download,
+    resolve_video_urls, label_episodes, get_episode_label, process_video_url,
+    add_cache_arguments, add_concurrency_arguments, add_http_arguments,
+    configure_http, add_rate_limit_arguments, configure_rate_limits,
+    add_progress_arguments, add_write_arguments, add_metrics_arguments,
+    start_metrics, add_trace_arguments
+)
 
 FILE = 'URLs.txt'
+QUEUED_FILE = f"{FILE}.queued"
+SCRAPE_WORKERS = 2
+POLL_INTERVAL = 5.0
+
+# Series handled by the running daemon
+ACTIVE_SERIES = set()
 
-def process_urls(urls):
+def process_urls(urls, sync=False):
     """
     Validates and downloads items for a list of URLs.
 
     Args:
         urls (list): A list of URLs to process.
+        sync (bool, optional): Whether only the episodes added since the last
+                               sync are downloaded. Defaults to False.
     """
+    download = sync_hanime_download if sync else process_hanime_download
     for url in urls:
-        process_hanime_download(url)
+        download(url)
+
+def schedule_series(url, executor, job_progress):
+    """
+    Scrapes a series and submits the download of its episodes to the shared
+    download executor.
+
+    Args:
+        url (str): The URL of the Hanime series to download.
+        executor (concurrent.futures.Executor): The executor shared by the
+                                                downloads of every series.
+        job_progress: The progress tracker shared by every series.
+
+    Since nothing waits on the future of a scrape, any error is recorded for
+    the failure summary here rather than raised.
+    """
+    try:
+        (hanime_name, download_path, episodes) = prepare_hanime_download(url)
+        records = label_episodes(resolve_video_urls(episodes), episodes)
+        submit_tasks(
+            executor, process_video_url, records, job_progress,
+            download_path, total=len(episodes), title=hanime_name
+        )
+
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        record_failure('series', url, err)
+
+def process_urls_concurrently(urls):
+    """
+    Downloads every series of a list of URLs at once. The series are scraped
+    in the background while the episodes already resolved are downloading,
+    and all the downloads share a single dashboard and the worker budget set
+    by the adaptive download limiter.
+
+    Args:
+        urls (list): A list of URLs to process.
+    """
+    job_progress = create_progress_bar()
+    listener = add_workers_task(job_progress)
+    max_workers = DOWNLOAD_LIMITER.max_limit
+
+    with progress_display("Batch Download", job_progress), \
+            ThreadPoolExecutor(max_workers=max_workers) as download_executor:
+        with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as scrape_executor:
+            for url in urls:
+                scrape_executor.submit(
+                    schedule_series, url, download_executor, job_progress
+                )
+
+    DOWNLOAD_LIMITER.remove_listener(listener)
+
+def enqueue_file_urls():
+    """
+    Moves the URLs listed in the URL file to the download queue. The file is
+    renamed before being read, so that the URLs added meanwhile land in a new
+    file, and the renamed file is only removed once its URLs are committed to
+    the queue.
+    """
+    if not os.path.exists(QUEUED_FILE):
+        if not os.path.isfile(FILE) or os.path.getsize(FILE) == 0:
+            return
+
+        os.replace(FILE, QUEUED_FILE)
+        # Recreate the URL file without truncating one written meanwhile
+        with open(FILE, 'a', encoding='utf-8'):
+            pass
+
+    for url in read_file(QUEUED_FILE):
+        if url.strip():
+            enqueue_series(url.strip())
+
+    os.remove(QUEUED_FILE)
+
+def close_series(url, task_info=None):
+    """
+    Closes a series of the queue once none of its episodes is pending, so
+    that the daemon schedules it again when it is queued anew.
+
+    Args:
+        url (str): The URL of the series.
+        task_info (tuple, optional): The progress task of one of its episodes,
+                                     whose overall task is hidden when the
+                                     series is closed. Defaults to None.
+    """
+    if not finish_series(url):
+        return
+
+    if task_info:
+        (job_progress, _, overall_task) = task_info
+        job_progress.update(overall_task, visible=False)
+    ACTIVE_SERIES.discard(url)
+
+def transfer_episode(item, download_path, task_info):
+    """
+    Downloads a queued episode and records its result in the queue, closing
+    the series after its last episode. An unexpected error fails the episode
+    rather than leaving it in the transfers state.
+
+    Args:
+        item (tuple): The series URL, episode number and video URL.
+        download_path (str): The directory the episode is saved to.
+        task_info (tuple): A tuple containing progress tracking information.
+    """
+    (url, episode_number, video_url) = item
+    state = FAILED
+
+    try:
+        if process_video_url(video_url, download_path, task_info):
+            state = DONE
+
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        record_failure('download', video_url, err)
+        mark_task_failed(task_info, err)
+
+    finally:
+        set_episode_state(url, episode_number, state)
+        close_series(url, task_info)
+
+def queue_episode_records(url, episodes):
+    """
+    Yields the pending episodes of a queued series, resolving the pages of
+    those not resolved yet and recording their video URL in the queue.
+
+    Args:
+        url (str): The URL of the series.
+        episodes (list): The queued episodes of the series.
+
+    Yields:
+        tuple: The label of the episode and its series URL, number and video
+               URL (None if the page can't be resolved).
+    """
+    numbered = [
+        (episode['number'], episode['episode_url']) for episode in episodes
+    ]
+    unresolved = []
+    for episode in episodes:
+        if episode['state'] == TRANSFERS:
+            yield get_episode_label(episode['number'], numbered), (
+                url, episode['number'], episode['video_url']
+            )
+        elif episode['state'] in PENDING_STATES:
+            unresolved.append((episode['number'], episode['episode_url']))
+
+    for (episode_number, video_url) in resolve_video_urls(unresolved):
+        set_episode_state(
+            url, episode_number, TRANSFERS if video_url else FAILED,
+            video_url=video_url
+        )
+        yield get_episode_label(episode_number, numbered), (
+            (url, episode_number, video_url) if video_url else None
+        )
+
+def run_queued_series(url, executor, job_progress):
+    """
+    Runs the pending stages of a queued series: scrapes its page if it has
+    not been scraped yet, then submits its pending episodes to the shared
+    download executor.
+
+    Args:
+        url (str): The URL of the series.
+        executor (concurrent.futures.Executor): The executor shared by the
+                                                downloads of every series.
+        job_progress: The progress tracker shared by every series.
+
+    Since nothing waits on the future of a scrape, any error is recorded for
+    the failure summary here and fails the series, rather than leaving it in
+    its queue state.
+    """
+    error = None
+    try:
+        if get_series(url)['state'] == SERIES:
+            save_episodes(url, *prepare_hanime_download(url))
+
+        series = get_series(url)
+        episodes = get_episodes(url)
+        pending = [
+            episode for episode in episodes
+            if episode['state'] in PENDING_STATES
+        ]
+        if pending:
+            submit_tasks(
+                executor, transfer_episode,
+                queue_episode_records(url, episodes), job_progress,
+                series['download_path'], total=len(pending),
+                title=series['name']
+            )
+
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        error = err
+        record_failure('series', url, err)
+
+    finally:
+        # A failed series keeps its state until it is queued again
+        if error is None:
+            close_series(url)
+        else:
+            set_series_state(url, FAILED, error)
+            ACTIVE_SERIES.discard(url)
+
+def run_daemon(interval=POLL_INTERVAL):
+    """
+    Keeps downloading the series of the durable queue, polling the URL file
+    for new ones, until interrupted. On interruption, the transfers in
+    progress are drained and the others stay queued for the next start.
+
+    Args:
+        interval (float, optional): The time (in seconds) between two polls of
+                                    the URL file. Defaults to
+                                    `POLL_INTERVAL`.
+    """
+    # Stop gracefully on SIGTERM as well
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    job_progress = create_progress_bar()
+    listener = add_workers_task(job_progress)
+    download_executor = ThreadPoolExecutor(
+        max_workers=DOWNLOAD_LIMITER.max_limit
+    )
+    scrape_executor = ThreadPoolExecutor(max_workers=SCRAPE_WORKERS)
+
+    with progress_display("Download Queue", job_progress):
+        try:
+            while True:
+                enqueue_file_urls()
+                for url in get_active_series():
+                    if url not in ACTIVE_SERIES:
+                        ACTIVE_SERIES.add(url)
+                        scrape_executor.submit(
+                            run_queued_series, url, download_executor,
+                            job_progress
+                        )
+
+                time.sleep(interval)
+
+        except KeyboardInterrupt:
+            download_executor.shutdown(cancel_futures=True)
+            scrape_executor.shutdown(cancel_futures=True)
+
+    DOWNLOAD_LIMITER.remove_listener(listener)
+
+def requeue_download(final_path, entry):
+    """
+    Removes a broken episode and its manifest entry so that it is downloaded
+    again, and queues it again if the download queue knows it.
+
+    Args:
+        final_path (str): The path of the episode.
+        entry (dict): The manifest entry of the episode.
+
+    Returns:
+        bool: True if the episode was queued again.
+    """
+    if os.path.isfile(final_path):
+        os.remove(final_path)
+
+    remove_episode(final_path)
+    return bool(entry['source_url']) and requeue_episode(entry['source_url'])
+
+def verify_downloads(workers=None, requeue=False):
+    """
+    Hashes again every episode recorded in the manifests of the download
+    folder, in parallel worker processes, and reports the missing,
+    incomplete and corrupted ones.
+
+    Args:
+        workers (int, optional): The number of worker processes. Defaults to
+                                 None, for one per CPU.
+        requeue (bool, optional): Whether the broken episodes are removed and
+                                  queued for download again. Defaults to
+                                  False.
+
+    Returns:
+        bool: True if no episode is broken.
+    """
+    entries = dict(sorted(iter_manifest_entries(DOWNLOAD_FOLDER)))
+    results = check_files(
+        [
+            (final_path, entry['size'], entry.get('checksum'))
+            for (final_path, entry) in entries.items()
+        ],
+        workers=workers
+    )
+
+    counts = {}
+    for (final_path, status) in results:
+        counts[status] = counts.get(status, 0) + 1
+        if status in (OK, UNVERIFIED):
+            continue
+
+        note = ""
+        if requeue:
+            queued = requeue_download(final_path, entries[final_path])
+            note = " (queued again)" if queued else " (removed)"
+
+        print(f"{status}: {final_path}{note}")
+
+    summary = ", ".join(
+        f"{count} {status}" for (status, count) in sorted(counts.items())
+    )
+    print(f"Checked {len(entries)} episodes: {summary or 'none found'}.")
+    return all(status in (OK, UNVERIFIED) for status in counts)
+
+def setup_parser():
+    """
+    Set up the argument parser for the batch download script.
+
+    Returns:
+        argparse.ArgumentParser: The configured argument parser instance.
+    """
+    parser = argparse.ArgumentParser(
+        description=f"Download every hanime series listed in {FILE}."
+    )
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument(
+        '--concurrent', action='store_true',
+        help="Process all the series at once with a shared download budget."
+    )
+    mode_group.add_argument(
+        '--daemon', action='store_true',
+        help=(
+            f"Keep running and download the URLs added to {FILE} through a "
+            "queue that survives restarts."
+        )
+    )
+    mode_group.add_argument(
+        '--sync', action='store_true',
+        help=(
+            "Only download the episodes added since the last sync, and keep "
+            f"{FILE} for the next one."
+        )
+    )
+    parser.add_argument(
+        '--poll-interval', type=float, default=POLL_INTERVAL,
+        help=(
+            f"Seconds between two checks of {FILE} in daemon mode "
+            f"(default: {POLL_INTERVAL:g})."
+        )
+    )
+    add_cache_arguments(parser)
+    add_concurrency_arguments(parser)
+    add_http_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_progress_arguments(parser)
+    add_write_arguments(parser)
+    add_metrics_arguments(parser)
+    add_trace_arguments(parser)
+
+    subparsers = parser.add_subparsers(dest='command')
+    verify_parser = subparsers.add_parser(
+        'verify',
+        help=(
+            "Check the downloaded episodes against the sizes and checksums "
+            "recorded in the manifests."
+        )
+    )
+    verify_parser.add_argument(
+        '--workers', type=int, default=None,
+        help="The number of hashing processes (default: one per CPU)."
+    )
+    verify_parser.add_argument(
+        '--requeue', action='store_true',
+        help="Remove the broken episodes so that they are downloaded again."
+    )
+    return parser
 
 def main():
     """
     Main function to execute the script.
 
     Reads URLs from a file, processes them, and clears the file at the end.
+    In daemon mode, the URLs are instead moved to the download queue as they
+    are added to the file, and the verify command checks the downloads
+    instead.
     """
-    clear_terminal()
+    args = setup_parser().parse_args()
+    if args.command == 'verify':
+        sys.exit(0 if verify_downloads(args.workers, args.requeue) else 1)
+
+    configure_progress(args.progress)
+    if is_interactive():
+        clear_terminal()
+
+    configure_cache(enabled=not args.no_cache, refresh=args.refresh)
+    DOWNLOAD_LIMITER.configure(args.min_workers, args.max_workers)
+    configure_fsync(args.fsync)
+    configure_checksum(args.checksum)
+    setup_logging()
+    configure_http(args)
+    configure_rate_limits(args)
+    start_metrics(args)
+    configure_tracing(args.trace, args.profile)
+
+    if args.daemon:
+        run_daemon(args.poll_interval)
+        print_failure_summary()
+        write_metrics_summary(args.metrics_file)
+        finish_tracing(args.trace, args.profile)
+        return
+
     urls = read_file(FILE)
-    process_urls(urls)
-    write_file(FILE)
+
+    if args.concurrent:
+        process_urls_concurrently(urls)
+    else:
+        process_urls(urls, sync=args.sync)
+
+    print_failure_summary()
+    write_metrics_summary(args.metrics_file)
+    finish_tracing(args.trace, args.profile)
+    if not args.sync:
+        write_file(FILE)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,67 @@
+"""
+Fixtures of the tests. Every test runs in its own working directory, with the
+state of the helpers reset.
+"""
+
+import os
+import asyncio
+
+import pytest
+
+from hanime_downloader import download_episode
+from helpers.async_utils import create_client_session, download_file_async
+from helpers.progress_utils import EventProgress
+
+@pytest.fixture(autouse=True)
+def clean_work_dir(work_dir):
+    """
+    Runs every test in a clean working directory.
+
+    Yields:
+        pathlib.Path: The working directory.
+    """
+    yield work_dir
+
+@pytest.fixture
+def task_info():
+    """
+    The progress task of a single download, reported nowhere.
+
+    Returns:
+        tuple: The job progress, the task and the overall task.
+    """
+    job_progress = EventProgress()
+    overall_task = job_progress.add_task("Progress", total=1)
+    task = job_progress.add_task("Episode", total=None)
+    return job_progress, task, overall_task
+
+def download_with_threads(url, final_path, task_info):
+    """
+    Downloads a file with the thread engine.
+    """
+    download_episode(url, os.path.dirname(final_path), task_info)
+
+def download_with_asyncio(url, final_path, task_info):
+    """
+    Downloads a file with the asyncio engine.
+    """
+    async def download():
+        async with create_client_session() as session:
+            await download_file_async(session, url, final_path, task_info)
+
+    asyncio.run(download())
+
+@pytest.fixture(params=['thread', 'async'])
+def engine(request):
+    """
+    Runs the test with each download engine.
+
+    Returns:
+        callable: Downloads a URL to a final path with the engine, given the
+                  progress task of the download.
+    """
+    if request.param == 'async':
+        pytest.importorskip('aiohttp')
+        return download_with_asyncio
+
+    return download_with_threads
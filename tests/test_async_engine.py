@@ -0,0 +1,81 @@
+"""
+Tests of the asyncio download engine: its transfers are gated by the adaptive
+download limiter shared with the thread engine, and a missing aiohttp is
+reported without a traceback or any text among the JSON events.
+"""
+
+import json
+import asyncio
+
+import pytest
+
+import helpers.async_utils
+from benchmarks.fake_site import get_media_bytes, FakeSite
+from hanime_downloader import process_hanime_download
+from helpers.async_utils import create_client_session, download_file_async
+from helpers.concurrency_utils import DOWNLOAD_LIMITER
+from helpers.progress_utils import (
+    JSON, SILENT, EventProgress, configure_progress
+)
+
+SIZE = 256 * 1024
+
+@pytest.mark.parametrize('limit', [1, 2])
+def test_transfers_follow_download_limiter(
+        fake_site, tmp_path, monkeypatch, limit
+):
+    """
+    No more files are transferred at once than the limiter allows.
+    """
+    pytest.importorskip('aiohttp')
+    # The limit is held, whatever the throughput seen by the evaluations
+    monkeypatch.setattr(DOWNLOAD_LIMITER, 'evaluate', lambda: None)
+    DOWNLOAD_LIMITER.configure(limit, limit, limit)
+    base = fake_site(size=SIZE, rate=SIZE * 4)
+    job_progress = EventProgress()
+    overall_task = job_progress.add_task("Progress", total=4)
+    file_ids = [f"demo-{number}" for number in range(1, 5)]
+
+    async def download(session, file_id):
+        task = job_progress.add_task(file_id)
+        await download_file_async(
+            session, f"{base}/media/{file_id}.mp4",
+            str(tmp_path / f"{file_id}.mp4"),
+            (job_progress, task, overall_task)
+        )
+
+    async def download_all():
+        async with create_client_session() as session:
+            await asyncio.gather(
+                *(download(session, file_id) for file_id in file_ids)
+            )
+
+    asyncio.run(download_all())
+
+    assert FakeSite.streams['peak'] == limit
+    assert DOWNLOAD_LIMITER.active == 0
+    for file_id in file_ids:
+        with open(tmp_path / f"{file_id}.mp4", 'rb') as file:
+            assert file.read() == get_media_bytes(file_id, SIZE)
+
+@pytest.mark.parametrize('mode', [SILENT, JSON])
+def test_missing_aiohttp(fake_site, monkeypatch, capsys, mode):
+    """
+    The async engine without aiohttp reports an error instead of raising: on
+    the standard error, or as an error event among the JSON events.
+    """
+    configure_progress(mode)
+    monkeypatch.setattr(helpers.async_utils, 'aiohttp', None)
+    base = fake_site(episodes=1, size=SIZE)
+
+    process_hanime_download(f"{base}/hentai/demo", engine='async')
+
+    captured = capsys.readouterr()
+    if mode == JSON:
+        events = [json.loads(line) for line in captured.out.splitlines()]
+        assert "requires aiohttp" in events[-1]['message']
+        assert events[-1]['event'] == 'error'
+    else:
+        assert not captured.out
+        assert "requires aiohttp" in captured.err
+    assert not FakeSite.media_requests
@@ -0,0 +1,48 @@
+"""
+Tests of the downloads of bodies without a length: both engines stream a
+file sent with the chunked transfer encoding, with progress in bytes and no
+total, in chunks sized from the measured throughput.
+"""
+
+import os
+
+import pytest
+
+from benchmarks.fake_site import get_media_bytes
+from helpers.download_utils import (
+    PART_SUFFIX, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE, CHUNK_DURATION, ChunkSizer
+)
+
+SIZE = 3 * 1024 * 1024 + 12345
+
+def test_chunked_download(engine, fake_site, tmp_path, task_info):
+    """
+    A chunked body is downloaded whole, and its progress has no total.
+    """
+    base = fake_site(size=SIZE, chunked=True)
+    final_path = str(tmp_path / "demo-1.mp4")
+
+    engine(f"{base}/media/demo-1.mp4", final_path, task_info)
+
+    with open(final_path, 'rb') as file:
+        assert file.read() == get_media_bytes('demo-1', SIZE)
+    assert not os.path.exists(final_path + PART_SUFFIX)
+    (job_progress, task, _) = task_info
+    progress = job_progress.tasks[task]
+    assert progress['total'] is None
+    assert progress['completed'] == SIZE
+
+@pytest.mark.parametrize('throughput, chunk_size', [
+    (0, MIN_CHUNK_SIZE),
+    (MIN_CHUNK_SIZE * 3 / CHUNK_DURATION, MIN_CHUNK_SIZE * 2),
+    (MAX_CHUNK_SIZE * 100 / CHUNK_DURATION, MAX_CHUNK_SIZE)
+])
+def test_chunk_size_follows_throughput(throughput, chunk_size):
+    """
+    Chunks hold about `CHUNK_DURATION` of transfer at the measured
+    throughput, as a power of two within the bounds.
+    """
+    sizer = ChunkSizer()
+    sizer.started_at -= 2.0
+
+    assert sizer.update(int(throughput * 2.0)) == chunk_size
@@ -0,0 +1,138 @@
+"""
+Tests of the download daemon recovering a queue left behind by a crashed run,
+against the fake site.
+"""
+
+import os
+import time
+import signal
+import types
+
+import pytest
+
+import main
+from hanime_downloader import prepare_hanime_download, resolve_video_urls
+from helpers.queue_utils import (
+    QUEUE_STATE, DONE, FAILED, TRANSFERS, enqueue_series, save_episodes,
+    set_episode_state, get_series, get_episodes
+)
+from helpers.retry_utils import get_failures
+
+SIZE = 256 * 1024
+EPISODES = 3
+TIMEOUT = 30.0
+
+def crash_during_run(url):
+    """
+    Leaves a series in the queue as a run killed mid-way would: scraped, with
+    its first episode resolved and transferring, and the others pending.
+    """
+    enqueue_series(url)
+    (hanime_name, download_path, episodes) = prepare_hanime_download(url)
+    save_episodes(url, hanime_name, download_path, episodes)
+    video_urls = dict(resolve_video_urls(episodes[:1]))
+    set_episode_state(url, 1, TRANSFERS, video_url=video_urls[1])
+
+    QUEUE_STATE['connection'].close()
+    QUEUE_STATE['connection'] = None
+    return download_path
+
+@pytest.fixture
+def run_daemon(monkeypatch):
+    """
+    Runs the daemon until no queued series is active, in place of an
+    interruption by the user.
+
+    Returns:
+        callable: Runs the daemon, given the URLs of the series to wait for.
+    """
+    handler = signal.getsignal(signal.SIGTERM)
+
+    def run(urls):
+        deadline = time.monotonic() + TIMEOUT
+
+        def poll(interval):
+            finished = all(
+                get_series(url)['state'] in (DONE, FAILED) for url in urls
+            )
+            if finished and not main.ACTIVE_SERIES:
+                raise KeyboardInterrupt
+            assert time.monotonic() < deadline, "the queue never drained"
+            time.sleep(interval)
+
+        monkeypatch.setattr(main, 'time', types.SimpleNamespace(sleep=poll))
+        try:
+            main.run_daemon(interval=0.05)
+
+        finally:
+            signal.signal(signal.SIGTERM, handler)
+
+    return run
+
+def test_daemon_resumes_crashed_queue(fake_site, run_daemon):
+    """
+    A restarted daemon finishes the transfers and the pending episodes of a
+    crashed run, and enqueues the URL file it was in the middle of reading.
+    """
+    base = fake_site(episodes=EPISODES, size=SIZE)
+    crashed = f"{base}/hentai/crashed"
+    download_path = crash_during_run(crashed)
+    queued = f"{base}/hentai/queued"
+    with open(main.QUEUED_FILE, 'w', encoding='utf-8') as file:
+        file.write(f"{queued}\n")
+
+    run_daemon([crashed, queued])
+
+    assert not os.path.exists(main.QUEUED_FILE)
+    for url in (crashed, queued):
+        assert get_series(url)['state'] == DONE
+        assert [episode['state'] for episode in get_episodes(url)] == (
+            [DONE] * EPISODES
+        )
+    assert len(os.listdir(download_path)) >= EPISODES
+    assert not main.ACTIVE_SERIES
+
+def test_daemon_fails_crashing_transfer(fake_site, run_daemon, monkeypatch):
+    """
+    A transfer raising an unexpected error fails its episode and closes its
+    series, instead of leaving it transferring and the series active.
+    """
+    base = fake_site(episodes=EPISODES, size=SIZE)
+    url = f"{base}/hentai/crashing"
+    crash_during_run(url)
+    process_video_url = main.process_video_url
+
+    def crash_first_episode(video_url, download_path, task_info):
+        if video_url.endswith("-1"):
+            raise OSError("disk unplugged")
+        return process_video_url(video_url, download_path, task_info)
+
+    monkeypatch.setattr(main, 'process_video_url', crash_first_episode)
+
+    run_daemon([url])
+
+    assert get_series(url)['state'] == FAILED
+    assert [episode['state'] for episode in get_episodes(url)] == (
+        [FAILED] + [DONE] * (EPISODES - 1)
+    )
+    assert not main.ACTIVE_SERIES
+
+def test_daemon_fails_crashing_scrape(fake_site, run_daemon, monkeypatch):
+    """
+    A scrape raising an unexpected error fails its series and records it,
+    instead of leaving it in its queue state.
+    """
+    base = fake_site(episodes=EPISODES, size=SIZE)
+    url = f"{base}/hentai/unwritable"
+    enqueue_series(url)
+
+    def deny_directory(url):
+        raise PermissionError(f"no directory for {url}")
+
+    monkeypatch.setattr(main, 'prepare_hanime_download', deny_directory)
+
+    run_daemon([url])
+
+    assert get_series(url)['state'] == FAILED
+    assert [failure['stage'] for failure in get_failures()] == ['series']
+    assert not main.ACTIVE_SERIES
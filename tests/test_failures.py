@@ -0,0 +1,57 @@
+"""
+Tests of the errors raised in the worker threads, which are recorded for the
+failure summary instead of being lost with their futures, against the fake
+site.
+"""
+
+import hanime_downloader
+import main
+from hanime_downloader import process_hanime_download
+from helpers.general_utils import DOWNLOAD_FOLDER
+from helpers.retry_utils import get_failures
+
+SIZE = 256 * 1024
+EPISODES = 2
+
+def test_crashing_download_is_recorded(fake_site, monkeypatch):
+    """
+    A download raising an unexpected error is recorded as a failed download,
+    and the other episodes are still downloaded.
+    """
+    base = fake_site(episodes=EPISODES, size=SIZE)
+    process_video_url = hanime_downloader.process_video_url
+    downloaded = []
+
+    def crash_first_episode(video_url, download_path, task_info):
+        if video_url.endswith("-1"):
+            raise KeyError("player")
+        downloaded.append(video_url)
+        return process_video_url(video_url, download_path, task_info)
+
+    monkeypatch.setattr(
+        hanime_downloader, 'process_video_url', crash_first_episode
+    )
+
+    process_hanime_download(f"{base}/hentai/crashing")
+
+    assert [
+        (failure['stage'], failure['error']) for failure in get_failures()
+    ] == [('download', 'KeyError')]
+    assert get_failures()[0]['url'].endswith("-1")
+    assert len(downloaded) == EPISODES - 1
+
+def test_unwritable_directory_is_recorded(fake_site):
+    """
+    A series whose download directory can't be created is recorded as a
+    failed series, without exiting the scraping thread or the run.
+    """
+    base = fake_site(episodes=EPISODES, size=SIZE)
+    # A file in the way of the download folder
+    with open(DOWNLOAD_FOLDER, 'w', encoding='utf-8'):
+        pass
+
+    main.process_urls_concurrently([f"{base}/hentai/blocked"])
+
+    assert [
+        (failure['stage'], failure['kind']) for failure in get_failures()
+    ] == [('series', 'fatal')]
@@ -0,0 +1,119 @@
+"""
+Tests of the metrics endpoint, scraped while the downloads of a series are
+running against the fake site.
+"""
+
+import re
+import time
+import threading
+
+import pytest
+import requests
+
+from hanime_downloader import process_hanime_download
+from helpers.concurrency_utils import DOWNLOAD_LIMITER
+from helpers.metrics_utils import start_metrics_server
+
+SIZE = 1024 * 1024
+RATE = 512 * 1024
+EPISODES = 2
+
+SAMPLE_PATTERN = re.compile(r'^(\w+(?:\{[^}]*\})?) (\S+)$', re.M)
+
+def scrape(url):
+    """
+    Scrapes the metrics endpoint.
+
+    Returns:
+        dict: The value of every sample, by name and labels.
+    """
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    assert response.headers['content-type'].startswith('text/plain')
+    return {
+        sample: float(value)
+        for (sample, value) in SAMPLE_PATTERN.findall(response.text)
+    }
+
+@pytest.fixture
+def metrics_url():
+    """
+    Serves the metrics on a free port for the test.
+
+    Yields:
+        str: The URL of the metrics endpoint.
+    """
+    server = start_metrics_server(0)
+    yield f"http://127.0.0.1:{server.server_address[1]}/metrics"
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.parametrize('engine', ['thread', 'async'])
+def test_metrics_during_run(fake_site, metrics_url, engine):
+    """
+    The endpoint shows the active downloads and the bytes downloaded so far
+    during the run, and the finished downloads of the host and the reused
+    connections afterwards.
+    """
+    if engine == 'async':
+        pytest.importorskip('aiohttp')
+    base = fake_site(episodes=EPISODES, size=SIZE, rate=RATE)
+    host = base.split('//', 1)[1]
+    done = f'hsd_downloads_total{{host="{host}",result="done"}}'
+    before = scrape(metrics_url)
+
+    run = threading.Thread(
+        target=process_hanime_download, args=(f"{base}/hentai/metrics",),
+        kwargs={'engine': engine}
+    )
+    run.start()
+    during = []
+    while run.is_alive():
+        during.append(scrape(metrics_url))
+        time.sleep(0.1)
+    run.join()
+    after = scrape(metrics_url)
+
+    bytes_total = 'hsd_bytes_downloaded_total'
+    assert max(sample['hsd_active_downloads'] for sample in during) == EPISODES
+    assert any(
+        0 < sample.get(bytes_total, 0) - before.get(bytes_total, 0)
+        < EPISODES * SIZE
+        for sample in during
+    )
+    assert after[bytes_total] - before.get(bytes_total, 0) == EPISODES * SIZE
+    assert after[done] - before.get(done, 0) == EPISODES
+    assert after['hsd_active_downloads'] == 0
+    # The pages of the series are fetched over the pooled connections
+    assert after['hsd_http_connections_reused'] > 0
+
+@pytest.mark.parametrize('engine', ['thread', 'async'])
+def test_queue_depth_until_slot(fake_site, metrics_url, engine):
+    """
+    With a single transfer slot, the episode waiting for it stays in the
+    queue depth while the other downloads, and the queue is empty afterwards.
+    """
+    if engine == 'async':
+        pytest.importorskip('aiohttp')
+    DOWNLOAD_LIMITER.configure(1, 1, 1)
+    base = fake_site(episodes=EPISODES, size=SIZE, rate=RATE)
+
+    run = threading.Thread(
+        target=process_hanime_download, args=(f"{base}/hentai/queued",),
+        kwargs={'engine': engine}
+    )
+    run.start()
+    during = []
+    while run.is_alive():
+        during.append(scrape(metrics_url))
+        time.sleep(0.1)
+    run.join()
+    after = scrape(metrics_url)
+
+    assert max(sample['hsd_active_downloads'] for sample in during) == 1
+    assert any(
+        sample['hsd_active_downloads'] == 1
+        and sample['hsd_queue_depth'] == EPISODES - 1
+        for sample in during
+    )
+    assert after['hsd_queue_depth'] == 0
@@ -0,0 +1,117 @@
+"""
+Tests of the rate limits: the bandwidth achieved by both engines against the
+fake site stays within the configured global and per-host limits, and the
+limits of the control file apply at startup and are reloaded on SIGHUP by
+the thread watching it.
+"""
+
+import os
+import json
+import time
+import signal
+import threading
+
+import pytest
+
+from benchmarks.fake_site import get_media_bytes
+from helpers import rate_limit_utils
+from helpers.rate_limit_utils import (
+    LIMITS, TokenBucket, configure_limits, get_host_bucket, reserve_bytes,
+    watch_control_file
+)
+
+SIZE = 384 * 1024
+RATE = 256 * 1024
+
+@pytest.mark.parametrize('limit', ['bandwidth', 'host_bandwidth'])
+def test_achieved_rate(engine, fake_site, tmp_path, task_info, limit):
+    """
+    A download is paced at the configured rate.
+    """
+    base = fake_site(size=SIZE)
+    configure_limits(**{limit: RATE})
+    final_path = str(tmp_path / "demo-1.mp4")
+
+    started_at = time.monotonic()
+    engine(f"{base}/media/demo-1.mp4", final_path, task_info)
+    rate = SIZE / (time.monotonic() - started_at)
+
+    assert 0.8 * RATE < rate < 1.1 * RATE
+    with open(final_path, 'rb') as file:
+        assert file.read() == get_media_bytes('demo-1', SIZE)
+
+def test_no_limit_skips_buckets(monkeypatch):
+    """
+    Without bandwidth limits, downloaded bytes don't go through the buckets.
+    """
+    def take(*_):
+        raise AssertionError("bucket used without a limit")
+
+    host_bucket = get_host_bucket("http://127.0.0.1/media/demo-1.mp4")
+    monkeypatch.setattr(TokenBucket, 'take', take)
+
+    assert reserve_bytes(host_bucket, SIZE) == 0
+
+@pytest.fixture
+def watch(monkeypatch):
+    """
+    Watches control files with a short poll interval, and stops the watching
+    threads afterwards.
+
+    Yields:
+        callable: Starts watching a control file.
+    """
+    monkeypatch.setattr(rate_limit_utils, 'CONTROL_POLL_INTERVAL', 0.05)
+    stops = []
+
+    def start(control_file):
+        stops.append(watch_control_file(str(control_file)))
+
+    yield start
+
+    for stop in stops:
+        stop.set()
+
+def test_existing_file_applies_at_startup(tmp_path, watch):
+    """
+    The limits of a control file that already exists apply right away,
+    instead of waiting for the file to be modified.
+    """
+    control_file = tmp_path / "RateLimits.json"
+    control_file.write_text(json.dumps({'bandwidth': '1M'}))
+    configure_limits(bandwidth=RATE)
+
+    watch(control_file)
+
+    assert LIMITS['bandwidth'] == 1024 * 1024
+
+@pytest.mark.skipif(
+    not hasattr(signal, 'SIGHUP'), reason="SIGHUP is not available"
+)
+def test_sighup_reloads_in_watcher_thread(tmp_path, monkeypatch, watch):
+    """
+    SIGHUP only flags the reload, which the watching thread performs.
+    """
+    control_file = tmp_path / "RateLimits.json"
+    control_file.write_text(json.dumps({'bandwidth': '1M'}))
+    load_control_file = rate_limit_utils.load_control_file
+    reloads = []
+
+    def record_reload(path):
+        reloads.append(threading.current_thread().name)
+        load_control_file(path)
+
+    monkeypatch.setattr(rate_limit_utils, 'load_control_file', record_reload)
+    previous_handler = signal.getsignal(signal.SIGHUP)
+    try:
+        watch(control_file)
+        os.kill(os.getpid(), signal.SIGHUP)
+        deadline = time.monotonic() + 5
+        while len(reloads) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    finally:
+        signal.signal(signal.SIGHUP, previous_handler)
+
+    assert reloads == [threading.main_thread().name, "rate-limits"]
+    assert LIMITS['bandwidth'] == 1024 * 1024
@@ -0,0 +1,139 @@
+"""
+Tests of the resumption of partial downloads, with both engines: a `.part`
+file left by an earlier run is continued with a Range request when the remote
+file is unchanged, and downloaded again from the start otherwise.
+"""
+
+import os
+
+import pytest
+
+from benchmarks.fake_site import get_media_bytes, get_media_etag, FakeSite
+from helpers.manifest_utils import record_episode
+from helpers.download_utils import (
+    PART_SUFFIX, JOURNAL_SUFFIX, write_journal, read_journal
+)
+
+SIZE = 512 * 1024
+FILE_ID = 'demo-1'
+
+class JournaledResponse:
+    """
+    The parts of a response recorded in a journal.
+    """
+
+    def __init__(self, url, etag):
+        self.url = url
+        self.headers = {'etag': etag}
+
+def write_partial_download(final_path, url, written, etag, version=0):
+    """
+    Leaves the first bytes of a download on disk, as an interrupted run does.
+    """
+    with open(final_path + PART_SUFFIX, 'wb') as file:
+        file.write(get_media_bytes(FILE_ID, SIZE, version)[:written])
+
+    write_journal(
+        final_path, JournaledResponse(url, etag), SIZE, written=written
+    )
+
+def read_file(path):
+    """
+    Returns the content of a file.
+    """
+    with open(path, 'rb') as file:
+        return file.read()
+
+@pytest.fixture
+def download(engine, fake_site, tmp_path, task_info):
+    """
+    Starts the fake site and downloads its media file with each engine.
+
+    Returns:
+        callable: Takes the site settings and a function preparing the
+                  `(final_path, url)` of the download, runs the download and
+                  returns the final path.
+    """
+    def run(prepare=None, **settings):
+        base = fake_site(size=SIZE, **settings)
+        url = f"{base}/media/{FILE_ID}.mp4"
+        final_path = str(tmp_path / f"{FILE_ID}.mp4")
+        if prepare:
+            prepare(final_path, url)
+        engine(url, final_path, task_info)
+        return final_path
+
+    return run
+
+def test_resume_with_matching_etag(download):
+    """
+    An unchanged file is continued from the end of the partial file.
+    """
+    final_path = download(lambda final_path, url: write_partial_download(
+        final_path, url, SIZE // 2, get_media_etag(FILE_ID, SIZE)
+    ))
+
+    assert read_file(final_path) == get_media_bytes(FILE_ID, SIZE)
+    assert FakeSite.media_requests == [(f"bytes={SIZE // 2}-", 206)]
+    assert not os.path.exists(final_path + PART_SUFFIX)
+    assert not os.path.exists(final_path + JOURNAL_SUFFIX)
+
+@pytest.mark.parametrize('if_range', [True, False])
+def test_resume_with_changed_etag(download, if_range):
+    """
+    A file changed since the partial download is downloaded again, whether
+    the server checks If-Range and sends it whole, or ignores If-Range and
+    the ETag of its range response doesn't match the journal.
+    """
+    final_path = download(
+        lambda final_path, url: write_partial_download(
+            final_path, url, SIZE // 2, get_media_etag(FILE_ID, SIZE)
+        ),
+        version=1, if_range=if_range
+    )
+
+    assert read_file(final_path) == get_media_bytes(FILE_ID, SIZE, 1)
+    expected = [(f"bytes={SIZE // 2}-", 200)] if if_range else [
+        (f"bytes={SIZE // 2}-", 206), (None, 200)
+    ]
+    assert FakeSite.media_requests == expected
+
+def test_resume_past_the_end(download):
+    """
+    A partial file as large as the remote file is answered with 416, and the
+    download starts over.
+    """
+    final_path = download(lambda final_path, url: write_partial_download(
+        final_path, url, SIZE, get_media_etag(FILE_ID, SIZE)
+    ))
+
+    assert read_file(final_path) == get_media_bytes(FILE_ID, SIZE)
+    assert FakeSite.media_requests == [(f"bytes={SIZE}-", 416), (None, 200)]
+    assert read_journal(final_path) == {}
+
+def test_unchanged_file_is_skipped(download):
+    """
+    A finished file whose recorded ETag matches the remote one is not
+    downloaded again.
+    """
+    def write_finished_download(final_path, _):
+        with open(final_path, 'wb') as file:
+            file.write(get_media_bytes(FILE_ID, SIZE))
+        record_episode(final_path, etag=get_media_etag(FILE_ID, SIZE))
+
+    download(write_finished_download)
+
+    assert not FakeSite.media_requests
+
+def test_downloaded_file_mode(download):
+    """
+    Downloaded files get the permissions of files created with `open`.
+    """
+    umask = os.umask(0o022)
+    try:
+        final_path = download()
+
+    finally:
+        os.umask(umask)
+
+    assert os.stat(final_path).st_mode & 0o777 == 0o644
@@ -0,0 +1,103 @@
+"""
+Tests of the segmented downloads: every range response is checked against
+the initial response before it is written, a journal without validators is
+never resumed, and the extra connections are bounded by the free slots of
+the download limiter and of the host.
+"""
+
+import os
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import helpers.download_utils
+from benchmarks.fake_site import FakeSite, get_media_bytes
+from hanime_downloader import download_episode
+from helpers.concurrency_utils import DOWNLOAD_LIMITER
+from helpers.download_utils import (
+    PART_SUFFIX, check_segment_response, load_segments, write_journal
+)
+
+SIZE = 1024 * 1024
+RATE = 1024 * 1024
+SEGMENTS = 4
+FILE_ID = 'segments-1'
+
+class InitialResponse:
+    """
+    The parts of the initial response of a download used by its segments.
+    """
+
+    def __init__(self, url, **headers):
+        self.url = url
+        self.headers = CaseInsensitiveDict(headers)
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    """
+    Splits the media files of the tests into segments.
+    """
+    monkeypatch.setattr(helpers.download_utils, 'MAX_SEGMENTS', SEGMENTS)
+    monkeypatch.setattr(
+        helpers.download_utils, 'MIN_SEGMENT_SIZE', SIZE // SEGMENTS
+    )
+
+@pytest.mark.parametrize('workers', [1, SEGMENTS])
+def test_connections_follow_free_slots(
+        fake_site, tmp_path, task_info, workers
+):
+    """
+    A segmented download opens as many connections as the download limiter
+    has slots for, and writes the whole file either way.
+    """
+    DOWNLOAD_LIMITER.configure(workers, workers, workers)
+    base = fake_site(size=SIZE, rate=RATE)
+
+    download_episode(f"{base}/media/{FILE_ID}.mp4", str(tmp_path), task_info)
+
+    with open(tmp_path / f"{FILE_ID}.mp4", 'rb') as file:
+        assert file.read() == get_media_bytes(FILE_ID, SIZE)
+    # The body of the initial response may still be on its way out when
+    # the segments start
+    assert workers <= FakeSite.streams['peak'] <= workers + 1
+    assert DOWNLOAD_LIMITER.active == 0
+
+@pytest.mark.parametrize('headers', [
+    {'Content-Range': "bytes 0-99/400", 'ETag': '"v1"'},
+    {'Content-Range': "bytes 100-199/400", 'ETag': '"v2"'},
+    {
+        'Content-Range': "bytes 100-199/400", 'ETag': '"v1"',
+        'Last-Modified': "Mon, 02 Jan 2023 00:00:00 GMT"
+    },
+], ids=['range', 'etag', 'last_modified'])
+def test_mismatched_segment_is_rejected(headers):
+    """
+    A segment response for another range, or from a changed remote file, is
+    rejected before any of it is written.
+    """
+    validators = CaseInsensitiveDict({
+        'ETag': '"v1"', 'Last-Modified': "Sun, 01 Jan 2023 00:00:00 GMT"
+    })
+
+    with pytest.raises(requests.RequestException):
+        check_segment_response(
+            CaseInsensitiveDict(headers), validators, 100, 199
+        )
+
+def test_journal_without_validators_is_not_resumed(tmp_path):
+    """
+    The journaled segments of a file served without ETag or Last-Modified
+    are downloaded again, since nothing shows the file is unchanged.
+    """
+    final_path = str(tmp_path / f"{FILE_ID}.mp4")
+    response = InitialResponse("http://127.0.0.1/media/segments-1.mp4")
+    with open(final_path + PART_SUFFIX, 'wb') as file:
+        file.truncate(SIZE)
+    journaled = [[0, SIZE // 2 - 1, 1024], [SIZE // 2, SIZE - 1, 2048]]
+    write_journal(final_path, response, SIZE, journaled)
+
+    segments = load_segments(final_path, response, SIZE)
+
+    assert [downloaded for (_, _, downloaded) in segments] == [0] * SEGMENTS
+    assert os.path.getsize(final_path + PART_SUFFIX) == SIZE
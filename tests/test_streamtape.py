@@ -0,0 +1,54 @@
+"""
+Tests of the Streamtape command-line tool against the fake site, run both as
+a script and as a module of the helpers package, and of the extraction of a
+page with a decoy link.
+"""
+
+import os
+import sys
+import subprocess
+
+import pytest
+
+from benchmarks.fake_site import streamtape_page
+from helpers.streamtape_utils import extract_download_info
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "helpers", "streamtape_utils.py")
+
+@pytest.mark.parametrize('command', [
+    [SCRIPT], ['-m', 'helpers.streamtape_utils']
+], ids=['script', 'module'])
+def test_command_line(fake_site, command):
+    """
+    The tool prints the cURL command of a resolved page, and the error of a
+    page that can't be fetched, however it is run.
+    """
+    base = fake_site()
+    result = subprocess.run(
+        [sys.executable, *command, f"{base}/v/demo-1", f"{base}/missing"],
+        capture_output=True, text=True, cwd=ROOT, timeout=60, check=False
+    )
+
+    host = base.split('//', 1)[1]
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == (
+        f"curl -L -o 'demo-1.mp4' 'https://{host}/get_video?id=demo-1"
+        "&expires=1&ip=1&token=demo-1token'\n"
+    )
+    assert result.stderr.startswith(f"HTTPError: {base}/missing: 404")
+
+def test_truncated_decoy_link():
+    """
+    A decoy link div left without its closing tag after the real one is
+    skipped, rather than taken for the link.
+    """
+    html = streamtape_page("127.0.0.1", "demo-1")
+    decoy = (
+        '<div id="ideoooolink" style="display:none;">'
+        '/127.0.0.1/get_video?id=decoy&token='
+    )
+    truncated = html.replace("</body>", f"{decoy}</body>")
+
+    assert extract_download_info(truncated) == extract_download_info(html)
+    assert "decoy" not in extract_download_info(truncated)[1]
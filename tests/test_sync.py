@@ -0,0 +1,84 @@
+"""
+Tests of the sync mode against the fake site: an unchanged series costs a
+single conditional request answered with a 304, and only the episodes added
+since the last sync are downloaded.
+"""
+
+from collections import Counter
+
+import pytest
+
+import hanime_downloader
+from benchmarks.fake_site import FakeSite
+from hanime_downloader import sync_hanime_download
+
+SIZE = 128 * 1024
+EPISODES = 2
+
+@pytest.fixture
+def page_results(monkeypatch):
+    """
+    Records what every conditional request of a series page returned.
+
+    Returns:
+        list: The pages fetched, None for a page not modified.
+    """
+    results = []
+    fetch_text_if_modified = hanime_downloader.fetch_text_if_modified
+
+    def fetch(*args, **kwargs):
+        results.append(fetch_text_if_modified(*args, **kwargs))
+        return results[-1]
+
+    monkeypatch.setattr(hanime_downloader, 'fetch_text_if_modified', fetch)
+    return results
+
+def forget_requests():
+    """
+    Clears the requests recorded by the fake site.
+    """
+    FakeSite.requests_seen.clear()
+    FakeSite.media_requests.clear()
+
+def test_unchanged_series_costs_one_304(fake_site, page_results):
+    """
+    A series synced again without changes is checked with a single request,
+    answered with a 304, and nothing is resolved or downloaded.
+    """
+    base = fake_site(episodes=EPISODES, size=SIZE)
+    url = f"{base}/hentai/synced"
+    sync_hanime_download(url)
+    assert len(FakeSite.media_requests) == EPISODES
+    assert page_results[-1] is not None
+
+    forget_requests()
+    sync_hanime_download(url)
+
+    assert page_results[-1] is None
+    assert FakeSite.requests_seen == Counter({'/hentai/synced': 1})
+    assert not FakeSite.media_requests
+
+def test_sync_downloads_new_episodes(fake_site, page_results, monkeypatch):
+    """
+    Only the episodes added to a series since the last sync are resolved and
+    downloaded, and the series is unchanged again afterwards.
+    """
+    base = fake_site(episodes=EPISODES, size=SIZE)
+    url = f"{base}/hentai/growing"
+    sync_hanime_download(url)
+
+    monkeypatch.setattr(FakeSite, 'episodes', EPISODES + 1)
+    forget_requests()
+    sync_hanime_download(url)
+
+    assert page_results[-1] is not None
+    assert [path for path in FakeSite.requests_seen if '/ep/' in path] == [
+        f"/ep/growing/{EPISODES + 1}"
+    ]
+    assert FakeSite.media_requests == [(None, 200)]
+
+    forget_requests()
+    sync_hanime_download(url)
+
+    assert page_results[-1] is None
+    assert not FakeSite.media_requests